@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from eth_hash.auto import keccak
 
 class keccak_256:
@@ -9,3 +11,11 @@ class keccak_256:
         return keccak(bytes(self._data))
     def hexdigest(self):
         return keccak(bytes(self._data)).hex()
+
+
+# Mapping slots (keccak(key . slot)) are hashed over and over on different paths,
+# in all three checks and across contracts of a batch, so the digests are cached
+# for the whole process. Use keccak_int.cache_info() to inspect the hit rate.
+@lru_cache(maxsize=65536)
+def keccak_int(data):
+    return int.from_bytes(keccak(data), 'big')
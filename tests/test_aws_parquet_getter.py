@@ -28,3 +28,11 @@ def test_parquet_getter_basic(tmp_path):
         {"Address": "0x2", "ByteCode": "bb", "BlockNumber": 2},
         {"Address": "0x3", "ByteCode": "cc", "BlockNumber": 3},
     ]
+
+
+def test_parquet_getter_as_bytes(tmp_path):
+    f = tmp_path / 'data.parquet'
+    _make_sample(f)
+    g = DataGetterAWSParquet(str(f), as_bytes=True)
+    rows = [r for page in g.fetch_chunk(1, 2) for r in page]
+    assert [r['ByteCode'] for r in rows] == [b'\xaa', b'\xbb']
@@ -192,3 +192,217 @@ def test_scan_once_logs(monkeypatch, tmp_path, caplog):
     assert "scanning" in log_text
     assert "completed scan" in log_text
 
+
+
+def test_scan_once_resumes_interrupted_batch(tmp_path, monkeypatch):
+    data = tmp_path / 'data.parquet'
+    _make_dataset(data, [1, 2, 3, 4, 5])
+    state = tmp_path / 'state.json'
+    report = tmp_path / 'report.jsonl'
+    checked = []
+
+    def crashing_checks(bytecode, address):
+        if address == '0x4':
+            raise KeyboardInterrupt
+        checked.append(address)
+        return {'suicidal': True}
+
+    monkeypatch.setattr(aws_scanner, 'run_checks', crashing_checks)
+    try:
+        aws_scanner.scan_once(
+            str(data), state_file=str(state), report_file=str(report),
+            batch_blocks=5, checkpoint_every=2,
+        )
+    except KeyboardInterrupt:
+        pass
+    st = json.loads(state.read_text())
+    assert st['batch']['done'] == 2
+    assert checked == ['0x1', '0x2', '0x3']
+
+    def checks(bytecode, address):
+        checked.append(address)
+        return {'suicidal': True}
+
+    monkeypatch.setattr(aws_scanner, 'run_checks', checks)
+    aws_scanner.scan_once(
+        str(data), state_file=str(state), report_file=str(report),
+        batch_blocks=5, checkpoint_every=2,
+    )
+    # Only the contract after the last checkpoint is checked twice
+    assert checked == ['0x1', '0x2', '0x3', '0x3', '0x4', '0x5']
+    st = json.loads(state.read_text())
+    assert 'batch' not in st
+    assert st['next_block'] == 0
+    entries = [json.loads(l) for l in report.read_text().splitlines()]
+    assert sorted(e['address'] for e in entries) == ['0x1', '0x2', '0x3', '0x4', '0x5']
+    assert all(e['analysis_version'] == aws_scanner.ANALYSIS_VERSION for e in entries)
+
+
+def test_report_sink_is_idempotent(tmp_path):
+    path = tmp_path / 'r' / 'report.jsonl'
+    with aws_scanner.ReportSink(str(path)) as sink:
+        assert sink.write({'address': '0x1', 'suicidal': True})
+        assert not sink.write({'address': '0x1', 'suicidal': True})
+    with open(path, 'a') as fh:
+        fh.write('{"address": "0x')  # torn write
+    with aws_scanner.ReportSink(str(path)) as sink:
+        assert not sink.write({'address': '0x1', 'suicidal': True})
+    with aws_scanner.ReportSink(str(path), analysis_version='2') as sink:
+        assert sink.write({'address': '0x1', 'suicidal': True})
+
+
+def test_scan_scheduled_once_fills_gaps(tmp_path, monkeypatch):
+    data = tmp_path / 'data.parquet'
+    _make_dataset(data, list(range(1, 7)))
+    state = tmp_path / 'state.json'
+    report = tmp_path / 'report.jsonl'
+    scanned = []
+    monkeypatch.setattr(
+        aws_scanner, 'run_checks', lambda b, a: scanned.append(a) or {}
+    )
+    kwargs = dict(
+        state_file=str(state), report_file=str(report),
+        batch_blocks=2, head_ratio=0.5,
+    )
+    aws_scanner.scan_scheduled_once(str(data), **kwargs)
+    # The head moves by three blocks while backfill continues
+    _make_dataset(data, list(range(1, 10)))
+    for _ in range(8):
+        aws_scanner.scan_scheduled_once(str(data), **kwargs)
+    assert sorted(scanned, key=lambda a: int(a[2:])) == [f'0x{i}' for i in range(1, 10)]
+    st = json.loads(state.read_text())
+    assert st['coverage'] == [[0, 9]]
+    assert st['served']['head'] >= 2 and st['served']['backfill'] >= 2
+
+
+def test_scan_once_prioritise(tmp_path, monkeypatch):
+    data = tmp_path / 'data.parquet'
+    table = pa.table({
+        'block_number': [1, 2, 3],
+        'address': ['0x1', '0x2', '0x3'],
+        'bytecode': ['00', '6000ff', '5b'],
+    })
+    pq.write_table(table, data)
+    order = []
+    monkeypatch.setattr(
+        aws_scanner, 'run_checks', lambda b, a: order.append(a) or {}
+    )
+    aws_scanner.scan_once(
+        str(data),
+        state_file=str(tmp_path / 'state.json'),
+        report_file=str(tmp_path / 'report.jsonl'),
+        batch_blocks=3,
+        prioritise=True,
+    )
+    assert order == ['0x2', '0x1', '0x3']
+
+
+def test_scan_once_delegates_proxies(tmp_path, monkeypatch):
+    impl = '0x' + 'be' * 20
+    stub = '363d3d373d3d3d363d73' + 'be' * 20 + '5af43d82803e903d91602b57fd5bf3'
+    data = tmp_path / 'data.parquet'
+    table = pa.table({
+        'block_number': [1, 2, 3],
+        'address': ['0xp1', impl, '0xp2'],
+        'bytecode': [stub, '6000ff', stub],
+    })
+    pq.write_table(table, data)
+    checked = []
+    monkeypatch.setattr(
+        aws_scanner, 'run_checks', lambda b, a: checked.append(a) or {'suicidal': True}
+    )
+    report = tmp_path / 'report.jsonl'
+    aws_scanner.scan_once(
+        str(data),
+        state_file=str(tmp_path / 'state.json'),
+        report_file=str(report),
+        batch_blocks=3,
+        verdict_cache=str(tmp_path / 'verdicts.sqlite'),
+    )
+    assert checked == [impl]
+    entries = {e['address']: e for e in map(json.loads, report.read_text().splitlines())}
+    assert set(entries) == {'0xp1', impl, '0xp2'}
+    assert entries['0xp1']['implementation'] == impl
+    assert entries['0xp1']['block'] == 1
+    assert entries['0xp2']['proxy'] == 'eip1167'
+
+
+def test_scan_once_checks_awaited_implementations(tmp_path, monkeypatch):
+    impl = '0x' + 'be' * 20
+    gone = '0x' + 'ce' * 20
+    stub = '363d3d373d3d3d363d73%s5af43d82803e903d91602b57fd5bf3'
+    data = tmp_path / 'data.parquet'
+    # The implementation was deployed before the scanned blocks
+    table = pa.table({
+        'block_number': [1, 5, 6],
+        'address': [impl, '0xp1', '0xp2'],
+        'bytecode': ['6000ff', stub % ('be' * 20), stub % ('ce' * 20)],
+    })
+    pq.write_table(table, data)
+    checked = []
+    monkeypatch.setattr(
+        aws_scanner, 'run_checks', lambda b, a: checked.append(a) or {'suicidal': True}
+    )
+    report = tmp_path / 'report.jsonl'
+    aws_scanner.scan_once(
+        str(data),
+        state_file=str(tmp_path / 'state.json'),
+        report_file=str(report),
+        batch_blocks=2,
+        verdict_cache=str(tmp_path / 'verdicts.sqlite'),
+    )
+    # The implementation is fetched, the stub of a missing one checked itself
+    assert checked == [impl, '0xp2']
+    entries = {e['address']: e for e in map(json.loads, report.read_text().splitlines())}
+    assert entries['0xp1']['implementation'] == impl
+    assert 'implementation' not in entries['0xp2']
+
+
+def test_resolved_proxies_are_reported_after_crash(tmp_path, monkeypatch):
+    impl = '0x' + 'be' * 20
+    stub = '363d3d373d3d3d363d73' + 'be' * 20 + '5af43d82803e903d91602b57fd5bf3'
+    data = tmp_path / 'data.parquet'
+    table = pa.table({
+        'block_number': [1, 2, 3, 4],
+        'address': ['0xp1', '0x2', impl, '0x4'],
+        'bytecode': [stub, '00', '6000ff', '01'],
+    })
+    pq.write_table(table, data)
+    report = tmp_path / 'report.jsonl'
+    # The checkpoint after 0x2 skips the proxy on resume
+    kwargs = dict(
+        state_file=str(tmp_path / 'state.json'), report_file=str(report),
+        batch_blocks=4, checkpoint_every=2,
+        verdict_cache=str(tmp_path / 'verdicts.sqlite'),
+    )
+
+    def crashing_checks(bytecode, address):
+        if address == '0x4':
+            raise KeyboardInterrupt
+        return {'suicidal': address == impl}
+
+    flush = aws_scanner.ReportSink.flush
+
+    def flush_and_mark(self):
+        flush(self)
+        self.flushed = self._fh.tell()
+
+    def killed(self, *exc):
+        # A killed process loses the report lines written since the last flush
+        self._fh.flush()
+        self._fh.truncate(getattr(self, 'flushed', 0))
+        self._fh.close()
+
+    monkeypatch.setattr(aws_scanner, 'run_checks', crashing_checks)
+    monkeypatch.setattr(aws_scanner.ReportSink, 'flush', flush_and_mark)
+    monkeypatch.setattr(aws_scanner.ReportSink, '__exit__', killed)
+    try:
+        aws_scanner.scan_once(str(data), **kwargs)
+    except KeyboardInterrupt:
+        pass
+    assert report.read_text() == ''
+    monkeypatch.undo()
+    monkeypatch.setattr(aws_scanner, 'run_checks', lambda b, a: {'suicidal': a == impl})
+    aws_scanner.scan_once(str(data), **kwargs)
+    entries = {e['address'] for e in map(json.loads, report.read_text().splitlines())}
+    assert entries == {'0xp1', impl}
@@ -30,6 +30,12 @@ def test_measure_speed_basic(tmp_path, monkeypatch):
     assert stats['mb_per_second'] > 0
 
 
+def test_code_size_hex_and_bytes():
+    assert aws_speed.code_size('0xaabb') == 2
+    assert aws_speed.code_size('aabbcc') == 3
+    assert aws_speed.code_size(b'\xaa') == 1
+
+
 def test_main_prints_stats(tmp_path, monkeypatch, capsys):
     data = tmp_path / 'data.parquet'
     _make_dataset(data)
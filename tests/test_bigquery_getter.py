@@ -14,13 +14,42 @@ class DummyRow:
         self.block_number = block_number
 
 
+class DummyRowIterator:
+    def __init__(self, rows, page_size):
+        self._rows = rows
+        self._page_size = page_size
+        self.pages_read = 0
+
+    @property
+    def pages(self):
+        for i in range(0, len(self._rows), self._page_size):
+            self.pages_read += 1
+            yield iter(self._rows[i:i + self._page_size])
+
+    def to_arrow_iterable(self):
+        import pyarrow as pa
+
+        for page in self.pages:
+            page = list(page)
+            yield pa.record_batch({
+                'address': [r.address for r in page],
+                'bytecode': [r.bytecode for r in page],
+                'block_number': [r.block_number for r in page],
+            })
+
+
 class DummyJob:
     def __init__(self, rows):
         self._rows = rows
+        self.iterator = None
 
     def __iter__(self):
         return iter(self._rows)
 
+    def result(self, page_size=None):
+        self.iterator = DummyRowIterator(self._rows, page_size)
+        return self.iterator
+
 
 class DummyClient:
     def __init__(self, rows):
@@ -29,7 +58,8 @@ class DummyClient:
 
     def query(self, sql, job_config=None):
         self.query_args = (sql, job_config.query_parameters)
-        return DummyJob(self.rows)
+        self.job = DummyJob(self.rows)
+        return self.job
 
 
 def test_bigquery_getter_basic():
@@ -46,3 +76,24 @@ def test_bigquery_getter_basic():
     assert 'dataset.table' in sql
     assert len(params) == 2
 
+
+
+def test_bigquery_getter_streams_pages():
+    rows = [DummyRow(hex(i), 'aa', i) for i in range(5)]
+    client = DummyClient(rows)
+    getter = DataGetterBigQuery('dataset.table', page_rows=2, client=client)
+    pages = getter.fetch_chunk(0, 4)
+    first = next(pages)
+    assert [r['BlockNumber'] for r in first] == [0, 1]
+    # Only the first page has been requested so far
+    assert client.job.iterator.pages_read == 1
+    assert [len(p) for p in pages] == [2, 1]
+
+
+def test_bigquery_getter_arrow():
+    rows = [DummyRow(hex(i), 'aa', i) for i in range(3)]
+    client = DummyClient(rows)
+    getter = DataGetterBigQuery('dataset.table', page_rows=2, client=client)
+    batches = list(getter.fetch_arrow(0, 2))
+    assert [b.num_rows for b in batches] == [2, 1]
+    assert batches[1].column('block_number').to_pylist() == [2]
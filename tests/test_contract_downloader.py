@@ -211,3 +211,112 @@ def test_parquet_source(tmp_path):
     assert meta["newest_block"] == 3
     assert meta["oldest_block"] == 2
 
+
+
+def test_segmented_log_rotates_and_evicts(tmp_path):
+    log = contract_downloader.SegmentedContractLog(tmp_path / 'log', segment_bytes=140)
+    for i in range(6):
+        log.append([{'address': hex(i), 'bytecode': 'aa' * 10, 'block': i}])
+    assert len(log.segments) == 3
+    assert [r['block'] for r in log.iter_records()] == list(range(6))
+    assert [r['block'] for r in log.iter_records(2, 3)] == [2, 3]
+
+    removed = log.enforce_limit(log.total_size() - 1)
+    assert len(removed) == 1
+    assert not (tmp_path / 'log' / removed[0]).exists()
+    # The index survives reopening
+    log = contract_downloader.SegmentedContractLog(tmp_path / 'log', segment_bytes=140)
+    assert log.block_range() == (2, 5)
+
+
+def test_update_contract_store_segmented(tmp_path):
+    source = RangeSource(2000)
+    seg_dir = tmp_path / 'segments'
+    mfile = tmp_path / 'meta.json'
+    for start, end in [(1901, 2000), (1001, 1900)]:
+        contract_downloader.update_contract_store(
+            source,
+            metadata_file=str(mfile),
+            start_block=start,
+            end_block=end,
+            segment_dir=str(seg_dir),
+            segment_size_mb=0.01,
+        )
+    log = contract_downloader.SegmentedContractLog(seg_dir)
+    assert len(log.segments) > 1
+    assert sum(1 for _ in log.iter_records()) == 1000
+    meta = json.loads(mfile.read_text())
+    assert (meta['oldest_block'], meta['newest_block']) == (1001, 2000)
+
+
+def test_arrow_mirror_source(tmp_path):
+    mirror = tmp_path / 'mirror'
+    source = RangeSource(300)
+    contract_downloader.update_contract_store(
+        source,
+        contract_file=str(tmp_path / 'c.jsonl'),
+        metadata_file=str(tmp_path / 'm.json'),
+        start_block=201,
+        end_block=300,
+        arrow_dir=str(mirror),
+    )
+    contract_downloader.write_arrow_segment(
+        [{'address': hex(i), 'bytecode': 'bb', 'block': i} for i in (150, 120, 199)],
+        mirror,
+        compression=None,
+    )
+
+    arrow = contract_downloader.ArrowSource(mirror)
+    assert arrow.latest_block() == 300
+    rows = arrow.fetch(150, 205)
+    assert [r['block'] for r in rows] == [150, 199, 201, 202, 203, 204, 205]
+    assert rows[0] == {'address': hex(150), 'bytecode': 'bb', 'block': 150}
+    assert arrow.fetch_table(0, 100).num_rows == 0
+
+    getter = contract_downloader.DataGetterAWSParquet(str(mirror), format='arrow')
+    pages = list(getter.fetch_chunk(120, 150))
+    assert [r['BlockNumber'] for p in pages for r in p] == [120, 150]
+
+
+def test_arrow_mirror_follows_store_eviction(tmp_path):
+    source = RangeSource(400)
+    mirror = tmp_path / 'mirror'
+    for start in (1, 101, 201, 301):
+        contract_downloader.update_contract_store(
+            source,
+            metadata_file=str(tmp_path / 'm.json'),
+            size_limit_mb=0.01,
+            start_block=start,
+            end_block=start + 99,
+            segment_dir=str(tmp_path / 'segments'),
+            segment_size_mb=0.005,
+            arrow_dir=str(mirror),
+        )
+    oldest = json.loads((tmp_path / 'm.json').read_text())['oldest_block']
+    assert oldest > 101
+    files = contract_downloader.ArrowSource(mirror)._files()
+    # Files of evicted blocks are gone, the one still partly stored is kept
+    assert [f[:2] for f in files] == [(s, s + 99) for s in (101, 201, 301) if s + 99 >= oldest]
+    assert files[0][0] <= oldest
+
+
+def test_empty_arrow_mirror(tmp_path):
+    mirror = tmp_path / 'mirror'
+    arrow = contract_downloader.ArrowSource(mirror)
+    assert arrow.latest_block() is None
+    assert arrow.fetch_table(0, 10).schema.field('bytecode').type == pa.string()
+    meta = tmp_path / 'm.json'
+    contract_downloader.update_contract_store(
+        arrow, contract_file=str(tmp_path / 'c.jsonl'), metadata_file=str(meta)
+    )
+    assert json.loads(meta.read_text())['newest_block'] is None
+
+    # Empty ranges of a binary mirror keep the binary column
+    contract_downloader.write_arrow_segment(
+        [{'address': '0x1', 'bytecode': b'\x60\x00', 'block': 5}], mirror
+    )
+    assert arrow.latest_block() == 5
+    empty = arrow.fetch_table(0, 4)
+    assert empty.num_rows == 0
+    assert empty.schema == arrow.fetch_table(5, 5).schema
+    assert empty.schema.field('bytecode').type == pa.binary()
@@ -0,0 +1,40 @@
+from pathlib import Path
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+import contract_priority
+from contract_priority import PriorityQueue, contract_features, priority_score
+
+# DUP1 PUSH4 a9059cbb EQ ; DUP1 PUSH4 70a08231 EQ ; CALL
+DISPATCHER = '8063a9059cbb14806370a0823114f1'
+
+
+def test_contract_features():
+    f = contract_features('0x' + DISPATCHER)
+    assert f == {'size': 15, 'sends': 1, 'selfdestruct': 0, 'selectors': 2}
+    assert contract_features(bytes.fromhex('6000ff')) == {
+        'size': 3, 'sends': 0, 'selfdestruct': 1, 'selectors': 0
+    }
+
+
+def test_score_orders_by_value():
+    plain = priority_score('600060005500')
+    sender = priority_score(DISPATCHER)
+    rich = priority_score('600060005500', balance=10 ** 18)
+    assert plain < sender < rich
+
+
+def test_priority_queue_is_stable():
+    q = PriorityQueue()
+    for item, score in [('a', 1), ('b', 5), ('c', 1), ('d', 5)]:
+        q.push(item, score)
+    assert len(q) == 4
+    assert list(q.drain()) == ['b', 'd', 'a', 'c']
+
+
+def test_prioritise_with_balance():
+    rows = [('0x1', '00', 0), ('0x2', DISPATCHER, 0), ('0x3', '00', 10 ** 20)]
+    ordered = contract_priority.prioritise(rows, lambda r: r[1], lambda r: r[2])
+    assert [r[0] for r in ordered] == ['0x3', '0x2', '0x1']
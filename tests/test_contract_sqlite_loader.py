@@ -190,3 +190,19 @@ def test_gui_runs_in_terminal(tmp_path, monkeypatch):
     monkeypatch.setattr(sys, "argv", ["contract_sqlite_loader.py", str(data), str(db), "--gui"])
     loader.main()
     assert called["args"] == (str(data), str(db), 5.0)
+
+
+def test_update_contract_db_records_proxies(tmp_path):
+    stub = '363d3d373d3d3d363d73' + 'be' * 20 + '5af43d82803e903d91602b57fd5bf3'
+    data = tmp_path / 'data.parquet'
+    pq.write_table(pa.table({
+        'block_number': [1, 2],
+        'address': ['0x1', '0x2'],
+        'bytecode': ['aa', stub],
+    }), data)
+    db = tmp_path / 'out.db'
+    loader.update_contract_db(str(data), str(db), start_block=1, end_block=2)
+    conn = sqlite3.connect(db)
+    rows = list(conn.execute('SELECT address, proxy_kind, implementation FROM contracts ORDER BY address'))
+    conn.close()
+    assert rows == [('0x1', None, None), ('0x2', 'eip1167', '0x' + 'be' * 20)]
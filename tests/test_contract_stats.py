@@ -1,6 +1,7 @@
 import sys
 from pathlib import Path
 import types
+import pytest
 
 root_dir = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(root_dir / 'tool'))
@@ -141,3 +142,135 @@ def test_get_current_block_number(monkeypatch):
     monkeypatch.setattr(contract_stats, 'Web3', DummyWeb3Class)
 
     assert contract_stats.get_current_block_number('mainnet') == 42
+
+
+class CountingEth(DummyEth):
+    def __init__(self):
+        super().__init__()
+        self.code_calls = []
+        self.receipt_calls = 0
+
+    def get_code(self, addr):
+        self.code_calls.append(addr)
+        return super().get_code(addr)
+
+    def get_block_receipts(self, num):
+        self.receipt_calls += 1
+        return [
+            self._receipts.get(tx.hash, DummyReceipt())
+            for tx in self._blocks[num].transactions
+        ]
+
+
+def _chain(blocks):
+    w3 = DummyWeb3()
+    w3.eth = CountingEth()
+    w3.eth._blocks = blocks
+    w3.eth.block_number = len(blocks) - 1
+    return w3
+
+
+def test_collect_sharded_matches_sequential():
+    blocks = [
+        DummyBlock([DummyTx(to='0x1', tx_hash=f'a{i}'), DummyTx(tx_hash=f'c{i}')])
+        for i in range(10)
+    ]
+    w3 = _chain(blocks)
+    for i in range(10):
+        w3.eth._receipts[f'c{i}'] = DummyReceipt(f'0xc{i}')
+        w3.eth._codes[f'0xc{i}'] = b'\x00'
+    w3.eth._codes['0x1'] = b'abc'
+
+    addrs = contract_stats.collect_contract_addresses_sharded(w3, 0, 9, workers=3)
+    assert addrs == contract_stats.collect_contract_addresses(w3, 0, 9)
+    assert len(addrs) == 11
+    assert w3.eth.receipt_calls == 10
+
+
+def test_address_cache_looks_up_once():
+    blocks = [DummyBlock([DummyTx(to='0x1', tx_hash=f'h{i}')]) for i in range(6)]
+    w3 = _chain(blocks)
+    w3.eth._codes['0x1'] = b'abc'
+    cache = contract_stats.AddressCache(w3)
+    contract_stats.collect_contract_addresses_sharded(
+        w3, 0, 5, workers=2, cache=cache
+    )
+    assert w3.eth.code_calls == ['0x1']
+
+
+def test_sharded_checkpoint_resumes(tmp_path):
+    blocks = [DummyBlock([DummyTx(to=f'0x{i}', tx_hash=f'h{i}')]) for i in range(4)]
+    w3 = _chain(blocks)
+    for i in range(4):
+        w3.eth._codes[f'0x{i}'] = b'a'
+    ckpt = tmp_path / 'ckpt.json'
+
+    first = contract_stats.collect_contract_addresses_sharded(
+        w3, 0, 3, workers=2, checkpoint_file=str(ckpt), checkpoint_every=1
+    )
+    assert first == {'0x0', '0x1', '0x2', '0x3'}
+
+    # A finished checkpoint answers the same range without any block fetches
+    w3.eth._blocks = []
+    again = contract_stats.collect_contract_addresses_sharded(
+        w3, 0, 3, workers=2, checkpoint_file=str(ckpt)
+    )
+    assert again == first
+
+
+def test_incremental_store_fetches_only_missing_blocks(tmp_path):
+    blocks = [DummyBlock([DummyTx(to=f'0x{i % 3}', tx_hash=f'h{i}')]) for i in range(6)]
+    w3 = _chain(blocks)
+    for i in range(3):
+        w3.eth._codes[f'0x{i}'] = b'ab'
+        w3.eth._balances[f'0x{i}'] = 2 ** 70
+    fetched = []
+    get_block = w3.eth.get_block
+
+    def tracking_get_block(num, full_transactions=False):
+        fetched.append(num)
+        return get_block(num, full_transactions)
+
+    w3.eth.get_block = tracking_get_block
+    store = contract_stats.SQLiteStatsStore(str(tmp_path / 'stats.db'))
+
+    stats = contract_stats.count_contracts_incremental('mainnet', store, 0, 2, w3=w3)
+    assert stats['contract_count'] == 3
+    assert stats['total_balance_wei'] == 3 * 2 ** 70
+
+    fetched.clear()
+    stats = contract_stats.count_contracts_incremental(
+        'mainnet', store, 1, 5, w3=w3, workers=2
+    )
+    assert sorted(fetched) == [3, 4, 5]
+    assert stats['contract_count'] == 3
+    assert stats['total_code_size'] == 6
+    assert w3.eth.code_calls.count('0x0') == 1
+
+    fetched.clear()
+    assert contract_stats.count_contracts_incremental(
+        'mainnet', store, 4, 4, w3=w3
+    )['contract_count'] == 1
+    assert fetched == []
+    store.close()
+
+
+def test_incremental_store_keeps_progress_of_interrupted_run(tmp_path):
+    blocks = [DummyBlock([DummyTx(to=f'0x{i}', tx_hash=f'h{i}')]) for i in range(6)]
+    w3 = _chain(blocks)
+    for i in range(6):
+        w3.eth._codes[f'0x{i}'] = b'ab'
+    get_block = w3.eth.get_block
+
+    def failing_get_block(num, full_transactions=False):
+        if num == 3:
+            raise RuntimeError('connection lost')
+        return get_block(num, full_transactions)
+
+    w3.eth.get_block = failing_get_block
+    store = contract_stats.SQLiteStatsStore(str(tmp_path / 'stats.db'))
+    with pytest.raises(RuntimeError):
+        contract_stats.count_contracts_incremental('mainnet', store, 0, 5, w3=w3, chunk_blocks=2)
+    assert store.missing_blocks('mainnet', 0, 5) == [2, 3, 4, 5]
+    assert set(store.code_sizes('mainnet')) == {'0x0', '0x1'}
+    store.close()
@@ -54,6 +54,7 @@ def test_scan_database(monkeypatch, tmp_path):
         'suicidal': 1,
         'prodigal': 1,
         'greedy': 1,
+        'proxies': 0,
     }
     assert msgs
 
@@ -78,3 +79,84 @@ def test_cli_writes_report(monkeypatch, tmp_path):
     data = json.loads(report.read_text())
     assert data['scanned'] == 2
 
+
+
+def test_scan_database_prioritised(monkeypatch, tmp_path):
+    db = tmp_path / 'c.db'
+    _make_db(db)
+    conn = sqlite3.connect(db)
+    conn.execute('ALTER TABLE contracts ADD COLUMN balance TEXT')
+    conn.execute("UPDATE contracts SET balance='1000000' WHERE address='0x2'")
+    conn.commit()
+    conn.close()
+
+    order = []
+    monkeypatch.setattr(
+        db_checker, 'run_checks', lambda b, a: order.append(a) or {}
+    )
+    db_checker.scan_database(str(db), prioritise=True)
+    assert order == ['0x2', '0x1']
+
+
+def test_scan_database_checks_implementation_of_proxy_once(monkeypatch, tmp_path):
+    db = tmp_path / 'c.db'
+    _make_db(db)
+    impl = '0x' + 'be' * 20
+    stub = '363d3d373d3d3d363d73' + 'be' * 20 + '5af43d82803e903d91602b57fd5bf3'
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE contracts SET bytecode=? WHERE address='0x1'", (stub,))
+    conn.execute(
+        'INSERT INTO contracts(address, bytecode, block_number) VALUES(?, ?, ?)',
+        (impl.upper().replace('0X', '0x'), 'cc', 3),
+    )
+    conn.commit()
+    conn.close()
+
+    checked = []
+    monkeypatch.setattr(
+        db_checker, 'run_checks', lambda b, a: checked.append(b) or {'prodigal': b == 'cc'}
+    )
+    summary = db_checker.scan_database(str(db))
+    assert sorted(checked) == ['bb', 'cc']
+    assert summary['scanned'] == 3
+    assert summary['proxies'] == 1
+    assert summary['prodigal'] == 2
+
+
+def test_scan_database_checks_proxy_without_implementation(monkeypatch, tmp_path):
+    db = tmp_path / 'c.db'
+    _make_db(db)
+    stub = '363d3d373d3d3d363d73' + 'be' * 20 + '5af43d82803e903d91602b57fd5bf3'
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE contracts SET bytecode=? WHERE address='0x1'", (stub,))
+    conn.commit()
+    conn.close()
+
+    checked = []
+    monkeypatch.setattr(
+        db_checker, 'run_checks', lambda b, a: checked.append(a) or {'greedy': a == '0x1'}
+    )
+    summary = db_checker.scan_database(str(db))
+    assert checked == ['0x1', '0x2']
+    assert summary['greedy'] == 1
+    assert summary['proxies'] == 0
+
+
+def test_scan_database_counts_proxies_resolved_from_earlier_run(monkeypatch, tmp_path):
+    db = tmp_path / 'c.db'
+    _make_db(db)
+    impl = '0x' + 'be' * 20
+    stub = '363d3d373d3d3d363d73' + 'be' * 20 + '5af43d82803e903d91602b57fd5bf3'
+    cache = str(tmp_path / 'verdicts.sqlite')
+    with db_checker.VerdictCache(cache) as verdicts:
+        verdicts.check(stub, '0xOLD', lambda b, a: {})
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE contracts SET address=? WHERE address='0x1'", (impl,))
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db_checker, 'run_checks', lambda b, a: {'suicidal': a == impl})
+    summary = db_checker.scan_database(str(db), verdict_cache=cache)
+    assert summary['scanned'] == 2
+    assert summary['suicidal'] == 2
+    assert summary['proxies'] == 1
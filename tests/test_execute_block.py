@@ -0,0 +1,71 @@
+from pathlib import Path
+import contextlib
+import io
+import sys
+
+import pytest
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+import check_leak
+import check_suicide
+from values import MyGlobals
+
+ADDRESS = '0x' + '11' * 20
+
+
+def _bytecode(name):
+    path = root_dir / 'tool' / 'example_contracts' / f'example_{name}.bytecode'
+    return path.read_text().strip()[2:]
+
+
+@pytest.fixture
+def depth_nodes(monkeypatch):
+    """Record the visited nodes and frontier size of every search depth."""
+    runs = []
+    original = check_leak.search_depth
+
+    def _search_depth(ops, frontier, *args):
+        result = original(ops, frontier, *args)
+        runs.append((MyGlobals.visited_nodes, frontier is not None,
+                     None if result is None else len(result.states)))
+        return result
+
+    monkeypatch.setattr(check_leak, 'search_depth', _search_depth)
+    monkeypatch.setattr(MyGlobals, 'max_calldepth_in_normal_search', 2)
+    yield runs
+    MyGlobals.reuse_frontier = True
+
+
+def _leak(code):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return check_leak.check_one_contract_on_ether_leak(code, ADDRESS)
+
+
+def test_deeper_search_resumes_from_frontier(depth_nodes):
+    code = _bytecode('suicidal')
+
+    MyGlobals.reuse_frontier = False
+    assert _leak(code) is False
+    scratch = list(depth_nodes)
+    depth_nodes.clear()
+
+    MyGlobals.reuse_frontier = True
+    assert _leak(code) is False
+    resumed = list(depth_nodes)
+
+    assert [r[1] for r in scratch] == [False, False]
+    assert [r[1] for r in resumed] == [False, True]
+    assert resumed[0][2] > 0
+    # The second depth only explores the new transaction
+    assert resumed[1][0] < scratch[1][0]
+    assert sum(r[0] for r in resumed) < sum(r[0] for r in scratch)
+
+
+def test_suicide_found_with_frontier_reuse(monkeypatch):
+    monkeypatch.setattr(MyGlobals, 'max_calldepth_in_normal_search', 2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        found = check_suicide.check_one_contract_on_suicide(_bytecode('suicidal'), ADDRESS, False, False)
+    assert found
+    assert MyGlobals.function_calls[1]['input'] == '41c0e1b5'
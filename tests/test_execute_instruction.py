@@ -0,0 +1,61 @@
+from pathlib import Path
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from z3 import BitVecVal
+
+import execute_instruction
+from values import SymWord
+import sha3
+from memory import Memory
+
+
+def _const(value, step=0):
+    return SymWord.constant(step, BitVecVal(value, 256))
+
+
+def _memory(words):
+    mmemory = Memory()
+    for addr, value in words.items():
+        mmemory.store_word(addr, value)
+    return mmemory
+
+
+def _sha3(mmemory, addr, length):
+    code = [{'id': 0, 'op': '20', 'input': '', 'o': 'SHA3'}]
+    stack = [_const(length), _const(addr)]
+    execute_instruction.execute(code, stack, 0, {}, mmemory, {}, [], 1, False, False)
+    return stack[-1]
+
+
+def test_sha3_hashes_raw_memory_bytes():
+    res = _sha3(_memory({0: _const(0)}), 0, 32)
+    assert execute_instruction.get_value(res) == int(
+        '290decd9548b62a8d60345a988386fc84ba6bc95484008f6362f93160ef3e563', 16
+    )
+
+
+def test_sha3_mapping_slot_is_cached():
+    mmemory = _memory({0: _const(0xabc), 32: _const(3)})
+    first = execute_instruction.get_value(_sha3(mmemory, 0, 64))
+    hits = sha3.keccak_int.cache_info().hits
+    second = execute_instruction.get_value(_sha3(mmemory, 0, 64))
+    assert first == second
+    assert sha3.keccak_int.cache_info().hits == hits + 1
+    expected = sha3.keccak_256((0xabc).to_bytes(32, 'big') + (3).to_bytes(32, 'big'))
+    assert first == int(expected.hexdigest(), 16)
+
+
+def test_sha3_of_symbolic_memory_is_undefined():
+    from z3 import BitVec
+    mmemory = _memory({0: SymWord.constant(0, BitVec('x', 256))})
+    assert _sha3(mmemory, 0, 32).kind == 'undefined'
+
+
+def test_sha3_of_huge_length_is_a_fresh_variable():
+    mmemory = _memory({0: _const(1)})
+    res = _sha3(mmemory, 0, 2 ** 200)
+    assert res.kind == 'constant' and str(res.term).startswith('sha-')
+    assert mmemory.size() == 32
@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import asyncio
+import json
+import sys
+import threading
+
+import pytest
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+import fetch_and_check
+
+ADDRS = ['0x' + f'{i:040x}' for i in range(1, 7)]
+
+
+class MockNode:
+    """JSON-RPC server with 3 blocks, each calling two addresses."""
+
+    def __init__(self):
+        self.requests = []
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                node.requests.append(body)
+                calls = body if isinstance(body, list) else [body]
+                out = [{'jsonrpc': '2.0', 'id': c['id'], 'result': node.answer(c)}
+                       for c in calls]
+                data = json.dumps(out if isinstance(body, list) else out[0]).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, call):
+        method, params = call['method'], call['params']
+        if method == 'eth_blockNumber':
+            return hex(2)
+        if method == 'eth_getBlockByNumber':
+            num = int(params[0], 16)
+            txs = [{'to': ADDRS[2 * num + k], 'hash': '0x' + '00' * 32,
+                    'blockNumber': params[0]} for k in range(2)]
+            return {'number': params[0], 'transactions': txs}
+        if method == 'eth_getCode':
+            # only even addresses are contracts
+            return '0x6000' if int(params[0], 16) % 2 == 0 else '0x'
+        raise AssertionError(method)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def node():
+    n = MockNode()
+    yield n
+    n.close()
+
+
+def test_fetch_block_contracts_batches_code(node):
+    from web3 import AsyncHTTPProvider, AsyncWeb3
+
+    async def run():
+        w3 = AsyncWeb3(AsyncHTTPProvider(node.url))
+        try:
+            return await fetch_and_check.fetch_block_contracts(
+                w3, 1, asyncio.Semaphore(2)
+            )
+        finally:
+            await w3.provider.disconnect()
+
+    found = asyncio.run(run())
+    assert [a.lower() for a, _ in found] == [ADDRS[3]]
+    assert found[0][1] == '6000'
+    batches = [r for r in node.requests if isinstance(r, list)]
+    assert len(batches) == 1 and len(batches[0]) == 2
+
+
+def test_scan_contracts_async(node, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        fetch_and_check, 'run_checks',
+        lambda code, addr: {'suicidal': True, 'prodigal': False, 'greedy': False},
+    )
+    address_file = tmp_path / 'addrs.txt'
+    reports = asyncio.run(fetch_and_check.scan_contracts_async(
+        3,
+        provider_url=node.url,
+        concurrency=4,
+        workers=1,
+        search_depth=2,
+        address_file=str(address_file),
+        report_dir=str(tmp_path / 'reports'),
+        executor=ThreadPoolExecutor(1),
+    ))
+    addrs = [r['address'].lower() for r in reports]
+    assert sorted(addrs) == [ADDRS[1], ADDRS[3], ADDRS[5]]
+    assert all(r['suicidal'] for r in reports)
+    assert len((tmp_path / 'reports' / 'suicidal.txt').read_text().splitlines()) == 3
+    assert len(address_file.read_text().splitlines()) == 3
@@ -31,3 +31,31 @@ def test_random_contract_address_error():
     w3.eth = types.SimpleNamespace(block_number=1, get_block=lambda *a, **k: types.SimpleNamespace(transactions=[]), get_code=lambda a: b'')
     with pytest.raises(RuntimeError):
         fetch_and_check.random_contract_address(w3, search_depth=1, attempts=1)
+
+
+def test_analysis_modules_do_not_import_web3():
+    import subprocess
+    code = (
+        "import sys; import fetch_and_check, check_lock, maian; "
+        "print(','.join(m for m in ('web3', 'rlp') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=str(root_dir / 'tool'),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert out.strip() == ''
+
+
+def test_read_storage_is_rejected_with_concurrency():
+    import subprocess
+    proc = subprocess.run(
+        [sys.executable, 'fetch_and_check.py', '--read-storage', '--concurrency', '2'],
+        cwd=str(root_dir / 'tool'),
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 2
+    assert '--read-storage is not supported with --concurrency' in proc.stderr
@@ -1,4 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import subprocess
 import sys
 import json
 
@@ -37,3 +39,58 @@ def test_scan_bigquery_with_java(monkeypatch, tmp_path):
     )
     assert len(reports) == 2
     assert reports[1]['suicidal']
+
+
+def test_stream_java_fetcher_reads_stdout(monkeypatch):
+    script = (
+        'import json\n'
+        'for i in range(3):\n'
+        '    print(json.dumps({"Address": hex(i), "ByteCode": "aa", "BlockNumber": i}), flush=True)\n'
+    )
+    monkeypatch.setattr(
+        java_bigquery_scanner, '_java_command',
+        lambda *args: [sys.executable, '-c', script],
+    )
+    rows = list(java_bigquery_scanner.stream_java_fetcher('jar', 'ds', 0, 2))
+    assert [r['BlockNumber'] for r in rows] == [0, 1, 2]
+
+
+def test_stream_java_fetcher_failure(monkeypatch):
+    monkeypatch.setattr(
+        java_bigquery_scanner, '_java_command',
+        lambda *args: [sys.executable, '-c', 'import sys; sys.exit(3)'],
+    )
+    try:
+        list(java_bigquery_scanner.stream_java_fetcher('jar', 'ds', 0, 2))
+    except subprocess.CalledProcessError as exc:
+        assert exc.returncode == 3
+    else:
+        raise AssertionError('expected CalledProcessError')
+
+
+def test_scan_bigquery_streaming(monkeypatch, tmp_path):
+    report = tmp_path / 'out' / 'reports.jsonl'
+
+    def fake_stream(jar, dataset, start, end):
+        for i in range(5):
+            # Reports are written while the fetcher is still producing rows
+            written = len(report.read_text().splitlines()) if report.exists() else 0
+            assert i - written <= 2
+            yield {"Address": hex(i), "ByteCode": "ff" if i % 2 else "00", "BlockNumber": i}
+
+    def fake_checks(bytecode, address):
+        return {"suicidal": bytecode == "ff", "prodigal": False, "greedy": False}
+
+    monkeypatch.setattr(java_bigquery_scanner, 'stream_java_fetcher', fake_stream)
+    monkeypatch.setattr(java_bigquery_scanner, 'run_checks', fake_checks)
+
+    summary = java_bigquery_scanner.scan_bigquery_streaming(
+        'ds', 0, 4,
+        report_file=str(report),
+        max_pending=2,
+        executor=ThreadPoolExecutor(1),
+    )
+    assert summary == {"scanned": 5, "suicidal": 2, "prodigal": 0, "greedy": 0}
+    lines = [json.loads(l) for l in report.read_text().splitlines()]
+    assert [l['block_number'] for l in lines] == [0, 1, 2, 3, 4]
+    assert [l['suicidal'] for l in lines] == [False, True, False, True, False]
@@ -0,0 +1,154 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import http.client
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+import maian_server
+
+
+def _fake_check(bytecode, address):
+    return {'suicidal': bytecode == 'ff', 'prodigal': False, 'greedy': False}
+
+
+def _fragile_check(bytecode, address):
+    if bytecode == 'dead':
+        os._exit(1)  # like a z3 segfault or an OOM kill
+    if bytecode == 'slow':
+        time.sleep(60)
+    if bytecode == 'stuck':
+        # Like a call into z3 that does not return to the interpreter
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+        time.sleep(60)
+    return _fake_check(bytecode, address)
+
+
+def _start(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def _service():
+    return maian_server.AnalysisService(
+        1, executor=ThreadPoolExecutor(1), check_fn=_fake_check
+    )
+
+
+def test_check_single_and_batch():
+    service = _service()
+    server = maian_server.make_server(service, port=0)
+    _start(server)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        req = urllib.request.Request(
+            base + '/check',
+            data=json.dumps({'bytecode': '0xff', 'address': '0x1'}).encode(),
+            method='POST',
+        )
+        res = json.loads(urllib.request.urlopen(req).read())
+        assert res == {
+            'suicidal': True, 'prodigal': False, 'greedy': False, 'address': '0x1'
+        }
+
+        batch = {'contracts': [
+            {'bytecode': '00', 'address': '0x2'},
+            {'bytecode': 'ff', 'address': '0x3'},
+        ]}
+        req = urllib.request.Request(
+            base + '/check', data=json.dumps(batch).encode(), method='POST'
+        )
+        res = json.loads(urllib.request.urlopen(req).read())
+        assert [r['address'] for r in res['results']] == ['0x2', '0x3']
+        assert [r['suicidal'] for r in res['results']] == [False, True]
+
+        stats = json.loads(urllib.request.urlopen(base + '/stats').read())
+        assert stats['processed'] == 3
+        assert stats['queue_depth'] == 0
+        assert stats['contracts_per_second'] > 0
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.shutdown()
+
+
+def test_bad_request():
+    service = _service()
+    server = maian_server.make_server(service, port=0)
+    _start(server)
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+        for body in (b'{"foo": 1}', b'{"contracts": "x"}', b'{"contracts": [1]}', b'5', b'[]'):
+            conn.request('POST', '/check', body=body)
+            res = conn.getresponse()
+            assert res.status == 400 and 'error' in json.loads(res.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.shutdown()
+
+
+def test_unix_socket(tmp_path):
+    path = str(tmp_path / 'maian.sock')
+    service = _service()
+    server = maian_server.make_server(service, unix_socket=path)
+    _start(server)
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        sock.sendall(b'GET /health HTTP/1.0\r\n\r\n')
+        data = b''
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        sock.close()
+        assert data.startswith(b'HTTP/1.0 200')
+        assert json.loads(data.split(b'\r\n\r\n', 1)[1]) == {'status': 'ok'}
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.shutdown()
+
+
+def test_pool_survives_dying_and_slow_workers(monkeypatch):
+    monkeypatch.setattr(maian_server, 'KILL_GRACE', 0.5)
+    service = maian_server.AnalysisService(2, check_fn=_fragile_check, timeout=1)
+    try:
+        res = service.check_batch([{'bytecode': 'dead', 'address': '0x1'}])
+        assert 'error' in res[0]
+        # The broken pool is replaced and later contracts are analysed
+        res = service.check_batch([
+            {'bytecode': 'slow', 'address': '0x2'},
+            {'bytecode': 'ff', 'address': '0x3'},
+        ])
+        assert 'exceeded' in res[0]['error'] and res[1]['suicidal']
+        res = service.check_batch([{'bytecode': 'stuck'}, {'bytecode': 'ff'}])
+        assert 'exceeded' in res[0]['error']
+        assert service.check_batch([{'bytecode': 'ff'}])[0]['suicidal']
+        stats = service.stats()
+        assert stats['in_flight'] == stats['queue_depth'] == 0
+        assert stats['pool_restarts'] >= 2
+    finally:
+        service.shutdown()
+
+
+def test_failed_submit_is_not_counted(monkeypatch):
+    executor = ThreadPoolExecutor(1)
+    executor.shutdown()
+    service = maian_server.AnalysisService(1, executor=executor, check_fn=_fake_check)
+    with pytest.raises(RuntimeError):
+        service.submit('ff')
+    assert service.stats()['in_flight'] == 0
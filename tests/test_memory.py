@@ -0,0 +1,132 @@
+from pathlib import Path
+import copy
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from z3 import BitVec, BitVecVal, Extract, Solver, simplify, unsat
+
+import execute_instruction
+from values import SymWord
+from memory import Memory, PAGE_SIZE
+
+
+def _const(value, step=0):
+    return SymWord.constant(step, BitVecVal(value, 256))
+
+
+def _sym(name):
+    return SymWord.constant(0, BitVec(name, 256))
+
+
+def _value(res):
+    return execute_instruction.get_value(res)
+
+
+def _same(a, b):
+    s = Solver()
+    s.add(a != b)
+    return s.check() == unsat
+
+
+def test_unaligned_concrete_load_and_store():
+    m = Memory()
+    m.store_word(0, _const(int('11' * 32, 16)))
+    m.store_word(32, _const(int('22' * 32, 16)))
+    assert _value(m.load_word(16, 1)) == int('11' * 16 + '22' * 16, 16)
+    m.store_word(5, _const(0))
+    assert m.concrete_bytes(0, 40) == b'\x11' * 5 + bytes(32) + b'\x22' * 3
+    assert m.size() == 64
+
+
+def test_store_across_page_boundary():
+    m = Memory()
+    m.store_word(PAGE_SIZE - 7, _const(2 ** 256 - 1))
+    assert _value(m.load_word(PAGE_SIZE - 7, 1)) == 2 ** 256 - 1
+    assert _value(m.load_word(PAGE_SIZE, 1)) == (2 ** 200 - 1) << 56
+
+
+def test_symbolic_word_roundtrip_and_unaligned_read():
+    m = Memory()
+    x = _sym('x')
+    m.store_word(0, x)
+    assert m.load_word(0, 1)['z3'].eq(x['z3'])
+    word = m.load_word(8, 1)['z3']
+    assert _same(Extract(255, 64, word), Extract(191, 0, x['z3']))
+    assert _same(Extract(63, 0, word), 0)
+    assert m.concrete_bytes(0, 32) is None
+    assert m.concrete_bytes(32, 32) == bytes(32)
+
+
+def test_partial_overwrite_splits_symbolic_word():
+    m = Memory()
+    x = _sym('x')
+    m.store_word(0, x)
+    m.store_word(16, _const(0))
+    word = m.load_word(0, 1)['z3']
+    assert _same(Extract(255, 128, word), Extract(255, 128, x['z3']))
+    assert _same(Extract(127, 0, word), 0)
+
+
+def test_undefined_region():
+    m = Memory()
+    m.store_word(0, _const(1))
+    m.mark_undefined(0, 40, 3)
+    assert m.load_word(0, 4).kind == 'undefined'
+    assert m.load_word(8, 4).kind == 'undefined'
+    assert _value(m.load_word(40, 4)) == 0
+
+
+def test_store_byte():
+    m = Memory()
+    m.store_word(0, _const(0))
+    m.store_byte(3, _const(0x1ff))
+    assert m.concrete_bytes(0, 4) == b'\x00\x00\x00\xff'
+    m.store_byte(31, _sym('y'))
+    assert _same(Extract(7, 0, m.load_word(0, 1)['z3']), Extract(7, 0, BitVec('y', 256)))
+
+
+def test_copies_do_not_share_writes():
+    m = Memory()
+    m.store_word(0, _const(1))
+    m.store_word(32, _sym('x'))
+    c = copy.deepcopy(m)
+    assert c == m
+    c.store_word(0, _const(2))
+    c.store_word(40, _const(0))
+    assert _value(m.load_word(0, 1)) == 1
+    assert m.load_word(32, 1)['z3'].eq(BitVec('x', 256))
+    assert c != m
+
+
+def test_substitute_does_not_touch_copies():
+    m = Memory()
+    m.store_word(0, _sym('x'))
+    c = m.copy()
+    c.substitute((BitVec('x', 256), BitVecVal(7, 256)))
+    assert _value(c.load_word(0, 1)) == 7
+    assert m.load_word(0, 1)['z3'].eq(BitVec('x', 256))
+
+
+def test_equality_ignores_untouched_zero_pages():
+    a, b = Memory(), Memory()
+    a.store_word(2 * PAGE_SIZE, _const(0))
+    assert a == b
+    a.store_word(0, _sym('x'))
+    b.store_word(0, _sym('x'))
+    assert a == b
+    b.store_word(0, _sym('z'))
+    assert a != b
+
+
+def test_mstore_mload_instructions_unaligned():
+    code = [{'id': 0, 'op': '52', 'input': '', 'o': 'MSTORE'},
+            {'id': 1, 'op': '51', 'input': '', 'o': 'MLOAD'}]
+    m = Memory()
+    stack = [_const(0xabcd), _const(3)]
+    execute_instruction.execute(code, stack, 0, {}, m, {}, [], 1, False, False)
+    stack.append(_const(3))
+    execute_instruction.execute(code, stack, 1, {}, m, {}, [], 1, False, False)
+    assert _value(stack[-1]) == 0xabcd
+    assert simplify(m.load_word(0, 1)['z3']).as_long() == 0xabcd >> 24
@@ -0,0 +1,24 @@
+from pathlib import Path
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from parse_code import parse_code
+
+
+def test_parse_bytes_matches_hex():
+    for name in ('greedy', 'prodigal', 'suicidal'):
+        path = root_dir / 'tool' / 'example_contracts' / f'example_{name}.bytecode'
+        code = path.read_text().strip()
+        if code.startswith('0x'):
+            code = code[2:]
+        raw = bytes.fromhex(code)
+        assert parse_code(raw) == parse_code(code)
+        assert parse_code(memoryview(bytearray(raw))) == parse_code(code)
+
+
+def test_parse_bytes_truncated_push():
+    assert parse_code(b'\x61\x01') == [
+        {'id': 0, 'op': '61', 'input': '01', 'o': 'PUSH2'}
+    ]
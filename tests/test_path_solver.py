@@ -0,0 +1,156 @@
+from pathlib import Path
+import contextlib
+import io
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from z3 import ULT, BitVec, BitVecVal, sat, unknown, unsat
+
+import check_leak
+import check_suicide
+import path_solver
+from path_solver import CounterexampleCache, PathSolver, constraint_vars
+from values import MyGlobals
+
+ADDRESS = '0x' + '11' * 20
+
+
+def _bytecode(name):
+    path = root_dir / 'tool' / 'example_contracts' / f'example_{name}.bytecode'
+    return path.read_text().strip()[2:]
+
+
+def test_constraint_vars():
+    x, y = BitVec('x', 256), BitVec('y', 256)
+    assert constraint_vars(x + y > 3) == frozenset(['x', 'y'])
+    assert constraint_vars(BitVecVal(1, 256) == 1) == frozenset()
+
+
+def test_check_sends_only_dependent_constraints(monkeypatch):
+    monkeypatch.setattr(path_solver, 'STATS', path_solver.SolverStats())
+    x, y, z = (BitVec(n, 256) for n in 'xyz')
+    s = PathSolver()
+    s.add([x > 10, y == z, z > 5])
+    assert s.check() == sat
+    assert path_solver.STATS.slice_size == 3
+    s.push()
+    s.add(x < 20)
+    assert s.check() == sat
+    # x > 10 and x < 20; y and z are independent
+    assert path_solver.STATS.slice_size == 3 + 2
+    s.push()
+    s.add(y == 2)
+    assert s.check() == unsat
+    # y == z pulls in z > 5 as well
+    assert path_solver.STATS.slice_size == 5 + 3
+    s.pop()
+    assert s.check() == sat
+    assert path_solver.STATS.known == 1
+    m = s.model()
+    assert 10 < m.eval(x).as_long() < 20 and m.eval(z).as_long() > 5
+
+
+def test_slices_share_one_incremental_solver():
+    x, y = BitVec('x', 256), BitVec('y', 256)
+    s = PathSolver()
+    s.add(x > 10)
+    assert s.check() == sat
+    for bound in (20, 30):
+        s.push()
+        s.add(x < bound, y == bound)
+        assert s.check() == sat
+        assert len(s._z3.assertions()) == 3
+        s.pop()
+        # The branch's constraints left the solver with the frame
+        assert len(s._z3.assertions()) == 1
+
+
+def test_model_is_none_without_answer():
+    x, y = BitVec('x', 256), BitVec('y', 256)
+    s = PathSolver()
+    s.add(x > 5, x < 3)
+    assert s.model() is None
+    s = PathSolver()
+    s.set('timeout', 1)
+    s.add(x * y == (2 ** 127 - 1) * (2 ** 89 - 1), x > 1, y > 1, ULT(x, 2 ** 128), ULT(y, 2 ** 128))
+    assert s.check() == unknown
+    assert s.model() is None
+
+
+def test_check_without_slicing_sends_the_path(monkeypatch):
+    monkeypatch.setattr(path_solver, 'STATS', path_solver.SolverStats())
+    x, y = BitVec('x', 256), BitVec('y', 256)
+    s = PathSolver(slicing=False, compare=True)
+    s.add(x > 1)
+    s.assume_satisfiable()
+    s.add(y > 1)
+    assert s.check() == sat
+    assert path_solver.STATS.slice_size == path_solver.STATS.path_size == 2
+    assert path_solver.STATS.compared == 0
+
+
+def test_cache_answers_from_models_and_unsat_sets(monkeypatch):
+    monkeypatch.setattr(path_solver, 'STATS', path_solver.SolverStats())
+    x, y = BitVec('x', 256), BitVec('y', 256)
+    cache = CounterexampleCache()
+    s = PathSolver(cache=cache)
+    s.push()
+    s.add(x > 10, x < 20)
+    assert s.check() == sat
+    s.pop()
+    s.push()
+    s.add(x == 2, y == 3)
+    s.add(x == 3)
+    assert s.check() == unsat
+    s.pop()
+
+    # The model of x > 10, x < 20 satisfies x > 5 in a new solver
+    s = PathSolver(cache=cache)
+    s.add(x > 5)
+    assert s.check() == sat
+    # A superset of the unsatisfiable set
+    s.add(y == 3, x == 2, x == 3)
+    assert s.check() == unsat
+    assert (path_solver.STATS.cache_sat, path_solver.STATS.cache_unsat, path_solver.STATS.solved) == (1, 1, 2)
+    s = PathSolver(cache=cache)
+    s.add(x > 100)
+    assert s.check() == sat
+    assert path_solver.STATS.solved == 3
+    assert path_solver.STATS.summary()['cache_hit_rate'] == 2 / 5
+
+
+def test_slicing_keeps_verdicts(monkeypatch):
+    monkeypatch.setattr(MyGlobals, 'max_calldepth_in_normal_search', 3)
+    verdicts = {}
+    for slicing in (False, True):
+        monkeypatch.setattr(MyGlobals, 'slice_constraints', slicing)
+        monkeypatch.setattr(MyGlobals, 'use_solver_cache', False)
+        monkeypatch.setattr(path_solver, 'STATS', path_solver.SolverStats())
+        with contextlib.redirect_stdout(io.StringIO()):
+            verdicts[slicing] = [
+                bool(check_suicide.check_one_contract_on_suicide(_bytecode(name), ADDRESS, False, False))
+                for name in ('suicidal', 'prodigal')
+            ] + [bool(check_leak.check_one_contract_on_ether_leak(_bytecode('prodigal'), ADDRESS))]
+        stats = path_solver.STATS.summary()
+        if slicing:
+            assert stats['avg_slice'] < stats['avg_path']
+        else:
+            assert stats['avg_slice'] == stats['avg_path']
+    assert verdicts[True] == verdicts[False] == [True, False, True]
+
+
+def test_cache_keeps_verdicts(monkeypatch):
+    monkeypatch.setattr(MyGlobals, 'max_calldepth_in_normal_search', 3)
+    verdicts = {}
+    for cached in (False, True):
+        monkeypatch.setattr(MyGlobals, 'use_solver_cache', cached)
+        monkeypatch.setattr(path_solver, 'STATS', path_solver.SolverStats())
+        with contextlib.redirect_stdout(io.StringIO()):
+            verdicts[cached] = [
+                bool(check_leak.check_one_contract_on_ether_leak(_bytecode(name), ADDRESS))
+                for name in ('suicidal', 'prodigal')
+            ]
+        assert (path_solver.STATS.summary()['cache_hit_rate'] > 0) == cached
+    assert verdicts[True] == verdicts[False] == [False, True]
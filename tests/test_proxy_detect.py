@@ -0,0 +1,77 @@
+from pathlib import Path
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from proxy_detect import ProxyInfo, VerdictCache, detect_proxy
+
+IMPL = 'bebebebebebebebebebebebebebebebebebebebe'
+EIP1167 = '363d3d373d3d3d363d73' + IMPL + '5af43d82803e903d91602b57fd5bf3'
+
+
+def test_detects_eip1167():
+    assert detect_proxy(EIP1167) == ProxyInfo('eip1167', '0x' + IMPL)
+    assert detect_proxy('0x' + EIP1167.upper()) == ProxyInfo('eip1167', '0x' + IMPL)
+    assert detect_proxy(bytes.fromhex(EIP1167)) == ProxyInfo('eip1167', '0x' + IMPL)
+
+
+def test_detects_variants():
+    # Vanity address with four leading zero bytes pushed with PUSH16
+    short = '363d3d373d3d3d363d6f' + IMPL[:32] + '5af43d82803e903d91602757fd5bf3'
+    assert detect_proxy(short) == ProxyInfo('eip1167', '0x00000000' + IMPL[:32])
+    push0 = '365f5f375f5f365f73' + IMPL + '5af43d5f5f3e5f3d91602a57fd5bf3'
+    assert detect_proxy(push0).kind == 'eip7511'
+    vyper = '366000600037611000600036600073' + IMPL + '5af4602c57600080fd5b6110006000f3'
+    assert detect_proxy(vyper).kind == 'vyper'
+
+
+def test_ignores_other_code():
+    assert detect_proxy('6000ff') is None
+    assert detect_proxy(EIP1167 + '00') is None
+    assert detect_proxy(EIP1167.replace('5af4', '5af2')) is None
+
+
+def test_proxy_waits_for_implementation_and_is_resolved():
+    calls = []
+
+    def run(bytecode, address):
+        calls.append(address)
+        return {'suicidal': True}
+
+    with VerdictCache() as cache:
+        verdict, resolved, proxy = cache.check(EIP1167, '0xP1', run, block=7)
+        assert verdict is None and resolved == [] and proxy.implementation == '0x' + IMPL
+        assert cache.waiting() == ['0x' + IMPL]
+        verdict, resolved, proxy = cache.check('6000ff', '0x' + IMPL.upper(), run)
+        assert verdict == {'suicidal': True, 'prodigal': False, 'greedy': False}
+        assert proxy is None
+        assert resolved == [dict(verdict, address='0xp1', block=7, proxy='eip1167', implementation='0x' + IMPL)]
+        assert cache.get('0xP1')['suicidal']
+        assert cache.waiting() == []
+
+        # Later proxies and copies of the code are not analysed
+        verdict, _, _ = cache.check(EIP1167, '0xP2', run)
+        assert verdict['suicidal'] and verdict['implementation'] == '0x' + IMPL
+        assert cache.check('6000ff', '0xcopy', run)[0]['suicidal']
+    assert calls == ['0x' + IMPL.upper()]
+    assert cache.stats == {'checked': 1, 'code_hits': 1, 'delegated': 2, 'waiting': 1}
+
+
+def test_cache_persists_by_version(tmp_path):
+    path = str(tmp_path / 'sub' / 'verdicts.sqlite')
+    with VerdictCache(path) as cache:
+        cache.check('6000ff', '0x1', lambda b, a: {'greedy': True})
+    with VerdictCache(path) as cache:
+        assert cache.get('0x1')['greedy']
+    with VerdictCache(path, analysis_version='2') as cache:
+        assert cache.get('0x1') is None
+
+
+def test_proxy_checked_on_its_own_code_stops_waiting():
+    with VerdictCache() as cache:
+        assert cache.check(EIP1167, '0xP1', lambda b, a: {})[0] is None
+        verdict, _, proxy = cache.check(EIP1167, '0xP1', lambda b, a: {'greedy': True}, delegate=False)
+        assert verdict == {'suicidal': False, 'prodigal': False, 'greedy': True} and proxy.kind == 'eip1167'
+        assert cache.waiting() == []
+        assert cache.check('6000ff', '0x' + IMPL, lambda b, a: {})[1] == []
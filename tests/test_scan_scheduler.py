@@ -0,0 +1,54 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from scan_scheduler import BlockScheduler, CoverageMap
+
+
+def test_coverage_map_merges_and_reports_gaps():
+    cov = CoverageMap()
+    cov.add(10, 19)
+    cov.add(30, 39)
+    cov.add(20, 25)
+    assert cov.ranges == [(10, 25), (30, 39)]
+    assert cov.gaps(0, 50) == [(0, 9), (26, 29), (40, 50)]
+    cov.add(26, 29)
+    assert cov.ranges == [(10, 39)]
+    assert cov.contains(10) and cov.contains(39) and not cov.contains(40)
+    assert cov.covered() == 30
+    assert CoverageMap.from_json(cov.to_json()).ranges == cov.ranges
+
+
+def test_scheduler_splits_batches_by_ratio():
+    cov = CoverageMap([(90, 100)])
+    sched = BlockScheduler(cov, 90, batch_blocks=5, head_ratio=0.5)
+    kinds = []
+    latest = 100
+    for _ in range(6):
+        latest += 10
+        kind, start, end = sched.next_batch(latest)
+        cov.add(start, end)
+        kinds.append((kind, start, end))
+    assert [k for k, _, _ in kinds] == ['head', 'backfill'] * 3
+    assert kinds[0] == ('head', 106, 110)
+    assert kinds[1] == ('backfill', 85, 89)
+    assert kinds[2] == ('head', 126, 130)
+    # Once the head stops moving, the gaps behind it are filled newest first
+    assert sched.next_batch(latest) == ('head', 156, 160)
+    cov.add(156, 160)
+    assert sched.next_batch(latest) == ('backfill', 70, 74)
+    assert sched.next_batch(latest) == ('head', 151, 155)
+
+
+def test_scheduler_uses_idle_frontier_capacity():
+    cov = CoverageMap([(0, 100)])
+    sched = BlockScheduler(cov, 50, batch_blocks=10, head_ratio=0.0)
+    assert sched.next_batch(105) == ('head', 101, 105)
+    cov.add(101, 105)
+    assert sched.next_batch(105) is None
+    with pytest.raises(ValueError):
+        BlockScheduler(cov, 0, head_ratio=2)
@@ -0,0 +1,72 @@
+from pathlib import Path
+import contextlib
+import io
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from z3 import BitVec, URem, UDiv, sat, unknown, unsat
+
+import path_solver
+from fetch_and_check import run_checks
+from path_solver import PathSolver
+from solver_portfolio import Portfolio, make_solver, parse_config
+from values import MyGlobals
+
+ADDRESS = '0x' + '11' * 20
+
+
+def _bytecode(name):
+    path = root_dir / 'tool' / 'example_contracts' / f'example_{name}.bytecode'
+    return path.read_text().strip()[2:]
+
+
+def test_configurations():
+    x = BitVec('x', 256)
+    assert parse_config('qfbv') == ('qfbv', 10000)
+    assert parse_config('qfbv@5', 100) == ('qfbv', 5)
+    for name in ('bv', 'simplify+bit-blast+sat'):
+        s = make_solver(name, 5000)
+        s.add(URem(x, 7) == 3, UDiv(x, 7) == 2)
+        assert s.check() == sat and s.model().eval(x).as_long() == 17
+
+
+def test_first_definitive_answer_wins():
+    x = BitVec('x', 256)
+    # The unknown tactic fails, the other configuration answers
+    portfolio = Portfolio(['no-such-tactic', 'bv'])
+    assert portfolio.solve([UDiv(x, 3) == 5], 5000) == (sat, 'bv')
+    assert portfolio.solve([x > 5, x < 3], 5000) == (unsat, 'bv')
+    assert Portfolio(['no-such-tactic']).solve([x > 5], 5000) == (unknown, None)
+    # qfbv runs into the timeout here, bit-blasting is instant
+    hard = [URem(x, 7) == 3, UDiv(x, 7) == 2]
+    assert Portfolio(['qfbv@1000', 'simplify+bit-blast+sat']).solve(hard, 5000) == (sat, 'simplify+bit-blast+sat')
+
+
+def test_path_solver_races_slow_queries(monkeypatch):
+    monkeypatch.setattr(path_solver, 'STATS', path_solver.SolverStats())
+    x = BitVec('x', 256)
+    s = PathSolver(portfolio=Portfolio(['bv'], threshold=0))
+    s.add(URem(x, 10) == 4)
+    assert s.check() == sat
+    s.add(x == 5)
+    assert s.check() == unsat
+    assert path_solver.STATS.raced == 2
+    assert path_solver.STATS.portfolio_wins == {'bv': 2}
+    assert 'wins: bv x2' in str(path_solver.STATS)
+    # A query answered within the threshold is not raced
+    s = PathSolver(portfolio=Portfolio(['bv'], threshold=5000))
+    s.add(x > 1)
+    assert s.check() == sat
+    assert path_solver.STATS.raced == 2
+
+
+def test_run_checks_reports_winners(monkeypatch):
+    monkeypatch.setattr(MyGlobals, 'portfolio', ['default', 'bv'])
+    monkeypatch.setattr(MyGlobals, 'portfolio_threshold', 0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run_checks(_bytecode('greedy'), ADDRESS)
+    assert results['greedy'] and not results['suicidal']
+    assert sum(results['portfolio_wins'].values()) > 0
+    assert set(results['portfolio_wins']) <= {'default', 'bv'}
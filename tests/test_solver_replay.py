@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import contextlib
+import io
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+import path_solver
+from fetch_and_check import run_checks
+from parse_code import parse_code
+from solver_replay import QueryRecorder, parse_config, read_queries, replay
+
+ADDRESS = '0x' + '11' * 20
+
+
+def _bytecode(name):
+    path = root_dir / 'tool' / 'example_contracts' / f'example_{name}.bytecode'
+    return path.read_text().strip()[2:]
+
+
+def test_parse_config():
+    assert parse_config('default') == ('default', 10000)
+    assert parse_config('simplify+bit-blast+sat@500') == ('simplify+bit-blast+sat', 500)
+
+
+def test_record_and_replay(tmp_path, monkeypatch):
+    archive = tmp_path / 'queries' / 'q.jsonl.gz'
+    recorder = QueryRecorder(str(archive), buffer=10)
+    monkeypatch.setattr(path_solver, 'RECORDER', recorder)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run_checks(_bytecode('suicidal'), ADDRESS)
+    recorder.close()
+    assert results['suicidal']
+
+    records = list(read_queries(str(tmp_path / 'queries')))
+    assert len(records) == recorder.count > 0
+    assert {r['check'] for r in records} == {'suicidal', 'prodigal', 'greedy'}
+    assert {r['source'] for r in records} <= {'z3', 'cache'}
+    first = [r for r in records if r['check'] == 'prodigal'][:2]
+    assert [r['query_index'] for r in first] == [0, 1] and first[0]['contract'] == ADDRESS
+    # Each query comes from a JUMPI or a searched instruction of the contract
+    ops = {op['id']: op['o'] for op in parse_code(_bytecode('suicidal'))}
+    assert {ops[r['step']] for r in records} <= {'JUMPI', 'CALL', 'SUICIDE'}
+
+    # Flip one recorded answer to get a disagreement
+    records[0] = dict(records[0], result='unsat' if records[0]['result'] == 'sat' else 'sat')
+    report = replay(records, ['default', 'qfbv@2000'], executor=ThreadPoolExecutor(1))
+    for stats in report.values():
+        assert stats['sat'] + stats['unsat'] == len(records)
+        assert [(d['check'], d['query_index']) for d in stats['disagreements']] == [(records[0]['check'], 0)]
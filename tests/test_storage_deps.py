@@ -0,0 +1,115 @@
+from pathlib import Path
+import contextlib
+import io
+import sys
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from z3 import BitVec, BitVecVal, Concat, If
+
+import check_leak
+import check_suicide
+from parse_code import parse_code
+from storage_deps import (
+    ANY,
+    SequencePruner,
+    access_sets,
+    function_slots,
+    matched_selector,
+    overlaps,
+    selector_term,
+)
+from values import MyGlobals
+
+ADDRESS = '0x' + '11' * 20
+
+
+def _bytecode(name):
+    path = root_dir / 'tool' / 'example_contracts' / f'example_{name}.bytecode'
+    return path.read_text().strip()[2:]
+
+
+def _ops(asm):
+    """Assemble ``[(op name, push input)]`` into parse_code's format."""
+    ops, pc = [], 0
+    for o, inp in asm:
+        ops.append({'id': pc, 'op': '', 'o': o, 'input': inp})
+        pc += 1 + len(inp) // 2
+    return ops
+
+
+def test_function_slots_of_example():
+    slots = function_slots(parse_code(_bytecode('suicidal')))
+    # kill() reads the owner and writes nothing
+    assert slots[0x41c0e1b5] == (frozenset([0]), frozenset())
+    # The array at slot 4 is read through its folded keccak(4) base
+    assert slots[0xc8691b2a][0] == frozenset([('map', 4), 4])
+    assert slots[None] == (frozenset(), frozenset())
+
+
+def test_mapping_slots_and_unknown_jumps():
+    # mapping at slot 3: sstore(keccak(key . 3), 1)
+    ops = _ops([('PUSH1', '01'), ('PUSH1', '04'), ('CALLDATALOAD', ''), ('PUSH1', '00'), ('MSTORE', ''),
+                ('PUSH1', '03'), ('PUSH1', '20'), ('MSTORE', ''), ('PUSH1', '40'), ('PUSH1', '00'), ('SHA3', ''),
+                ('SSTORE', ''), ('STOP', '')])
+    assert access_sets(ops, 0) == (frozenset(), frozenset([('map', 3)]))
+    ops = _ops([('PUSH1', '00'), ('CALLDATALOAD', ''), ('JUMP', '')])
+    assert access_sets(ops, 0) == (ANY, ANY)
+
+
+def test_overlaps():
+    assert overlaps({1}, {1, 2})
+    assert not overlaps({1}, {('map', 1)})
+    assert overlaps({('map', 1)}, {('map', None)})
+    assert not overlaps({('map', 1)}, {('map', 2)})
+    assert overlaps(ANY, {5})
+    assert not overlaps(ANY, set())
+
+
+def test_pruner_keeps_only_dependent_orderings():
+    empty = frozenset()
+    pruner = SequencePruner({
+        1: (empty, frozenset([0])),         # init: writes the owner
+        2: (frozenset([0]), empty),         # kill: reads the owner
+        3: (empty, empty),                  # view
+        None: (empty, empty),
+    })
+    # Any function may be called first, the sequence can end there
+    assert pruner.excluded((), 2) == []
+    # After init a view call can only be followed by calls ignoring init
+    assert pruner.excluded(pruner.after((), 1), 1) == [3]
+    # Only kill reads what init wrote
+    assert pruner.excluded(pruner.after((), 1), 0) == [1, 3]
+    # An unknown call may have written anything
+    assert pruner.excluded((None,), 0) == [1, 3]
+
+
+def test_pruning_keeps_verdicts_and_explores_less(monkeypatch):
+    monkeypatch.setattr(MyGlobals, 'max_calldepth_in_normal_search', 3)
+    nodes = {}
+    for prune in (False, True):
+        monkeypatch.setattr(MyGlobals, 'prune_sequences', prune)
+        visited = []
+        original = check_leak.search_depth
+
+        def _search_depth(*args, original=original, visited=visited):
+            result = original(*args)
+            visited.append(MyGlobals.visited_nodes)
+            return result
+
+        monkeypatch.setattr(check_leak, 'search_depth', _search_depth)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert check_leak.check_one_contract_on_ether_leak(_bytecode('suicidal'), ADDRESS) is False
+            assert check_suicide.check_one_contract_on_suicide(_bytecode('suicidal'), ADDRESS, False, False)
+        monkeypatch.setattr(check_leak, 'search_depth', original)
+        nodes[prune] = sum(visited)
+    assert nodes[True] < nodes[False]
+
+
+def test_matched_selector_finds_dispatcher_test():
+    padded = Concat(BitVecVal(0, 224), selector_term(2))
+    dispatch = If(padded == 0x41c0e1b5, BitVecVal(1, 256), BitVecVal(0, 256)) != 0
+    guard = [BitVec('CALLVALUE-2', 256) == 0, dispatch]
+    assert matched_selector(guard, 2) == 0x41c0e1b5
+    assert matched_selector(guard, 1) is None
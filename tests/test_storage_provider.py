@@ -0,0 +1,129 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import json
+import sys
+import threading
+
+import pytest
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir / 'tool'))
+
+from z3 import BitVecVal
+
+import execute_instruction
+from parse_code import parse_code
+from storage_provider import RPCStorageProvider, predict_storage_slots
+from values import MyGlobals, SymWord, set_params
+
+
+class FakeNode:
+    """Minimal JSON-RPC server answering eth_getStorageAt/eth_getBalance."""
+
+    def __init__(self, storage, balance=0):
+        self.storage = storage
+        self.balance = balance
+        self.requests = []
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                node.requests.append(body)
+                calls = body if isinstance(body, list) else [body]
+                out = []
+                for c in calls:
+                    if c['method'] == 'eth_getStorageAt':
+                        value = node.storage.get(int(c['params'][1], 16), 0)
+                    elif c['method'] == 'eth_getBalance':
+                        value = node.balance
+                    else:
+                        out.append({'jsonrpc': '2.0', 'id': c['id'],
+                                    'error': {'code': -32601, 'message': 'nope'}})
+                        continue
+                    out.append({'jsonrpc': '2.0', 'id': c['id'], 'result': hex(value)})
+                data = json.dumps(out if isinstance(body, list) else out[0]).encode()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def node():
+    n = FakeNode({0: 7, 1: 0x1234, 5: 9}, balance=100)
+    yield n
+    n.close()
+
+
+def test_predict_storage_slots():
+    ops = parse_code('600054600154600355')
+    assert predict_storage_slots(ops) == {0, 1}
+
+
+def test_fetch_uses_one_batch_and_cache(node):
+    provider = RPCStorageProvider(node.url, batch_size=10)
+    assert provider.fetch('0xAB', [0, 1, 5]) == {0: 7, 1: 0x1234, 5: 9}
+    assert len(node.requests) == 1
+    assert len(node.requests[0]) == 3
+    assert provider.get_storage('0xab', 1) == 0x1234
+    assert len(node.requests) == 1
+    assert provider.get_storage('0xab', 2) == 0
+    assert len(node.requests) == 2
+
+
+def test_batches_are_split(node):
+    provider = RPCStorageProvider(node.url, batch_size=2)
+    provider.fetch('0x1', range(5))
+    assert [len(r) for r in node.requests] == [2, 2, 1]
+
+
+def test_prefetch_async_and_balance(node):
+    provider = RPCStorageProvider(node.url)
+    provider.prefetch_async('0x1', [0, 5]).join()
+    assert provider.get_storage('0x1', 5) == 9
+    assert len(node.requests) == 1
+    assert provider.get_balance('0x1') == 100
+
+
+def test_prefetch_async_logs_errors(node, monkeypatch, caplog):
+    provider = RPCStorageProvider(node.url)
+
+    def fail(*args):
+        raise RuntimeError('401 Unauthorized')
+
+    monkeypatch.setattr(provider, 'fetch', fail)
+    provider.prefetch_async('0x1', [0]).join()
+    assert '0x1' in caplog.text and '401 Unauthorized' in caplog.text
+
+
+def test_rpc_error_raises(node):
+    provider = RPCStorageProvider(node.url)
+    with pytest.raises(RuntimeError):
+        provider._call_batch([('eth_unknown', [])])
+
+
+def test_sload_reads_through_provider(node):
+    provider = RPCStorageProvider(node.url)
+    set_params('contract_address', '', '0x1')
+    MyGlobals.storage_provider = provider
+    try:
+        code = [{'id': 0, 'op': '54', 'input': '', 'o': 'SLOAD'}]
+        stack = [SymWord.constant(0, BitVecVal(1, 256))]
+        storage = {}
+        execute_instruction.execute(code, stack, 0, storage, {}, {}, [], 1, False, True)
+    finally:
+        MyGlobals.storage_provider = None
+    assert execute_instruction.get_value(stack[-1]) == 0x1234
+    assert 1 in storage
@@ -11,10 +11,16 @@ import pyarrow.dataset as ds
 
 from data_getters import DataGetterAWSParquet
 from fetch_and_check import run_checks
+from contract_priority import prioritise as prioritise_contracts
 from contract_sqlite_loader import DEFAULT_PARQUET_DATASET
+from proxy_detect import VerdictCache
+from scan_scheduler import BlockScheduler, CoverageMap
 
 DEFAULT_STATE_FILE = "reports/aws_scanner_state.json"
 DEFAULT_REPORT_FILE = "reports/aws_scan_results.jsonl"
+DEFAULT_VERDICT_CACHE = "reports/verdict_cache.sqlite"
+# Bump when the checks change so earlier results are not treated as current
+ANALYSIS_VERSION = "1"
 
 logger = logging.getLogger(__name__)
 
@@ -34,9 +40,69 @@ def _load_state(path: str) -> dict:
 
 
 def _save_state(path: str, state: dict) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as fh:
+    """Write *state* atomically so a crash never leaves a truncated file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
         json.dump(state, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class ReportSink:
+    """Append-only JSONL report that writes each result at most once.
+
+    Entries are keyed by ``(address, analysis_version)``. Keys already in the
+    report file are loaded on start, so contracts re-scanned after a restart
+    do not produce duplicate lines.
+    """
+
+    def __init__(self, path: str, analysis_version: str = ANALYSIS_VERSION) -> None:
+        self.path = path
+        self.analysis_version = analysis_version
+        self._seen = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A partial last line from an interrupted write
+                        continue
+                    self._seen.add(
+                        (entry.get("address"), entry.get("analysis_version"))
+                    )
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def write(self, entry: dict) -> bool:
+        """Append *entry* unless it was written before. Returns ``True`` if written."""
+        entry = dict(entry, analysis_version=self.analysis_version)
+        key = (entry["address"], self.analysis_version)
+        if key in self._seen:
+            return False
+        self._fh.write(json.dumps(entry) + "\n")
+        self._seen.add(key)
+        return True
+
+    def flush(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        self._fh.close()
+
+    def __enter__(self) -> "ReportSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
 
 def make_live_progress() -> Callable[[str], None]:
@@ -48,36 +114,40 @@ def make_live_progress() -> Callable[[str], None]:
     return _cb
 
 
-def scan_once(
-    parquet_path: str,
-    *,
-    state_file: str = DEFAULT_STATE_FILE,
-    report_file: str = DEFAULT_REPORT_FILE,
-    batch_blocks: int = 1000,
-    page_rows: int = 2000,
-    progress_cb: Optional[Callable[[str], None]] = None,
-) -> bool:
-    """Process a single batch of contracts.
+def _scan_batch(
+    getter: DataGetterAWSParquet,
+    batch: dict,
+    state: dict,
+    state_file: str,
+    report_file: str,
+    progress_cb: Optional[Callable[[str], None]],
+    checkpoint_every: int,
+    prioritise: bool = False,
+    verdict_cache: Optional[str] = None,
+) -> int:
+    """Check the contracts of ``batch`` and return how many were checked.
 
-    Results are appended to ``report_file`` as JSON lines. Returns ``True`` if
-    new contracts were processed.
-    """
-    state = _load_state(state_file)
-    getter = DataGetterAWSParquet(parquet_path, page_rows=page_rows)
-    latest = _latest_block(parquet_path)
-    next_block = state.get("next_block")
-    last_known = state.get("last_known_latest")
-    if next_block is None:
-        next_block = latest
-        last_known = latest
-    elif latest > (last_known or -1):
-        next_block = latest
-        last_known = latest
-    start_block = max(next_block - batch_blocks + 1, 0)
-    end_block = next_block
-    if start_block > end_block:
-        return False
+    ``batch["done"]`` contracts at the start of the batch are skipped, and the
+    batch is saved in ``state["batch"]`` every ``checkpoint_every`` contracts.
+    With ``prioritise`` the contracts of the batch are checked in order of
+    :func:`contract_priority.priority_score`. The order only depends on the
+    rows, so it is the same when an interrupted batch is resumed.
 
+    Verdicts go through a :class:`proxy_detect.VerdictCache` stored in
+    ``verdict_cache`` (in memory for this batch when None). Proxy stubs get
+    the verdict of their implementation and copies of checked code are not
+    analysed again. A proxy whose implementation has not been checked yet is
+    reported once the implementation is. At the end of the batch the awaited
+    implementations are looked up in the whole dataset and checked; proxies
+    whose implementation is not in the dataset are checked on their own code.
+
+    The verdict cache is committed together with the report at each
+    checkpoint, so proxies resolved before a crash are reported again when
+    the batch is resumed.
+    """
+    start_block = batch["start_block"]
+    end_block = batch["end_block"]
+    done = batch["done"]
     logger.info("retrieving blocks %d-%d", start_block, end_block)
     t_fetch = time.time()
     pages = list(getter.fetch_chunk(start_block, end_block))
@@ -91,33 +161,69 @@ def scan_once(
         fetch_time,
     )
     logger.info("scanning %d contracts", num_contracts)
+    if prioritise:
+        pages = [list(prioritise_contracts(
+            (row for page in pages for row in page), lambda r: r["ByteCode"]
+        ))]
 
     processed = 0
+    position = 0
     t_scan = time.time()
-    os.makedirs(os.path.dirname(report_file), exist_ok=True)
-    with open(report_file, "a", encoding="utf-8") as out:
+    with ReportSink(report_file) as sink, VerdictCache(
+        verdict_cache or ":memory:", ANALYSIS_VERSION, autocommit=False
+    ) as verdicts:
+
+        def _check(row: dict, delegate: bool = True) -> None:
+            res, resolved, _ = verdicts.check(
+                row["ByteCode"], row["Address"], run_checks, row["BlockNumber"],
+                delegate=delegate,
+            )
+            entries = [dict(r) for r in resolved]
+            if res is not None:
+                entries.insert(0, dict(res, address=row["Address"], block=row["BlockNumber"]))
+            for entry in entries:
+                if entry["suicidal"] or entry["prodigal"] or entry["greedy"]:
+                    if sink.write(entry):
+                        logger.info(
+                            "vulnerable address %s at block %s",
+                            entry["address"],
+                            entry["block"],
+                        )
+
         for page in pages:
             for row in page:
-                res = run_checks(row["ByteCode"], row["Address"])
-                entry = {
-                    "address": row["Address"],
-                    "block": row["BlockNumber"],
-                    "suicidal": bool(res.get("suicidal")),
-                    "prodigal": bool(res.get("prodigal")),
-                    "greedy": bool(res.get("greedy")),
-                }
-                if entry["suicidal"] or entry["prodigal"] or entry["greedy"]:
-                    out.write(json.dumps(entry) + "\n")
-                    logger.info(
-                        "vulnerable address %s at block %d",
-                        entry["address"],
-                        entry["block"],
-                    )
+                position += 1
+                if position <= done:
+                    continue
+                _check(row)
                 processed += 1
+                if position % checkpoint_every == 0:
+                    # Reports must be on disk before the state points past them,
+                    # and before the cache forgets the proxies they resolve
+                    sink.flush()
+                    verdicts.commit()
+                    batch["done"] = position
+                    state["batch"] = batch
+                    _save_state(state_file, state)
                 if progress_cb:
                     progress_cb(
                         f"processed {processed} (block {row['BlockNumber']})"
                     )
+        waiting = len(verdicts.waiting())
+        stubs = set()
+        if waiting:
+            # Clone factories are often deployed long before their proxies
+            for page in getter.fetch_addresses(verdicts.waiting()):
+                for row in page:
+                    _check(row)
+            stubs = set(verdicts.waiting_proxies())
+            for page in pages:
+                for row in page:
+                    if row["Address"].lower() in stubs:
+                        _check(row, delegate=False)
+        sink.flush()
+        verdicts.commit()
+        stats = verdicts.stats
     scan_time = time.time() - t_scan
     logger.info(
         "completed scan of %d contracts from %d blocks in %.2fs",
@@ -125,14 +231,173 @@ def scan_once(
         num_blocks,
         scan_time,
     )
+    logger.info(
+        "analysed %d, reused %d identical, delegated %d proxies, %d implementations awaited, "
+        "%d proxies checked on their own code",
+        stats["checked"],
+        stats["code_hits"],
+        stats["delegated"],
+        waiting,
+        len(stubs),
+    )
     if progress_cb:
         print()
+    return processed
+
+
+def scan_once(
+    parquet_path: str,
+    *,
+    state_file: str = DEFAULT_STATE_FILE,
+    report_file: str = DEFAULT_REPORT_FILE,
+    batch_blocks: int = 1000,
+    page_rows: int = 2000,
+    progress_cb: Optional[Callable[[str], None]] = None,
+    checkpoint_every: int = 100,
+    prioritise: bool = False,
+    verdict_cache: Optional[str] = None,
+) -> bool:
+    """Process a single batch of contracts.
+
+    Results are appended to ``report_file`` as JSON lines. Returns ``True`` if
+    new contracts were processed.
+
+    Progress within the batch is saved to ``state_file`` every
+    ``checkpoint_every`` contracts. After a crash the next call resumes the
+    interrupted batch and skips the contracts that were already checked, and
+    the :class:`ReportSink` drops results that were already reported.
+    ``prioritise`` checks the most valuable contracts of the batch first.
+    ``verdict_cache`` is the SQLite file of the cached verdicts shared by
+    proxies and clones, see :func:`_scan_batch`.
+    """
+    state = _load_state(state_file)
+    getter = DataGetterAWSParquet(parquet_path, page_rows=page_rows, as_bytes=True)
+    batch = state.get("batch")
+    if batch and "frontier" not in batch:
+        start_block = batch["start_block"]
+        end_block = batch["end_block"]
+        last_known = batch["last_known_latest"]
+        done = batch["done"]
+        logger.info("resuming blocks %d-%d after %d contracts", start_block, end_block, done)
+    else:
+        latest = _latest_block(parquet_path)
+        next_block = state.get("next_block")
+        last_known = state.get("last_known_latest")
+        if next_block is None:
+            next_block = latest
+            last_known = latest
+        elif latest > (last_known or -1):
+            next_block = latest
+            last_known = latest
+        start_block = max(next_block - batch_blocks + 1, 0)
+        end_block = next_block
+        done = 0
+    if start_block > end_block:
+        return False
+    batch = {
+        "start_block": start_block,
+        "end_block": end_block,
+        "last_known_latest": last_known,
+        "done": done,
+    }
+
+    processed = _scan_batch(
+        getter,
+        batch,
+        state,
+        state_file,
+        report_file,
+        progress_cb,
+        checkpoint_every,
+        prioritise,
+        verdict_cache,
+    )
+    state.pop("batch", None)
     state["next_block"] = start_block - 1
     state["last_known_latest"] = last_known
     _save_state(state_file, state)
     return processed > 0
 
 
+def scan_scheduled_once(
+    parquet_path: str,
+    *,
+    state_file: str = DEFAULT_STATE_FILE,
+    report_file: str = DEFAULT_REPORT_FILE,
+    batch_blocks: int = 1000,
+    page_rows: int = 2000,
+    progress_cb: Optional[Callable[[str], None]] = None,
+    checkpoint_every: int = 100,
+    head_ratio: float = 0.75,
+    min_block: int = 0,
+    prioritise: bool = False,
+    verdict_cache: Optional[str] = None,
+) -> bool:
+    """Process one batch chosen by a :class:`scan_scheduler.BlockScheduler`.
+
+    Unlike :func:`scan_once`, which jumps to the newest block whenever the
+    dataset grows, this keeps a coverage map of scanned ranges in
+    ``state_file``. New blocks at the head and old blocks below the starting
+    point are both scanned, with ``head_ratio`` of the batches going to the
+    head, and no block range is skipped. State written by :func:`scan_once`
+    is taken over as the initial coverage.
+    """
+    state = _load_state(state_file)
+    getter = DataGetterAWSParquet(parquet_path, page_rows=page_rows, as_bytes=True)
+    if "coverage" not in state:
+        coverage = CoverageMap()
+        if state.get("next_block") is not None and state.get("last_known_latest") is not None:
+            coverage.add(state["next_block"] + 1, state["last_known_latest"])
+            state["head_floor"] = state["last_known_latest"]
+    else:
+        coverage = CoverageMap.from_json(state["coverage"])
+    batch = state.get("batch")
+    if batch and "frontier" in batch:
+        logger.info(
+            "resuming %s blocks %d-%d after %d contracts",
+            batch["frontier"], batch["start_block"], batch["end_block"], batch["done"],
+        )
+    else:
+        latest = _latest_block(parquet_path)
+        scheduler = BlockScheduler(
+            coverage,
+            state.setdefault("head_floor", latest),
+            batch_blocks=batch_blocks,
+            head_ratio=head_ratio,
+            min_block=min_block,
+            served=state.get("served"),
+        )
+        nxt = scheduler.next_batch(latest)
+        if nxt is None:
+            return False
+        frontier, start_block, end_block = nxt
+        state["served"] = scheduler.served
+        batch = {
+            "frontier": frontier,
+            "start_block": start_block,
+            "end_block": end_block,
+            "done": 0,
+        }
+        logger.info("scheduled %s blocks %d-%d", frontier, start_block, end_block)
+
+    processed = _scan_batch(
+        getter,
+        batch,
+        state,
+        state_file,
+        report_file,
+        progress_cb,
+        checkpoint_every,
+        prioritise,
+        verdict_cache,
+    )
+    coverage.add(batch["start_block"], batch["end_block"])
+    state.pop("batch", None)
+    state["coverage"] = coverage.to_json()
+    _save_state(state_file, state)
+    return processed > 0
+
+
 def run_continuous(
     parquet_path: str,
     *,
@@ -142,20 +407,45 @@ def run_continuous(
     report_file: str = DEFAULT_REPORT_FILE,
     page_rows: int = 2000,
     max_rounds: Optional[int] = None,
+    checkpoint_every: int = 100,
+    bidirectional: bool = False,
+    head_ratio: float = 0.75,
+    prioritise: bool = False,
+    verdict_cache: Optional[str] = None,
 ) -> None:
-    """Continuously scan the dataset until stopped."""
+    """Continuously scan the dataset until stopped.
+
+    With ``bidirectional`` batches come from :func:`scan_scheduled_once`.
+    """
     rounds = 0
     while True:
         if max_rounds is not None and rounds >= max_rounds:
             break
-        scan_once(
-            parquet_path,
-            state_file=state_file,
-            report_file=report_file,
-            batch_blocks=batch_blocks,
-            page_rows=page_rows,
-            progress_cb=make_live_progress(),
-        )
+        if bidirectional:
+            scan_scheduled_once(
+                parquet_path,
+                state_file=state_file,
+                report_file=report_file,
+                batch_blocks=batch_blocks,
+                page_rows=page_rows,
+                progress_cb=make_live_progress(),
+                checkpoint_every=checkpoint_every,
+                head_ratio=head_ratio,
+                prioritise=prioritise,
+                verdict_cache=verdict_cache,
+            )
+        else:
+            scan_once(
+                parquet_path,
+                state_file=state_file,
+                report_file=report_file,
+                batch_blocks=batch_blocks,
+                page_rows=page_rows,
+                progress_cb=make_live_progress(),
+                checkpoint_every=checkpoint_every,
+                prioritise=prioritise,
+                verdict_cache=verdict_cache,
+            )
         rounds += 1
         if interval > 0:
             time.sleep(interval)
@@ -177,6 +467,29 @@ def main() -> None:
         help="number of blocks to scan per iteration"
     )
     parser.add_argument("--page-rows", type=int, default=2000)
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=100,
+        help="save progress every N contracts (default: 100)"
+    )
+    parser.add_argument(
+        "--bidirectional",
+        action="store_true",
+        help="follow the chain head and backfill older blocks without gaps",
+    )
+    parser.add_argument(
+        "--head-ratio", type=float, default=0.75,
+        help="share of batches for new blocks in --bidirectional mode (default: 0.75)"
+    )
+    parser.add_argument(
+        "--prioritise",
+        action="store_true",
+        help="check contracts likely to hold or move Ether first within each batch",
+    )
+    parser.add_argument(
+        "--verdict-cache",
+        default=DEFAULT_VERDICT_CACHE,
+        help="SQLite file with verdicts reused for proxies and identical code",
+    )
     parser.add_argument(
         "--continuous",
         action="store_true",
@@ -200,6 +513,24 @@ def main() -> None:
             report_file=args.report_file,
             page_rows=args.page_rows,
             max_rounds=args.max_rounds,
+            checkpoint_every=args.checkpoint_every,
+            bidirectional=args.bidirectional,
+            head_ratio=args.head_ratio,
+            prioritise=args.prioritise,
+            verdict_cache=args.verdict_cache,
+        )
+    elif args.bidirectional:
+        scan_scheduled_once(
+            args.dataset,
+            state_file=args.state_file,
+            report_file=args.report_file,
+            batch_blocks=args.batch_blocks,
+            page_rows=args.page_rows,
+            progress_cb=make_live_progress(),
+            checkpoint_every=args.checkpoint_every,
+            head_ratio=args.head_ratio,
+            prioritise=args.prioritise,
+            verdict_cache=args.verdict_cache,
         )
     else:
         scan_once(
@@ -209,6 +540,9 @@ def main() -> None:
             batch_blocks=args.batch_blocks,
             page_rows=args.page_rows,
             progress_cb=make_live_progress(),
+            checkpoint_every=args.checkpoint_every,
+            prioritise=args.prioritise,
+            verdict_cache=args.verdict_cache,
         )
 
 
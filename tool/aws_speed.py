@@ -9,6 +9,13 @@ from aws_scanner import _latest_block
 from data_getters import DataGetterAWSParquet
 
 
+def code_size(code: str | bytes) -> int:
+    """Return the size in bytes of hex or raw ``code`` without decoding it."""
+    if isinstance(code, str):
+        return (len(code) - (2 if code.startswith("0x") else 0)) // 2
+    return len(code)
+
+
 def measure_speed(
     dataset: str,
     start_block: int,
@@ -28,7 +35,7 @@ def measure_speed(
     t_start = time.time()
     for page in getter.fetch_chunk(start_block, end_block):
         for row in page:
-            total_bytes += len(bytes.fromhex(row["ByteCode"]))
+            total_bytes += code_size(row["ByteCode"])
             total_contracts += 1
     elapsed = time.time() - t_start
     mb_per_s = (total_bytes / 1_000_000) / elapsed if elapsed else 0.0
@@ -1,5 +1,4 @@
 from __future__ import print_function
-from web3 import Web3
 import subprocess, signal
 import time
 import sys
@@ -12,6 +11,9 @@ from values import MyGlobals
 
 def start_private_chain(chain,etherbase,debug=False):
 
+    # web3 is heavy to import, so load it only when a chain is actually used
+    from web3 import Web3
+
     devnull = open(os.devnull, 'w')
 
 
@@ -60,7 +60,7 @@ def ether_leak( op, stack, trace, debug ):
     return False, False
 
 
-def run_one_check( max_call_depth, ops, contract_address, debug, read_from_blockchain ):
+def run_one_check( max_call_depth, ops, contract_address, debug, read_from_blockchain, frontier=None ):
 
     global MAX_CALL_DEPTH
 
@@ -75,14 +75,7 @@ def run_one_check( max_call_depth, ops, contract_address, debug, read_from_block
 
     MyGlobals.MAX_CALL_DEPTH    = max_call_depth
 
-    storage = {}    
-    stack   = []
-    mmemory = {}
-    data = {}
-    trace   = []
-    configurations = {}
-
-    execute_one_block(ops,stack,0, trace, storage, mmemory, data, configurations,  ['CALL','SUICIDE'], ether_leak, 0, 0, debug, read_from_blockchain )
+    return search_depth( ops, frontier, ['CALL','SUICIDE'], ether_leak, debug, read_from_blockchain )
 
 
 
@@ -109,8 +102,10 @@ def check_one_contract_on_ether_leak(contract_bytecode, contract_address, debug
     # Search for function invocations (from 1 to max_calldepth) that can make the contract to leak Ether
     #
 
+    # Each depth resumes from the end-of-transaction states of the previous one
+    frontier = None
     for i in range( 1 , MyGlobals.max_calldepth_in_normal_search + 1 ):
-        run_one_check( i, ops, contract_address, debug, read_from_blockchain )
+        frontier = run_one_check( i, ops, contract_address, debug, read_from_blockchain, frontier )
 
         if MyGlobals.stop_search: 
             break
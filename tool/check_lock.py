@@ -10,6 +10,7 @@ from values import (
     vprint,
 )
 from execute_block import *  
+from memory import Memory
 
 
 def ether_lock_can_recieve( op, stack, trace, debug ):
@@ -45,7 +46,7 @@ def ether_lock_can_send( op, stack, trace, debug ):
         return True, False
 
 
-def run_one_check( max_call_depth, ops, contract_address, debug, read_from_blockchain ):
+def run_one_check( max_call_depth, ops, contract_address, debug, read_from_blockchain, frontier=None ):
 
 
 
@@ -58,14 +59,7 @@ def run_one_check( max_call_depth, ops, contract_address, debug, read_from_block
     global MAX_CALL_DEPTH
     MyGlobals.MAX_CALL_DEPTH    = max_call_depth
 
-    storage = {}    
-    stack   = []
-    mmemory = {}
-    data = {}
-    trace   = []
-    configurations = {}
-
-    execute_one_block(ops,stack,0, trace, storage, mmemory, data, configurations,  ['CALL','CALLCODE','DELEGATECALL','SUICIDE'], ether_lock_can_send, 0, 0, debug, read_from_blockchain )
+    return search_depth( ops, frontier, ['CALL','CALLCODE','DELEGATECALL','SUICIDE'], ether_lock_can_send, debug, read_from_blockchain )
 
 
 
@@ -99,7 +93,7 @@ def check_one_contract_on_ether_lock(contract_bytecode, contract_address, debug
 
     storage = {}    
     stack   = []
-    mmemory = {}
+    mmemory = Memory()
     data = {}
     trace   = []
     configurations = {}
@@ -137,9 +131,11 @@ def check_one_contract_on_ether_lock(contract_bytecode, contract_address, debug
     #
     # Search
     #
+    # Each depth resumes from the end-of-transaction states of the previous one
+    frontier = None
     for i in range( 1 , MyGlobals.max_calldepth_in_normal_search + 1 ):
 
-        run_one_check( i, ops, contract_address, debug, read_from_blockchain )
+        frontier = run_one_check( i, ops, contract_address, debug, read_from_blockchain, frontier )
         if MyGlobals.stop_search: 
             vprint('\n\033[92m[+] No locking vulnerability found \033[0m')
             return False
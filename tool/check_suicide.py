@@ -23,7 +23,7 @@ def ether_suicide( op, stack, trace, debug ):
     return True, True
 
 
-def run_one_check( max_call_depth, ops, contract_address, debug, read_from_blockchain ):
+def run_one_check( max_call_depth, ops, contract_address, debug, read_from_blockchain, frontier=None ):
 
 
     vprint('\n[ ]\033[1m Search with call depth: %d   : \033[0m' % (max_call_depth), end='')
@@ -35,14 +35,7 @@ def run_one_check( max_call_depth, ops, contract_address, debug, read_from_block
     global MAX_CALL_DEPTH
     MyGlobals.MAX_CALL_DEPTH    = max_call_depth
 
-    storage = {}    
-    stack   = []
-    mmemory = {}
-    data = {}
-    trace   = []
-    configurations = {}
-
-    execute_one_block(ops,stack,0, trace, storage, mmemory, data, configurations,  ['SUICIDE'], ether_suicide, 0, 0, debug, read_from_blockchain )
+    return search_depth( ops, frontier, ['SUICIDE'], ether_suicide, debug, read_from_blockchain )
 
 
 
@@ -73,8 +66,10 @@ def check_one_contract_on_suicide(contract_bytecode, contract_address, debug, re
     #
     # Search for function invocations (from 1 to max_calldepth) that can make the contract the be killed
     #
+    # Each depth resumes from the end-of-transaction states of the previous one
+    frontier = None
     for i in range( 1 , MyGlobals.max_calldepth_in_normal_search + 1 ):
-        run_one_check( i, ops, contract_address, debug, read_from_blockchain )
+        frontier = run_one_check( i, ops, contract_address, debug, read_from_blockchain, frontier )
 
         if MyGlobals.stop_search: 
             break
@@ -2,7 +2,10 @@ import json
 import logging
 import os
 from pathlib import Path
-from typing import Iterable, List, Dict
+from typing import Dict, Iterable, Iterator, List
+
+import pyarrow as pa
+import pyarrow.feather as feather
 
 from data_getters import DataGetterAWSParquet
 
@@ -14,7 +17,8 @@ logger = logging.getLogger(__name__)
 class DataSource:
     """Abstract contract source."""
 
-    def latest_block(self) -> int:
+    def latest_block(self) -> int | None:
+        """Return the newest block, or None when the source has no blocks."""
         raise NotImplementedError
 
     def fetch(self, start_block: int, end_block: int) -> List[Dict]:
@@ -23,15 +27,152 @@ class DataSource:
 
 
 
+def _lower_bound(column, value: int) -> int:
+    """Return the first index of sorted *column* whose value is >= *value*."""
+    lo, hi = 0, len(column)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if column[mid].as_py() < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+_ARROW_SCHEMA = pa.schema([
+    ("block_number", pa.int64()),
+    ("address", pa.string()),
+    ("bytecode", pa.string()),
+])
+
+
+def write_arrow_segment(
+    contracts: List[Dict],
+    directory: str | Path,
+    *,
+    compression: str | None = "zstd",
+) -> Path | None:
+    """Write *contracts* to a new Arrow IPC (Feather v2) file in *directory*.
+
+    The file uses the column layout of the AWS Open-Data dataset
+    (``block_number``, ``address``, ``bytecode``), sorted by block, and is
+    named after its block range, e.g. ``blocks-100-199.arrow``. The
+    ``bytecode`` column is binary when the contracts carry raw ``bytes``. The
+    directory can be read with :class:`ArrowSource` or with
+    ``DataGetterAWSParquet(directory, format="arrow")``. Uncompressed files
+    (``compression=None``) are read without copying from the memory map.
+    """
+    if not contracts:
+        return None
+    rows = sorted(contracts, key=lambda c: c["block"])
+    codes = [c["bytecode"] for c in rows]
+    binary = any(isinstance(c, (bytes, bytearray)) for c in codes)
+    table = pa.table({
+        "block_number": pa.array([c["block"] for c in rows], pa.int64()),
+        "address": pa.array([c["address"] for c in rows], pa.string()),
+        "bytecode": pa.array(codes, pa.binary() if binary else pa.string()),
+    })
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"blocks-{rows[0]['block']}-{rows[-1]['block']}.arrow"
+    tmp = path.with_suffix(".tmp")
+    feather.write_feather(table, str(tmp), compression=compression or "uncompressed")
+    os.replace(tmp, path)
+    return path
+
+
+def evict_arrow_segments(directory: str | Path, oldest_block: int | None) -> List[Path]:
+    """Delete the Arrow files in *directory* that end before *oldest_block*.
+
+    Keeps the mirror written by :func:`write_arrow_segment` in step with the
+    size-limited contract store: once the store has evicted a block range,
+    the mirror files holding only that range are removed as well. Returns
+    the deleted paths.
+    """
+    if oldest_block is None or not Path(directory).is_dir():
+        return []
+    removed = []
+    for _, last, path in ArrowSource(directory)._files():
+        if last < oldest_block:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            removed.append(path)
+    return removed
+
+
+class ArrowSource(DataSource):
+    """Read contracts from a local directory of Arrow IPC files.
+
+    Files are opened through a memory map and selected by the block range in
+    their name, and rows are sliced by block range instead of filtered, so
+    :meth:`fetch_table` returns zero-copy views for uncompressed files.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def _files(self) -> List[tuple[int, int, Path]]:
+        files = []
+        for f in self.directory.glob("blocks-*-*.arrow"):
+            _, first, last = f.stem.split("-")
+            files.append((int(first), int(last), f))
+        return sorted(files)
+
+    def _read(self, path: Path) -> pa.Table:
+        with pa.memory_map(str(path), "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def latest_block(self) -> int | None:
+        files = self._files()
+        return max(last for _, last, _ in files) if files else None
+
+    def schema(self) -> pa.Schema:
+        """Return the schema of the mirror files, or the default layout when there are none."""
+        files = self._files()
+        if not files:
+            return _ARROW_SCHEMA
+        with pa.memory_map(str(files[0][2]), "r") as source:
+            return pa.ipc.open_file(source).schema
+
+    def fetch_table(self, start_block: int, end_block: int) -> pa.Table:
+        """Return the rows between *start_block* and *end_block* as a table."""
+        parts = []
+        for first, last, path in self._files():
+            if last < start_block or first > end_block:
+                continue
+            table = self._read(path)
+            blocks = table["block_number"]
+            lo = _lower_bound(blocks, start_block)
+            hi = _lower_bound(blocks, end_block + 1)
+            parts.append(table.slice(lo, hi - lo))
+        if not parts:
+            return self.schema().empty_table()
+        return pa.concat_tables(parts)
+
+    def fetch(self, start_block: int, end_block: int) -> List[Dict]:
+        table = self.fetch_table(start_block, end_block)
+        return [
+            {"address": a, "bytecode": b, "block": n}
+            for a, b, n in zip(
+                table["address"].to_pylist(),
+                table["bytecode"].to_pylist(),
+                table["block_number"].to_pylist(),
+            )
+        ]
+
+
 class ParquetSource(DataSource):
     """Fetch contracts from a Parquet dataset (local or S3)."""
 
     def __init__(self, path: str) -> None:
         self._getter = DataGetterAWSParquet(path)
 
-    def latest_block(self) -> int:
+    def latest_block(self) -> int | None:
         table = self._getter._dataset.to_table(columns=["block_number"])
-        return max(table["block_number"].to_pylist())
+        blocks = table["block_number"].to_pylist()
+        return max(blocks) if blocks else None
 
     def fetch(self, start_block: int, end_block: int) -> List[Dict]:
         contracts = []
@@ -82,6 +223,136 @@ def _prepend_with_limit(path: Path, lines: List[str], limit: int) -> List[str]:
     return all_lines
 
 
+class SegmentedContractLog:
+    """Append-only contract store made of rotating JSON Lines segments.
+
+    Records are appended to the newest segment file in *directory* until it
+    reaches ``segment_bytes``, after which a new segment is started. An
+    ``index.json`` file lists the segments in write order together with their
+    size, record count and block range, so appending, eviction and range
+    lookups never read existing segments. The size limit is enforced by
+    deleting whole segments, oldest first.
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, directory: str | Path, segment_bytes: int = 1024 * 1024) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self._index_path = self.directory / self.INDEX_NAME
+        if self._index_path.exists():
+            with open(self._index_path, "r", encoding="utf-8") as fh:
+                self._index = json.load(fh)
+        else:
+            self._index = {"next_id": 0, "segments": []}
+
+    @property
+    def segments(self) -> List[Dict]:
+        return self._index["segments"]
+
+    def _save_index(self) -> None:
+        tmp = self._index_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self._index, fh)
+        os.replace(tmp, self._index_path)
+
+    def _new_segment(self) -> Dict:
+        seg = {
+            "name": f"segment-{self._index['next_id']:08d}.jsonl",
+            "size": 0,
+            "records": 0,
+            "first_block": None,
+            "last_block": None,
+        }
+        self._index["next_id"] += 1
+        self.segments.append(seg)
+        return seg
+
+    def append(self, contracts: Iterable[Dict]) -> int:
+        """Validate and append *contracts*, returning the number of bytes written."""
+        lines = []
+        for c in contracts:
+            assert c.get("address") and c.get("bytecode") is not None
+            lines.append((c["block"], (json.dumps(c) + "\n").encode("utf-8")))
+        written = 0
+        seg = self.segments[-1] if self.segments else None
+        fh = None
+        try:
+            for block, line in lines:
+                if seg is None or (seg["size"] and seg["size"] + len(line) > self.segment_bytes):
+                    if fh is not None:
+                        fh.close()
+                    seg = self._new_segment()
+                    fh = None
+                if fh is None:
+                    fh = open(self.directory / seg["name"], "ab")
+                fh.write(line)
+                seg["size"] += len(line)
+                seg["records"] += 1
+                if seg["first_block"] is None or block < seg["first_block"]:
+                    seg["first_block"] = block
+                if seg["last_block"] is None or block > seg["last_block"]:
+                    seg["last_block"] = block
+                written += len(line)
+        finally:
+            if fh is not None:
+                fh.close()
+        self._save_index()
+        return written
+
+    def total_size(self) -> int:
+        return sum(seg["size"] for seg in self.segments)
+
+    def enforce_limit(self, limit: int) -> List[str]:
+        """Delete the oldest segments until the store fits into *limit* bytes.
+
+        The newest segment is always kept, so the store may exceed the limit
+        by at most one segment. Returns the names of deleted segments.
+        """
+        removed = []
+        while len(self.segments) > 1 and self.total_size() > limit:
+            seg = self.segments.pop(0)
+            try:
+                os.remove(self.directory / seg["name"])
+            except FileNotFoundError:
+                pass
+            removed.append(seg["name"])
+        if removed:
+            self._save_index()
+        return removed
+
+    def block_range(self) -> tuple[int | None, int | None]:
+        """Return the oldest and newest block stored."""
+        firsts = [s["first_block"] for s in self.segments if s["first_block"] is not None]
+        lasts = [s["last_block"] for s in self.segments if s["last_block"] is not None]
+        return (min(firsts) if firsts else None, max(lasts) if lasts else None)
+
+    def iter_records(
+        self, start_block: int | None = None, end_block: int | None = None
+    ) -> Iterator[Dict]:
+        """Yield stored contracts in write order, optionally limited to a block range.
+
+        Segments whose block range does not overlap the requested range are
+        skipped without being opened.
+        """
+        for seg in list(self.segments):
+            if seg["first_block"] is None:
+                continue
+            if end_block is not None and seg["first_block"] > end_block:
+                continue
+            if start_block is not None and seg["last_block"] < start_block:
+                continue
+            with open(self.directory / seg["name"], "r", encoding="utf-8") as fh:
+                for line in fh:
+                    rec = json.loads(line)
+                    if start_block is not None and rec["block"] < start_block:
+                        continue
+                    if end_block is not None and rec["block"] > end_block:
+                        continue
+                    yield rec
+
+
 def update_contract_store(
     source: DataSource,
     *,
@@ -90,12 +361,25 @@ def update_contract_store(
     size_limit_mb: float | None = None,
     start_block: int | None = None,
     end_block: int | None = None,
+    segment_dir: str | None = None,
+    segment_size_mb: float = 1,
+    arrow_dir: str | None = None,
 ) -> None:
     """Fetch new contracts and store them prepended in *contract_file*.
 
     ``source`` defines where contract information is pulled from.
     The function keeps track of the oldest and newest downloaded block in
     ``metadata_file`` and avoids fetching overlapping ranges.
+
+    When ``segment_dir`` is given, contracts are appended to a
+    :class:`SegmentedContractLog` in that directory instead of being
+    prepended to *contract_file*, so an update only costs the size of the
+    new records.
+
+    ``arrow_dir`` additionally writes every fetched batch to a columnar
+    Arrow mirror (see :func:`write_arrow_segment`). Mirror files whose
+    blocks were all evicted from the store by the size limit are deleted
+    (see :func:`evict_arrow_segments`).
     """
     meta = load_metadata(metadata_file)
     if size_limit_mb is not None:
@@ -107,6 +391,10 @@ def update_contract_store(
         # latest recorded block.
         newest = meta.get("newest_block")
         current = source.latest_block()
+        if current is None:
+            # An empty source, e.g. a new Arrow mirror
+            save_metadata(meta, metadata_file)
+            return
         if newest is None:
             start_block = current
             end_block = current
@@ -135,6 +423,19 @@ def update_contract_store(
     if not contracts:
         save_metadata(meta, metadata_file)
         return
+    if arrow_dir is not None:
+        write_arrow_segment(contracts, arrow_dir)
+    if segment_dir is not None:
+        log = SegmentedContractLog(
+            segment_dir, segment_bytes=int(segment_size_mb * 1024 * 1024)
+        )
+        log.append(contracts)
+        log.enforce_limit(limit)
+        meta["oldest_block"], meta["newest_block"] = log.block_range()
+        if arrow_dir is not None:
+            evict_arrow_segments(arrow_dir, meta["oldest_block"])
+        save_metadata(meta, metadata_file)
+        return
     new_lines = [json.dumps(c) + "\n" for c in contracts]
     path = Path(contract_file)
     all_lines = _prepend_with_limit(path, new_lines, limit)
@@ -142,5 +443,7 @@ def update_contract_store(
         blocks = [json.loads(l)["block"] for l in all_lines]
         meta["newest_block"] = max(blocks)
         meta["oldest_block"] = min(blocks)
+    if arrow_dir is not None:
+        evict_arrow_segments(arrow_dir, meta["oldest_block"])
     save_metadata(meta, metadata_file)
 
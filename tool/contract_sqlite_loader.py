@@ -10,6 +10,7 @@ from typing import Callable, Dict, Optional
 import pyarrow.dataset as ds
 
 from data_getters import DataGetterAWSParquet
+from proxy_detect import detect_proxy
 
 DEFAULT_LIMIT_MB = 40
 # Default S3 path for the AWS Open Data Parquet dataset
@@ -30,10 +31,16 @@ def _init_db(conn: sqlite3.Connection, size_limit: int) -> None:
         CREATE TABLE IF NOT EXISTS contracts (
             address TEXT PRIMARY KEY,
             bytecode TEXT NOT NULL,
-            block_number INTEGER NOT NULL
+            block_number INTEGER NOT NULL,
+            proxy_kind TEXT,
+            implementation TEXT
         )
         """
     )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(contracts)")}
+    for column in ("proxy_kind", "implementation"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE contracts ADD COLUMN {column} TEXT")
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS meta (
@@ -78,6 +85,9 @@ def update_contract_db(
 ) -> bool:
     """Fetch new contracts from *parquet_path* and store them in *db_path*.
 
+    Proxy stubs recognised by :func:`proxy_detect.detect_proxy` are stored
+    with their ``proxy_kind`` and ``implementation``.
+
     Returns ``True`` if new rows were inserted.
     """
     limit = int((size_limit_mb or DEFAULT_LIMIT_MB) * 1024 * 1024)
@@ -117,9 +127,17 @@ def update_contract_db(
         inserted_count = 0
         for page in getter.fetch_chunk(start_block, end_block):
             for r in page:
+                proxy = detect_proxy(r["ByteCode"])
                 conn.execute(
-                    "INSERT OR IGNORE INTO contracts(address, bytecode, block_number) VALUES(?, ?, ?)",
-                    (r["Address"], r["ByteCode"], r["BlockNumber"]),
+                    "INSERT OR IGNORE INTO contracts(address, bytecode, block_number, proxy_kind, implementation)"
+                    " VALUES(?, ?, ?, ?, ?)",
+                    (
+                        r["Address"],
+                        r["ByteCode"],
+                        r["BlockNumber"],
+                        proxy.kind if proxy else None,
+                        proxy.implementation if proxy else None,
+                    ),
                 )
                 conn.commit()
                 inserted = True
@@ -2,8 +2,12 @@ from __future__ import annotations
 
 import argparse
 import csv
+import json
 import os
-from typing import Iterable, Set
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 from web3 import Web3
 
@@ -50,30 +54,320 @@ class FileDataStore(DataStore):
             ])
 
 
-def _gather_candidate_addresses(block, w3: Web3) -> Iterable[str]:
-    """Yield possible contract addresses from transactions in *block*."""
-    for tx in block.transactions:
+class SQLiteStatsStore(DataStore):
+    """Persist per-block scan results in SQLite so ranges are never recounted.
+
+    For every scanned block the store keeps the contract addresses it
+    touched, and every address is stored once with its code size and the
+    balance seen when it was first fetched. The stats of any range are then
+    answered with a query over the distinct addresses of its blocks, and
+    only blocks that were never scanned have to be fetched from the node.
+    Results of whole runs passed to :meth:`save` are kept in a ``runs``
+    table like the rows of :class:`FileDataStore`.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS scanned_blocks (
+                network TEXT NOT NULL,
+                block_number INTEGER NOT NULL,
+                PRIMARY KEY (network, block_number)
+            );
+            CREATE TABLE IF NOT EXISTS block_contracts (
+                network TEXT NOT NULL,
+                block_number INTEGER NOT NULL,
+                address TEXT NOT NULL,
+                PRIMARY KEY (network, block_number, address)
+            );
+            CREATE TABLE IF NOT EXISTS contracts (
+                network TEXT NOT NULL,
+                address TEXT NOT NULL,
+                code_size INTEGER NOT NULL,
+                balance_wei TEXT NOT NULL,
+                PRIMARY KEY (network, address)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                network TEXT,
+                start_block INTEGER,
+                end_block INTEGER,
+                contract_count INTEGER,
+                total_balance_wei TEXT,
+                total_code_size INTEGER
+            );
+            """
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def missing_blocks(self, network: str, start_block: int, end_block: int) -> List[int]:
+        """Return the blocks of the range that have not been scanned yet."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT block_number FROM scanned_blocks "
+                "WHERE network=? AND block_number BETWEEN ? AND ?",
+                (network, start_block, end_block),
+            )
+            done = {row[0] for row in cur}
+        return [n for n in range(start_block, end_block + 1) if n not in done]
+
+    def code_sizes(self, network: str) -> Dict[str, int]:
+        """Return the stored code size of every known contract."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT address, code_size FROM contracts WHERE network=?", (network,)
+            )
+            return dict(cur.fetchall())
+
+    def add_blocks(
+        self,
+        network: str,
+        blocks: Dict[int, Set[str]],
+        contracts: Dict[str, Tuple[int, int]],
+    ) -> None:
+        """Record scanned ``blocks`` and the ``(code_size, balance)`` of new contracts.
+
+        Everything is written in one transaction, so an interrupted run never
+        leaves a block marked as scanned without its addresses.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO contracts VALUES (?, ?, ?, ?)",
+                [(network, a, size, str(bal)) for a, (size, bal) in contracts.items()],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO block_contracts VALUES (?, ?, ?)",
+                [(network, n, a) for n, addrs in blocks.items() for a in addrs],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO scanned_blocks VALUES (?, ?)",
+                [(network, n) for n in blocks],
+            )
+
+    def range_stats(self, network: str, start_block: int, end_block: int) -> dict:
+        """Return the stats of a range from the stored blocks."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT c.code_size, c.balance_wei FROM contracts c "
+                "JOIN (SELECT DISTINCT address FROM block_contracts "
+                "      WHERE network=? AND block_number BETWEEN ? AND ?) b "
+                "ON c.address = b.address WHERE c.network=?",
+                (network, start_block, end_block, network),
+            )
+            rows = cur.fetchall()
+        return {
+            'network': network,
+            'start_block': start_block,
+            'end_block': end_block,
+            'contract_count': len(rows),
+            # balances can exceed SQLite's 64-bit integers
+            'total_balance_wei': sum(int(bal) for _, bal in rows),
+            'total_code_size': sum(size for size, _ in rows),
+        }
+
+    def save(self, stats: dict) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    stats['network'],
+                    stats['start_block'],
+                    stats['end_block'],
+                    stats['contract_count'],
+                    str(stats['total_balance_wei']),
+                    stats['total_code_size'],
+                ),
+            )
+
+
+class AddressCache:
+    """Thread-safe cache of the code size and balance of addresses.
+
+    Each address is looked up at most once per cache, no matter how many
+    blocks or shards it appears in.
+    """
+
+    def __init__(self, w3: Web3, code_sizes: Optional[Dict[str, int]] = None) -> None:
+        self._w3 = w3
+        self._lock = threading.Lock()
+        self._code: Dict[str, int] = dict(code_sizes or {})
+        self._balance: Dict[str, int] = {}
+
+    def code_size(self, addr: str) -> int:
+        with self._lock:
+            if addr in self._code:
+                return self._code[addr]
+        code = self._w3.eth.get_code(addr)
+        size = len(code) if code else 0
+        with self._lock:
+            self._code[addr] = size
+        return size
+
+    def balance(self, addr: str) -> int:
+        with self._lock:
+            if addr in self._balance:
+                return self._balance[addr]
+        value = self._w3.eth.get_balance(addr)
+        with self._lock:
+            self._balance[addr] = value
+        return value
+
+
+def _block_receipts(w3: Web3, num: int) -> Optional[list]:
+    """Return all receipts of block ``num`` with one ``eth_getBlockReceipts`` call.
+
+    ``None`` is returned when the node or client does not support the call, in
+    which case receipts are requested per transaction.
+    """
+    get_receipts = getattr(w3.eth, 'get_block_receipts', None)
+    if get_receipts is None:
+        return None
+    try:
+        return list(get_receipts(num))
+    except Exception:
+        return None
+
+
+def _gather_candidate_addresses(block, w3: Web3, receipts: Optional[list] = None) -> Iterable[str]:
+    """Yield possible contract addresses from transactions in *block*.
+
+    ``receipts`` are the block receipts in transaction order. When given, the
+    addresses of created contracts are taken from them instead of one
+    ``get_transaction_receipt`` call per creation.
+    """
+    for i, tx in enumerate(block.transactions):
         to_addr = getattr(tx, 'to', None)
         if to_addr:
             yield to_addr
         else:
-            receipt = w3.eth.get_transaction_receipt(tx.hash)
+            if receipts is not None:
+                receipt = receipts[i]
+            else:
+                receipt = w3.eth.get_transaction_receipt(tx.hash)
             if receipt and receipt.contractAddress:
                 yield receipt.contractAddress
 
 
-def collect_contract_addresses(w3: Web3, start_block: int = 0, end_block: int | None = None) -> Set[str]:
+def _collect_block(w3: Web3, num: int, cache: AddressCache, use_block_receipts: bool) -> Set[str]:
+    block = w3.eth.get_block(num, full_transactions=True)
+    receipts = None
+    if use_block_receipts and any(
+        not getattr(tx, 'to', None) for tx in block.transactions
+    ):
+        receipts = _block_receipts(w3, num)
+    return {
+        addr
+        for addr in _gather_candidate_addresses(block, w3, receipts)
+        if cache.code_size(addr) > 0
+    }
+
+
+def collect_contract_addresses(
+    w3: Web3,
+    start_block: int = 0,
+    end_block: int | None = None,
+    *,
+    cache: AddressCache | None = None,
+) -> Set[str]:
     """Return the set of unique contract addresses between the given blocks."""
     if end_block is None:
         end_block = w3.eth.block_number
+    if cache is None:
+        cache = AddressCache(w3)
 
     addresses: Set[str] = set()
     for num in range(start_block, end_block + 1):
-        block = w3.eth.get_block(num, full_transactions=True)
-        for addr in _gather_candidate_addresses(block, w3):
-            code = w3.eth.get_code(addr)
-            if code and len(code) > 0:
-                addresses.add(addr)
+        addresses |= _collect_block(w3, num, cache, use_block_receipts=False)
+    return addresses
+
+
+def _load_checkpoint(path: str | None, start_block: int, end_block: int) -> dict:
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as fh:
+            data = json.load(fh)
+        if data.get('start_block') == start_block and data.get('end_block') == end_block:
+            return data
+    return {'start_block': start_block, 'end_block': end_block, 'shards': {}, 'addresses': []}
+
+
+def _save_checkpoint(path: str, data: dict) -> None:
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def collect_contract_addresses_sharded(
+    w3: Web3,
+    start_block: int,
+    end_block: int,
+    *,
+    workers: int = 8,
+    shard_blocks: int | None = None,
+    cache: AddressCache | None = None,
+    checkpoint_file: str | None = None,
+    checkpoint_every: int = 100,
+) -> Set[str]:
+    """Collect contract addresses with the block range split across workers.
+
+    Parameters
+    ----------
+    workers:
+        Number of threads fetching blocks in parallel.
+    shard_blocks:
+        Blocks per shard. Defaults to an even split between ``workers``.
+    cache:
+        Shared :class:`AddressCache`, so every address is looked up once.
+    checkpoint_file:
+        Optional JSON file recording the progress of every shard and the
+        addresses found so far. A later call with the same range resumes from
+        it instead of starting over.
+    checkpoint_every:
+        Number of blocks a shard processes between checkpoint writes.
+    """
+    if cache is None:
+        cache = AddressCache(w3)
+    total = end_block - start_block + 1
+    if total <= 0:
+        return set()
+    if shard_blocks is None:
+        shard_blocks = max(1, -(-total // workers))
+
+    state = _load_checkpoint(checkpoint_file, start_block, end_block)
+    addresses: Set[str] = set(state['addresses'])
+    lock = threading.Lock()
+
+    def _checkpoint() -> None:
+        if checkpoint_file:
+            state['addresses'] = sorted(addresses)
+            _save_checkpoint(checkpoint_file, state)
+
+    def _run_shard(lo: int, hi: int) -> None:
+        key = f'{lo}-{hi}'
+        with lock:
+            nxt = state['shards'].get(key, lo)
+        found: Set[str] = set()
+        for num in range(nxt, hi + 1):
+            found |= _collect_block(w3, num, cache, use_block_receipts=True)
+            if (num - lo + 1) % checkpoint_every == 0 or num == hi:
+                with lock:
+                    addresses.update(found)
+                    state['shards'][key] = num + 1
+                    _checkpoint()
+                found = set()
+
+    shards = [
+        (lo, min(lo + shard_blocks - 1, end_block))
+        for lo in range(start_block, end_block + 1, shard_blocks)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for fut in [pool.submit(_run_shard, lo, hi) for lo, hi in shards]:
+            fut.result()
     return addresses
 
 
@@ -85,29 +379,102 @@ def get_current_block_number(network: str) -> int:
     return w3.eth.block_number
 
 
-def count_contracts(network: str, start_block: int = 0, end_block: int | None = None):
-    """Return stats about contracts in the specified block range."""
+def count_contracts(
+    network: str,
+    start_block: int = 0,
+    end_block: int | None = None,
+    *,
+    workers: int = 1,
+    checkpoint_file: str | None = None,
+):
+    """Return stats about contracts in the specified block range.
+
+    With ``workers`` > 1 the range is split into shards collected in
+    parallel (see :func:`collect_contract_addresses_sharded`). Code sizes and
+    balances are cached per address in both modes.
+    """
     w3 = Web3(Web3.HTTPProvider(get_provider_url(network)))
     if not w3.is_connected():
         raise RuntimeError('Web3 provider not available')
 
-    addrs = collect_contract_addresses(w3, start_block, end_block)
-    balance = 0
-    size = 0
-    for a in addrs:
-        balance += w3.eth.get_balance(a)
-        size += len(w3.eth.get_code(a))
+    if end_block is None:
+        end_block = w3.eth.block_number
+    cache = AddressCache(w3)
+    if workers > 1:
+        addrs = collect_contract_addresses_sharded(
+            w3,
+            start_block,
+            end_block,
+            workers=workers,
+            cache=cache,
+            checkpoint_file=checkpoint_file,
+        )
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            balances = list(pool.map(cache.balance, addrs))
+    else:
+        addrs = collect_contract_addresses(w3, start_block, end_block, cache=cache)
+        balances = [cache.balance(a) for a in addrs]
+    size = sum(cache.code_size(a) for a in addrs)
 
     return {
         'network': network,
         'start_block': start_block,
-        'end_block': end_block if end_block is not None else w3.eth.block_number,
+        'end_block': end_block,
         'contract_count': len(addrs),
-        'total_balance_wei': balance,
+        'total_balance_wei': sum(balances),
         'total_code_size': size,
     }
 
 
+def count_contracts_incremental(
+    network: str,
+    store: SQLiteStatsStore,
+    start_block: int = 0,
+    end_block: int | None = None,
+    *,
+    workers: int = 1,
+    w3: Web3 | None = None,
+    chunk_blocks: int = 100,
+):
+    """Return stats like :func:`count_contracts`, fetching only unscanned blocks.
+
+    Blocks already recorded in ``store`` are not requested again, and code
+    size and balance are only looked up for addresses the store has not
+    seen before. The missing blocks are scanned and written to ``store`` in
+    chunks of ``chunk_blocks``, so an interrupted run keeps its progress.
+    """
+    if w3 is None:
+        w3 = Web3(Web3.HTTPProvider(get_provider_url(network)))
+        if not w3.is_connected():
+            raise RuntimeError('Web3 provider not available')
+    if end_block is None:
+        end_block = w3.eth.block_number
+
+    missing = store.missing_blocks(network, start_block, end_block)
+    if missing:
+        known = store.code_sizes(network)
+        cache = AddressCache(w3, known)
+
+        def _scan(num: int) -> Set[str]:
+            return _collect_block(w3, num, cache, use_block_receipts=True)
+
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            for i in range(0, len(missing), chunk_blocks):
+                chunk = missing[i:i + chunk_blocks]
+                scanned = pool.map(_scan, chunk) if pool else map(_scan, chunk)
+                blocks = dict(zip(chunk, scanned))
+                new = set().union(*blocks.values()) - known.keys()
+                contracts = {a: (cache.code_size(a), cache.balance(a)) for a in new}
+                store.add_blocks(network, blocks, contracts)
+                known.update((a, size) for a, (size, _) in contracts.items())
+        finally:
+            if pool:
+                pool.shutdown()
+
+    return store.range_stats(network, start_block, end_block)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description='Count contracts on a network')
     parser.add_argument(
@@ -128,6 +495,18 @@ def main() -> None:
         '--block-range', type=int, default=None,
         help='scan the last N blocks ending at the current block'
     )
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help='number of parallel workers splitting the block range (default: 1)'
+    )
+    parser.add_argument(
+        '--checkpoint-file', default=None,
+        help='JSON file used to checkpoint and resume a sharded scan (not with --stats-db)'
+    )
+    parser.add_argument(
+        '--stats-db', default=None,
+        help='SQLite file with per-block results; only unscanned blocks are fetched'
+    )
     parser.add_argument(
         '--output-file', default='contract_stats.csv',
         help='CSV file to append results to (default: contract_stats.csv)'
@@ -141,7 +520,24 @@ def main() -> None:
         start_block = args.start_block
         end_block = args.end_block
 
-    stats = count_contracts(args.network, start_block, end_block)
+    if args.stats_db and args.checkpoint_file:
+        parser.error('--checkpoint-file cannot be used with --stats-db, which keeps its own progress')
+
+    if args.stats_db:
+        db = SQLiteStatsStore(args.stats_db)
+        stats = count_contracts_incremental(
+            args.network, db, start_block, end_block, workers=args.workers
+        )
+        db.save(stats)
+        db.close()
+    else:
+        stats = count_contracts(
+            args.network,
+            start_block,
+            end_block,
+            workers=args.workers,
+            checkpoint_file=args.checkpoint_file,
+        )
     for k, v in stats.items():
         print(f'{k}: {v}')
 
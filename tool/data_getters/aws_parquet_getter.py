@@ -7,6 +7,14 @@ import pyarrow.dataset as ds
 from .base import DataGetter
 
 
+def _to_bytes(code: str | bytes | None) -> bytes | None:
+    if code is None or isinstance(code, bytes):
+        return code
+    if code.startswith("0x"):
+        code = code[2:]
+    return bytes.fromhex(code)
+
+
 class DataGetterAWSParquet(DataGetter):
     """Load contract data from AWS Open-Data Parquet dumps.
 
@@ -14,11 +22,28 @@ class DataGetterAWSParquet(DataGetter):
     columns. ``path`` can point to a local directory or an S3 bucket
     (e.g. ``s3://...``). Results are yielded in pages of ``page_rows``
     dictionaries with ``Address``, ``ByteCode`` and ``BlockNumber`` fields.
+
+    With ``as_bytes`` the ``ByteCode`` field holds the raw code as
+    :class:`bytes` instead of a hex string, ready for
+    :func:`parse_code.parse_code`. Binary columns are passed through as they
+    are and hex columns are decoded once here.
+
+    ``format`` is passed to :func:`pyarrow.dataset.dataset`; use ``"arrow"``
+    to read a local Arrow IPC mirror written by
+    :func:`contract_downloader.write_arrow_segment`.
     """
 
-    def __init__(self, path: str, page_rows: int = 20_000) -> None:
-        self._dataset = ds.dataset(path, format="parquet")
+    def __init__(
+        self,
+        path: str,
+        page_rows: int = 20_000,
+        format: str = "parquet",
+        *,
+        as_bytes: bool = False,
+    ) -> None:
+        self._dataset = ds.dataset(path, format=format)
         self._page_rows = page_rows
+        self._as_bytes = as_bytes
 
     def fetch_chunk(
         self, start_block: int, end_block: int
@@ -27,7 +52,19 @@ class DataGetterAWSParquet(DataGetter):
             (ds.field("block_number") >= start_block)
             & (ds.field("block_number") <= end_block)
         )
-        table = self._dataset.to_table(filter=filt)
+        yield from self._pages(self._dataset.to_table(filter=filt))
+
+    def fetch_addresses(
+        self, addresses: Iterable[str]
+    ) -> Iterable[List[Dict[str, Any]]]:
+        """Yield the rows of ``addresses`` (lower case hex) in any block."""
+        filt = ds.field("address").isin([a.lower() for a in addresses])
+        yield from self._pages(self._dataset.to_table(filter=filt))
+
+    def _pages(self, table) -> Iterable[List[Dict[str, Any]]]:
+        codes = table["bytecode"].to_pylist()
+        if self._as_bytes:
+            codes = [_to_bytes(c) for c in codes]
         rows = [
             {
                 "Address": addr,
@@ -36,7 +73,7 @@ class DataGetterAWSParquet(DataGetter):
             }
             for addr, code, blk in zip(
                 table["address"].to_pylist(),
-                table["bytecode"].to_pylist(),
+                codes,
                 table["block_number"].to_pylist(),
             )
         ]
@@ -33,9 +33,7 @@ class DataGetterBigQuery(DataGetter):
         self._page_rows = page_rows
         self._client = client or bigquery.Client()
 
-    def fetch_chunk(
-        self, start_block: int, end_block: int
-    ) -> Iterable[List[Dict[str, Any]]]:
+    def _query(self, start_block: int, end_block: int):
         query = (
             "SELECT address, bytecode, block_number "
             f"FROM `{self._dataset}` "
@@ -49,13 +47,33 @@ class DataGetterBigQuery(DataGetter):
             ]
         )
         job = self._client.query(query, job_config=job_config)
-        rows = [
-            {
-                "Address": r.address,
-                "ByteCode": r.bytecode,
-                "BlockNumber": r.block_number,
-            }
-            for r in job
-        ]
-        for i in range(0, len(rows), self._page_rows):
-            yield rows[i : i + self._page_rows]
+        return job.result(page_size=self._page_rows)
+
+    def fetch_chunk(
+        self, start_block: int, end_block: int
+    ) -> Iterable[List[Dict[str, Any]]]:
+        """Yield the query result one API page at a time.
+
+        Only the current page is held in memory, and the first page is
+        yielded as soon as it arrives.
+        """
+        for page in self._query(start_block, end_block).pages:
+            yield [
+                {
+                    "Address": r.address,
+                    "ByteCode": r.bytecode,
+                    "BlockNumber": r.block_number,
+                }
+                for r in page
+            ]
+
+    def fetch_arrow(
+        self, start_block: int, end_block: int
+    ) -> Iterable["pyarrow.RecordBatch"]:
+        """Yield the query result as Arrow record batches.
+
+        Uses ``RowIterator.to_arrow_iterable`` so rows are never converted to
+        Python objects. Batches have ``address``, ``bytecode`` and
+        ``block_number`` columns. Requires ``pyarrow``.
+        """
+        yield from self._query(start_block, end_block).to_arrow_iterable()
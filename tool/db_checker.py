@@ -3,19 +3,45 @@ from __future__ import annotations
 import argparse
 import json
 import sqlite3
-from typing import Callable, Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
+from contract_priority import PriorityQueue, priority_score
 from fetch_and_check import run_checks
+from proxy_detect import VerdictCache
 
 
 ProgressCB = Optional[Callable[[str], None]]
 
 
+def _prioritised_rows(conn: sqlite3.Connection) -> Iterator[Tuple[str, str]]:
+    """Yield ``(address, bytecode)`` by priority.
+
+    The rows are streamed to score them and only their rowids are queued;
+    the bytecode is read again when the contract's turn comes, so memory
+    does not grow with the bytecode in the database.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(contracts)")}
+    queue: PriorityQueue[int] = PriorityQueue()
+    if "balance" in columns:
+        rows = conn.execute("SELECT rowid, bytecode, balance FROM contracts")
+        for rowid, bytecode, balance in rows:
+            queue.push(rowid, priority_score(bytecode, int(balance) if balance is not None else None))
+    else:
+        for rowid, bytecode in conn.execute("SELECT rowid, bytecode FROM contracts"):
+            queue.push(rowid, priority_score(bytecode))
+    for rowid in queue.drain():
+        yield conn.execute(
+            "SELECT address, bytecode FROM contracts WHERE rowid = ?", (rowid,)
+        ).fetchone()
+
+
 def scan_database(
     db_path: str,
     *,
     limit: int | None = None,
     progress_cb: ProgressCB = None,
+    prioritise: bool = False,
+    verdict_cache: Optional[str] = None,
 ) -> Dict[str, int]:
     """Run Maian checks on contracts stored in ``db_path``.
 
@@ -29,19 +55,68 @@ def scan_database(
     progress_cb:
         Optional callback invoked after each contract is processed. Receives a
         human readable progress string.
+    prioritise:
+        Scan contracts in order of :func:`contract_priority.priority_score`
+        instead of table order. A ``balance`` column is used when the table
+        has one.
+    verdict_cache:
+        Optional SQLite file of a :class:`proxy_detect.VerdictCache` to keep
+        verdicts between runs. Proxy stubs get the verdict of their
+        implementation, which is checked once when it is in the database,
+        and are checked on their own code otherwise; ``proxies`` counts the
+        ones that got the verdict of their implementation, including
+        proxies of an earlier run resolved by this one. Copies of checked
+        bytecode are not analysed again.
     """
     conn = sqlite3.connect(db_path)
+    verdicts = VerdictCache(verdict_cache or ":memory:")
+
+    def _check_stored(address: str) -> List[Dict]:
+        """Check the stored contract ``address``; return the proxies it resolves."""
+        row = conn.execute(
+            "SELECT address, bytecode FROM contracts WHERE lower(address) = ?", (address,)
+        ).fetchone()
+        if row is None:
+            return []
+        _, resolved, _ = verdicts.check(row[1], row[0], run_checks)
+        return resolved
+
     try:
         total = conn.execute("SELECT COUNT(*) FROM contracts").fetchone()[0]
-        cur = conn.execute("SELECT address, bytecode FROM contracts")
+        if prioritise:
+            cur = _prioritised_rows(conn)
+        else:
+            cur = conn.execute("SELECT address, bytecode FROM contracts")
         scanned = 0
+        proxies = 0
         flagged = {"suicidal": 0, "prodigal": 0, "greedy": 0}
-        for address, bytecode in cur:
-            res = run_checks(bytecode, address)
-            scanned += 1
+        counted = set()
+
+        def _count(address: str, verdict: Dict) -> None:
+            # Every address counts once, whether scanned or resolved as a waiting proxy
+            nonlocal proxies
+            if address.lower() in counted:
+                return
+            counted.add(address.lower())
+            if "proxy" in verdict:
+                proxies += 1
             for key in flagged:
-                if res.get(key):
+                if verdict.get(key):
                     flagged[key] += 1
+
+        for address, bytecode in cur:
+            res, resolved, proxy = verdicts.check(bytecode, address, run_checks)
+            if res is None:
+                # A proxy seen before its implementation: check that now
+                resolved = _check_stored(proxy.implementation)
+                res = verdicts.get(address)
+            if res is None:
+                # The implementation is not in the database: check the stub itself
+                res, resolved, _ = verdicts.check(bytecode, address, run_checks, delegate=False)
+            scanned += 1
+            _count(address, res)
+            for entry in resolved:
+                _count(entry["address"], entry)
             if progress_cb:
                 remaining = max(total - scanned, 0)
                 progress_cb(
@@ -52,9 +127,11 @@ def scan_database(
             if limit is not None and scanned >= limit:
                 break
     finally:
+        verdicts.close()
         conn.close()
     result = {"total": total, "scanned": scanned}
     result.update(flagged)
+    result["proxies"] = proxies
     return result
 
 
@@ -71,8 +148,23 @@ def main() -> None:
         default="reports/db_scan_report.json",
         help="output file for the JSON report",
     )
+    parser.add_argument(
+        "--verdict-cache",
+        help="SQLite file to keep verdicts for proxies and identical code between runs",
+    )
+    parser.add_argument(
+        "--prioritise",
+        action="store_true",
+        help="scan contracts likely to hold or move Ether first",
+    )
     args = parser.parse_args()
-    summary = scan_database(args.db, limit=args.limit, progress_cb=print)
+    summary = scan_database(
+        args.db,
+        limit=args.limit,
+        progress_cb=print,
+        prioritise=args.prioritise,
+        verdict_cache=args.verdict_cache,
+    )
     with open(args.report, "w", encoding="utf-8") as fh:
         json.dump(summary, fh, indent=2)
     print(f"Report written to {args.report}")
@@ -4,11 +4,97 @@ import sys
 import re
 from execute_instruction import *
 from values import get_params, initialize_params, print_params
-from values import MyGlobals, clear_globals
+from values import MyGlobals, clear_globals, new_solver, SymWord, copy_storage
 from misc import *
+from memory import Memory
+from storage_deps import SequencePruner, function_slots, matched_selector, selector_term
 
 
 
+class Frontier(object):
+    """End-of-transaction states of one search depth.
+
+    ``configurations`` are the configurations seen while reaching them and
+    ``pruner`` selects the functions worth calling after each state (see
+    storage_deps.py). Both are kept for the next depth.
+    """
+
+    def __init__(self, configurations, pruner=None):
+        self.states = []
+        self.configurations = configurations
+        self.pruner = pruner
+
+
+def initial_state():
+    """Return the frontier state of the contract before any transaction."""
+    return {'storage': {}, 'data': {}, 'trace': [], 'calldepth': 0, 'constraints': [], 'pending': ()}
+
+
+def search_depth( ops, frontier, search_op, search_function, debug, read_from_blockchain ):
+    """Search with up to ``MyGlobals.MAX_CALL_DEPTH`` transactions.
+
+    Without ``frontier`` the search starts from the deployed contract.
+    Otherwise ``frontier`` is the result of the previous depth and only the
+    last transaction is explored, starting from each of its states with the
+    path constraints that led there. Functions that cannot extend the sequence of calls leading
+    to a state into a useful one (see storage_deps.py) are not called.
+
+    Returns the frontier for the next depth, or None when it must start over:
+    frontier reuse is disabled, or the node budget cut this search short, so
+    the states found are incomplete.
+    """
+
+    if not MyGlobals.reuse_frontier:
+        execute_one_block(ops, [], 0, [], {}, Memory(), {}, {}, search_op, search_function, 0, 0, debug, read_from_blockchain )
+        return None
+
+    if frontier is None:
+        slots = function_slots(ops) if MyGlobals.prune_sequences else {}
+        frontier = Frontier({}, pruner=SequencePruner(slots) if slots else None)
+        frontier.states = [ initial_state() ]
+    configurations = frontier.configurations
+    pruner = frontier.pruner
+    last = MyGlobals.MAX_CALL_DEPTH >= MyGlobals.max_calldepth_in_normal_search
+    MyGlobals.frontier = []
+
+    try:
+        for state in frontier.states:
+            if MyGlobals.stop_search: break
+
+            calldepth = state['calldepth'] + 1
+
+            # Selectors not worth calling from this state
+            excluded = pruner.excluded( state['pending'], MyGlobals.max_calldepth_in_normal_search - calldepth ) if pruner else []
+            MyGlobals.pruned_calls += len(excluded)
+
+            MyGlobals.s = new_solver()
+            MyGlobals.s.add( state['constraints'] )
+            MyGlobals.s.assume_satisfiable()
+            for selector in excluded:
+                MyGlobals.s.add( selector_term(calldepth) != selector )
+
+            base = len(MyGlobals.s.assertions())
+            start = len(MyGlobals.frontier)
+            execute_one_block(ops, [], 0, copy.deepcopy(state['trace']), copy_storage(state['storage']), Memory(), copy.deepcopy(state['data']), configurations, search_op, search_function, 0, state['calldepth'], debug, read_from_blockchain )
+
+            for st in MyGlobals.frontier[start:]:
+                st['pending'] = ()
+                if pruner and not last:
+                    selector = matched_selector( list(st['constraints'])[base:], calldepth )
+                    st['pending'] = pruner.after( state['pending'], selector )
+
+        states = MyGlobals.frontier
+    finally:
+        MyGlobals.frontier = None
+
+    if MyGlobals.visited_nodes > MyGlobals.MAX_VISITED_NODES:
+        return None
+
+    nf = Frontier(configurations, pruner)
+    nf.states = states
+    return nf
+
+
 def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, configurations, search_op, search_function, jumpdepth, calldepth, debug, read_from_blockchain):
 
 
@@ -74,6 +160,7 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
                 print('\033[96m[+] Reached %s at %x \033[0m'  % (ops[pos]['o'], ops[pos]['id'] ) )
                 print_stack( stack )
 
+            MyGlobals.s.step = ops[pos]['id']
             new_search_condition_found, stop_expanding_the_search_tree =  search_function( ops[pos]['o'] , stack , trace, debug )
             MyGlobals.search_condition_found = MyGlobals.search_condition_found or new_search_condition_found
 
@@ -99,8 +186,19 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
                 # If search condition still not found then call again the contract
                 # (infinite loop is prevented by calldepth )
                 if not MyGlobals.search_condition_found:
+
+                    # Keep the state, the next deeper search resumes from it
+                    if MyGlobals.frontier is not None and calldepth >= MyGlobals.MAX_CALL_DEPTH:
+                        MyGlobals.frontier.append( {
+                            'storage'     : copy_storage(storage),
+                            'data'        : copy.deepcopy(data),
+                            'trace'       : copy.deepcopy(trace),
+                            'calldepth'   : calldepth,
+                            'constraints' : MyGlobals.s.assertions()
+                        } )
+
                     stack   = []
-                    mmemory = {}
+                    mmemory = Memory()
                     newpos = 0
                     #data = {}
 
@@ -160,13 +258,14 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
 
                     MyGlobals.s.push()
                     MyGlobals.s.add( des['z3'] == 0)
+                    MyGlobals.s.step = ops[pos]['id']
                     try:
 
                         if MyGlobals.s.check() == sat:
 
 
-                            storage2 = copy.deepcopy(storage)
-                            stack2 = copy.deepcopy(stack)
+                            storage2 = copy_storage(storage)
+                            stack2 = list(stack)
                             trace2 = copy.deepcopy(trace)
                             mmemory2 = copy.deepcopy(mmemory)
                             data2 = copy.deepcopy(data)
@@ -208,6 +307,7 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
 
                     MyGlobals.s.push()
                     MyGlobals.s.add( des['z3'] != 0)
+                    MyGlobals.s.step = ops[pos]['id']
                     
                     try:
                         if MyGlobals.s.check() == sat:
@@ -217,8 +317,8 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
                                     print('\t'*8+'-'*18+'\033[96m %2d Executing function %x \033[0m' % (calldepth, MyGlobals.last_eq_func) )
 
 
-                            storage2 = copy.deepcopy(storage)
-                            stack2 = copy.deepcopy(stack)
+                            storage2 = copy_storage(storage)
+                            stack2 = list(stack)
                             trace2 = copy.deepcopy(trace)
                             mmemory2 = copy.deepcopy(mmemory)
                             data2 = copy.deepcopy(data)
@@ -267,12 +367,10 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
 
 
                     # replace the variable with concrete value in stack and memory
-                    for st in stack:
-                        if 'z3' in st:
-                            st['z3'] = simplify(substitute( st['z3'], (BitVec(sm,256),BitVecVal(random_address, 256))))
-                    for st in mmemory:
-                        if 'z3' in mmemory[st]:
-                            mmemory[st]['z3'] = simplify(substitute( mmemory[st]['z3'], (BitVec(sm,256),BitVecVal(random_address, 256))))
+                    for i, st in enumerate(stack):
+                        if st.term is not None:
+                            stack[i] = st.with_term( simplify(substitute( st.term, (BitVec(sm,256),BitVecVal(random_address, 256)))) )
+                    mmemory.substitute( (BitVec(sm,256),BitVecVal(random_address, 256)) )
 
                     # replace in the address as well
                     addr = simplify(substitute(addr['z3'], (BitVec(sm,256),BitVecVal(random_address, 256)) ) )
@@ -281,8 +379,8 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
                     branch_array_size = [0,1,2]
                     for one_branch_size in branch_array_size:
 
-                        storage2 = copy.deepcopy(storage)
-                        stack2 = copy.deepcopy(stack)
+                        storage2 = copy_storage(storage)
+                        stack2 = list(stack)
                         trace2 = copy.deepcopy(trace)
                         mmemory2 = copy.deepcopy(mmemory)
                         data2 = copy.deepcopy(data)
@@ -291,7 +389,7 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
                         for i in range(one_branch_size):
                             data2['data-'+str(calldepth)+'-'+ str(addr.as_long()+32+32*i)] = BitVec('input'+str(calldepth)+'['+('%s'%(addr.as_long()+32+32*i))+']',256)
 
-                        stack2.append( {'type':'constant','step':ops[pos]['id'], 'z3':BitVecVal( one_branch_size, 256)})
+                        stack2.append( SymWord.constant(ops[pos]['id'], BitVecVal( one_branch_size, 256)))
 
                         MyGlobals.s.push()
                         MyGlobals.s.add( BitVec('input'+str(calldepth)+('[%x'%addr.as_long())+']',256) == one_branch_size)
@@ -319,15 +417,15 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
 
 
                     # Assume it is SYMBOLIC variable
-                    storage2 = copy.deepcopy(storage)
-                    stack2 = copy.deepcopy(stack)
+                    storage2 = copy_storage(storage)
+                    stack2 = list(stack)
                     trace2 = copy.deepcopy(trace)
                     mmemory2 = copy.deepcopy(mmemory)
                     data2 = copy.deepcopy(data)
 
                     if -1 not in data2:
                         data2['inputlength-'+str(calldepth)] = BitVec('inputlength-'+str(calldepth), 256)
-                    stack2.append( {'type':'constant','step':ops[pos]['id'], 'z3': data2['inputlength-'+str(calldepth)]} )
+                    stack2.append( SymWord.constant(ops[pos]['id'], data2['inputlength-'+str(calldepth)]) )
                     execute_one_block(ops,stack2,   pos+1,  trace2, storage2,   mmemory2, data2, configurations,    search_op, search_function,  jumpdepth, calldepth, debug, read_from_blockchain )
 
                     
@@ -335,13 +433,13 @@ def execute_one_block( ops , stack , pos , trace, storage, mmemory, data, config
                     branch_array_size = [0,8,8+1*32,8+2*32]
                     for one_branch_size in branch_array_size:
 
-                        storage2 = copy.deepcopy(storage)
-                        stack2 = copy.deepcopy(stack)
+                        storage2 = copy_storage(storage)
+                        stack2 = list(stack)
                         trace2 = copy.deepcopy(trace)
                         mmemory2 = copy.deepcopy(mmemory)
                         data2 = copy.deepcopy(data)
                         
-                        stack2.append( {'type':'constant','step':ops[pos]['id'], 'z3': BitVecVal(one_branch_size,256)} )
+                        stack2.append( SymWord.constant(ops[pos]['id'], BitVecVal(one_branch_size,256)) )
 
                         execute_one_block(ops,stack2,   pos+1,  trace2, storage2,   mmemory2, data2, configurations,    search_op, search_function,  jumpdepth, calldepth, debug, read_from_blockchain )
                     
@@ -5,7 +5,7 @@ from instruction_list import *
 from parse_code import *
 from values import get_params,set_params,print_params,is_params
 from values import create_configuration,add_configuration,configuration_exist,seen_configuration,print_configuration
-from values import MyGlobals
+from values import MyGlobals, SymWord
 from hashlib import *
 from sha3 import *
 import random
@@ -13,11 +13,12 @@ import time
 from datetime import datetime
 from z3 import *
 from misc import *
+from memory import Memory
 
 
-def is_fixed(s): return s['type'] == 'constant' and is_bv_value(simplify(s['z3']))
-def is_undefined(s): return s['type'] == 'undefined'
-def get_value(s): return  simplify(s['z3']).as_long()
+def is_fixed(s): return s.kind == 'constant' and is_bv_value(simplify(s.term))
+def is_undefined(s): return s.kind == 'undefined'
+def get_value(s): return  simplify(s.term).as_long()
 
 def power(y, x, n):
     if x == 0: #base case
@@ -27,50 +28,9 @@ def power(y, x, n):
     else: #x odd
         return (y*power((y*y)%n,x//2,n))%n
 
-def store_in_memory( mmemory, addr, value ):
-
-    for i in range(addr+1, addr+32):
-        if i in mmemory:
-
-            if not is_undefined(mmemory[i]):
-
-                if is_undefined( value ): 
-                    mmemory[i]['type'] = 'undefined'
-                    continue
-
-                obytes = (i - addr);
-                old_value = mmemory[i]['z3']
-                new_value = ( old_value & (2**(8*obytes) - 1) ) ^ (value['z3'] << (8*obytes) )
-                
-                if new_value == 0: del mmemory[i]
-                else: mmemory[i]['z3'] = new_value
-
-
-    for i in range(addr-31,addr):
-        if i in mmemory:
-
-            if not is_undefined(mmemory[i]):
-
-                if is_undefined( value ): 
-                    mmemory[i]['type'] = 'undefined'
-                    continue
-
-                obytes = addr - i;
-                old_value = mmemory[i]['z3']
-                new_value = ( old_value & ( (2**(8*obytes)-1) << (8*(32-obytes) ) ) )   ^ ( value ['z3'] >> (8*obytes ) )
-
-                if new_value == 0: del mmemory[i]
-                else: mmemory[i]['z3'] = new_value
-
-
-    mmemory[addr] = value;
-
-
-
-
 def unary( o1, step, op='NONE' ):
 
-    if is_undefined(o1): return {'type':'undefined','step':step}
+    if is_undefined(o1): return SymWord.undefined(step)
 
     z1 = simplify(o1['z3'])
     if      op == 'NOT': z3 = ~z1
@@ -78,9 +38,9 @@ def unary( o1, step, op='NONE' ):
     else:
         print('did not process unary operation %s ' % op )
         print(o1)
-        return {'type':'undefined','step':step} 
+        return SymWord.undefined(step) 
 
-    return {'type':'constant','step':step, 'z3': z3} 
+    return SymWord.constant(step, z3) 
 
 
 def binary( o1, o2 , step, op='NONE'):
@@ -89,16 +49,16 @@ def binary( o1, o2 , step, op='NONE'):
     # In some cases the result can be determined with the knowledge of only one operand
     if is_fixed(o1):
         val = simplify(o1['z3']).as_long()
-        if op in ['MUL','AND','DIV','SDIV'] and 0 == val: return {'type':'constant','step':step, 'z3':BitVecVal(0,256) }
+        if op in ['MUL','AND','DIV','SDIV'] and 0 == val: return SymWord.constant(step, BitVecVal(0,256))
         if op in ['XOR','ADD'] and 0 == val: return o2
         
     if is_fixed(o2):
         val = simplify(o2['z3']).as_long()
-        if op in ['MUL','AND','DIV','SDIV'] and 0 == val: return {'type':'constant','step':step, 'z3':BitVecVal(0,256) }
+        if op in ['MUL','AND','DIV','SDIV'] and 0 == val: return SymWord.constant(step, BitVecVal(0,256))
         if op in ['XOR','ADD'] and 0 == val: return o1
 
     # If some of the operands is undefined then the result should be undefined 
-    if is_undefined(o1) or is_undefined(o2): return {'type':'undefined','step':step}
+    if is_undefined(o1) or is_undefined(o2): return SymWord.undefined(step)
 
 
     z1 = simplify(o1['z3'])
@@ -114,7 +74,7 @@ def binary( o1, o2 , step, op='NONE'):
         if is_bv_value(z1) and is_bv_value(z2):
             z3 = BitVecVal( power (z1.as_long(), z2.as_long(), 2**256), 256 )
         else: 
-            return {'type':'undefined','step':step}
+            return SymWord.undefined(step)
     elif op =='DIV' : z3 = UDiv(z1,z2) 
     elif op =='SDIV': z3 = z1/z2 
     elif op =='MOD' : z3 = URem(z1,z2)
@@ -140,29 +100,29 @@ def binary( o1, o2 , step, op='NONE'):
         print('did not process binary operation %s  ' % op)
         print(o1)
         print(o2)
-        return {'type':'undefined','step':step} 
+        return SymWord.undefined(step) 
 
-    return {'type':'constant','step':step, 'z3': z3} 
+    return SymWord.constant(step, z3) 
 
 
 
 
 def ternary( o1, o2 , o3, step, op='NONE'):
 
-    if o3['type'] == 'constant' and is_bv_value(simplify(o3['z3'])) and 0 == simplify(o3['z3']).as_long(): return {'type':'constant','step':step, 'z3':BitVecVal(0,256) }
+    if o3['type'] == 'constant' and is_bv_value(simplify(o3['z3'])) and 0 == simplify(o3['z3']).as_long(): return SymWord.constant(step, BitVecVal(0,256))
 
     z1 = simplify(o1['z3'])
     z2 = simplify(o2['z3'])
     z3 = simplify(o3['z3'])
 
-    if   op == 'ADDMOD': return {'type':'constant', 'step':step, 'z3': (z1+z2) % z3 }
-    elif op == 'MULMOD': return {'type':'constant', 'step':step, 'z3': (z1*z2) % z3 }
+    if   op == 'ADDMOD': return SymWord.constant(step, (z1+z2) % z3)
+    elif op == 'MULMOD': return SymWord.constant(step, (z1*z2) % z3)
     else:
         print('did not process ternary operation %s  ' % op)
         print(o1)
         print(o2)
         print(o3)
-        return {'type':'undefined','step':step} 
+        return SymWord.undefined(step) 
 
 def is_good_jump(ops,pos, debug):
 
@@ -212,7 +172,7 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
     elif op == 'SIGNEXTEND':
 
         if not is_fixed(args[0]) or not is_fixed(args[1]): 
-            stack.append( {'type':'undefined','step':step} )
+            stack.append( SymWord.undefined(step) )
 
         else:
 
@@ -222,7 +182,7 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
             n = 0
             for i in range(256):
                 n ^= (tbit if i<= t else ((o>>i)&1)) << i
-            stack.append( {'type':'undefined','step':step, 'z3':BitVecVal( n, 256 ) } )
+            stack.append( SymWord('undefined', step, BitVecVal( n, 256 )) )
 
 
     elif op == 'SHA3':
@@ -234,36 +194,25 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
         exact_address = addr.as_long() if is_bv_value(addr) else -1
         exact_offset  = offset.as_long() if is_bv_value(offset) else -1
 
-        res = {'type':'undefined','step':step}
-
-        if exact_address >= 0 and exact_offset >= 0:
-            if (exact_offset % 32) == 0 :     # for now, can deal only with offsets divisible by 32
-
+        res = SymWord.undefined(step)
 
-                val = ''
-                all_good = True
-                for i in range(exact_offset/32):
-                    if (exact_address + i*32) not in mmemory or not is_fixed(mmemory[exact_address+i*32]): 
-                        all_good = False
-                        break
-                    val += '%064x' % get_value(mmemory[exact_address + i*32])
+        if exact_address >= 0 and 0 <= exact_offset < 10000:
 
-                if all_good:
+            # Hash the raw memory bytes (cached, see sha3.keccak_int)
+            raw = mmemory.concrete_bytes(exact_address, exact_offset)
+            if raw is not None:
+                res = SymWord.constant(step, BitVecVal(keccak_int(raw), 256))
 
-                    k = keccak_256()
-                    k.update(val.encode('utf-8'))
-                    digest = k.hexdigest()
-                    res = {'type':'constant','step':step, 'z3':BitVecVal(int(digest,16), 256) }
-
-        if MyGlobals.symbolic_sha and is_undefined(res):
-            res = {'type':'constant','step':step, 'z3': BitVec('sha-'+str(step)+'-'+str(calldepth),256) }
+        # Huge lengths are not read from memory (nor grow MSIZE); the hash is fresh
+        if (MyGlobals.symbolic_sha or exact_offset >= 10000) and is_undefined(res):
+            res = SymWord.constant(step, BitVec('sha-'+str(step)+'-'+str(calldepth),256))
 
         stack.append( res )
 
 
 
-    elif op.find('PUSH') >= 0: stack.append( {'type':'constant','step':step, 'z3':BitVecVal(int(code[pos]['input'],16), 256)} )
-    elif op.find('DUP' ) >= 0: stack.append( copy.deepcopy( stack[-int(op[3:]) ] ) )
+    elif op.find('PUSH') >= 0: stack.append( SymWord.constant(step, BitVecVal(int(code[pos]['input'],16), 256)) )
+    elif op.find('DUP' ) >= 0: stack.append( stack[-int(op[3:]) ] )
 
 
     elif op.find('SWAP') >= 0:
@@ -277,25 +226,25 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
     # only if they are selected to get one
     # otherwise, below, they will get fixed value (BitVecVal) as specified
     elif op in MyGlobals.symbolic_vars:
-        stack.append( {'type':'constant','step':step, 'z3': BitVec(op+'-'+str(calldepth),256) } ) 
+        stack.append( SymWord.constant(step, BitVec(op+'-'+str(calldepth),256)) ) 
 
 
 
 
-    elif op == 'NUMBER':        stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('block_number',''),16), 256)} )
-    elif op == 'GASLIMIT':      stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('gas_limit',''),16), 256)} )
-    elif op == 'TIMESTAMP':     stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('time_stamp',''),16), 256)} )
-    elif op == 'CALLVALUE':     stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('call_value',''),16), 256)} )
-    elif op == 'ADDRESS':       stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('contract_address',''), 16), 256)} )
-    elif op == 'ORIGIN':        stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('contract_address',''), 16), 256)} )
-    elif op == 'GASPRICE':      stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('gas_price',''), 16), 256) } )
-    elif op == 'COINBASE':      stack.append( {'type':'constant','step':step, 'z3': BitVecVal(0,256)} )
-    elif op == 'DIFFICULTY':    stack.append( {'type':'constant','step':step, 'z3': BitVecVal(0,256)} )
-    elif op == 'CALLER':        stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('my_address',''), 16), 256) } )
-    elif op == 'GAS':           stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('gas',''),16), 256) } )
-    elif op == 'MSIZE':         stack.append( {'type':'constant','step':step, 'z3': BitVecVal(len(mmemory), 256) } )
-    elif op == 'BLOCKHASH':     stack.append( {'type':'constant','step':step, 'z3': BitVecVal(0x123,256)} ) # does not use the argument which specifies the blocknumber
-    elif op == 'BALANCE':       stack.append( {'type':'constant','step':step, 'z3': BitVecVal(int(get_params('contract_balance',''), 10), 256)} )        # always assume that it is the balance of the current contract
+    elif op == 'NUMBER':        stack.append( SymWord.constant(step, BitVecVal(int(get_params('block_number',''),16), 256)) )
+    elif op == 'GASLIMIT':      stack.append( SymWord.constant(step, BitVecVal(int(get_params('gas_limit',''),16), 256)) )
+    elif op == 'TIMESTAMP':     stack.append( SymWord.constant(step, BitVecVal(int(get_params('time_stamp',''),16), 256)) )
+    elif op == 'CALLVALUE':     stack.append( SymWord.constant(step, BitVecVal(int(get_params('call_value',''),16), 256)) )
+    elif op == 'ADDRESS':       stack.append( SymWord.constant(step, BitVecVal(int(get_params('contract_address',''), 16), 256)) )
+    elif op == 'ORIGIN':        stack.append( SymWord.constant(step, BitVecVal(int(get_params('contract_address',''), 16), 256)) )
+    elif op == 'GASPRICE':      stack.append( SymWord.constant(step, BitVecVal(int(get_params('gas_price',''), 16), 256)) )
+    elif op == 'COINBASE':      stack.append( SymWord.constant(step, BitVecVal(0,256)) )
+    elif op == 'DIFFICULTY':    stack.append( SymWord.constant(step, BitVecVal(0,256)) )
+    elif op == 'CALLER':        stack.append( SymWord.constant(step, BitVecVal(int(get_params('my_address',''), 16), 256)) )
+    elif op == 'GAS':           stack.append( SymWord.constant(step, BitVecVal(int(get_params('gas',''),16), 256)) )
+    elif op == 'MSIZE':         stack.append( SymWord.constant(step, BitVecVal(mmemory.size(), 256)) )
+    elif op == 'BLOCKHASH':     stack.append( SymWord.constant(step, BitVecVal(0x123,256)) ) # does not use the argument which specifies the blocknumber
+    elif op == 'BALANCE':       stack.append( SymWord.constant(step, BitVecVal(int(get_params('contract_balance',''), 10), 256)) )        # always assume that it is the balance of the current contract
     elif op == 'POP':           pass
     elif op.find('LOG') >= 0:   pass
     elif op == 'CODECOPY':      pass
@@ -318,7 +267,7 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
             if ('data-'+str(calldepth)+'-' + str(addr)) not in data:
                 data['data-'+str(calldepth)+'-' + str(addr)] = BitVec('input'+str(calldepth)+'['+str(addr)+']', 256)
 
-            stack.append( {'type':'constant','step':step, 'z3':data['data-'+str(calldepth)+'-' + str(addr)] } )
+            stack.append( SymWord.constant(step, data['data-'+str(calldepth)+'-' + str(addr)]) )
 
         elif is_undefined(addr):
 
@@ -353,10 +302,9 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
 
 
             if value < 10000:
-                for i in range(value/32):
-                    mmemory[addr + 32 * i] = { 'type':'undefined','step':step }
+                mmemory.mark_undefined(addr, value, step)
 
-        stack.append( {'type':'constant','step':step, 'z3':BitVec('call_at_step_'+str(step), 256) & 0x1} )     # assume the result of call can be any (True or False)
+        stack.append( SymWord.constant(step, BitVec('call_at_step_'+str(step), 256) & 0x1) )     # assume the result of call can be any (True or False)
 
 
     elif op == 'CALLDATACOPY': 
@@ -383,17 +331,17 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
                 print('\033[95m[-] In CALLDATACOPY the length of array (%d) is not multiple of 32 \033[0m' % length )
             return pos, True
 
-        for i in range( length / 32 ):
+        for i in range( length // 32 ):
             data[ datapos + 32 * i ] = BitVec('input'+str(calldepth)+'['+str(datapos + 32 * i )+']',256)
-            store_in_memory( mmemory, memaddr + 32 * i , {'type':'constant','step':step,'z3':data[ datapos + 32 * i ]} )
+            mmemory.store_word( memaddr + 32 * i , SymWord.constant(step, data[ datapos + 32 * i ]) )
 
         # Truncate the storing only to 32 byte values
 
 
-    elif op == 'CALLCODE':          stack.append( {'type':'constant','step':step, 'z3':BitVecVal(0,256)} )
-    elif op == 'DELEGATECALL':      stack.append( {'type':'constant','step':step, 'z3':BitVecVal(0,256)} )
-    elif op == 'EXTCODESIZE':       stack.append( {'type':'constant','step':step, 'z3':BitVecVal(0,256)} )
-    elif op == 'CREATE': stack.append( {'type':'constant','step':step, 'z3':BitVecVal(0,256)} )
+    elif op == 'CALLCODE':          stack.append( SymWord.constant(step, BitVecVal(0,256)) )
+    elif op == 'DELEGATECALL':      stack.append( SymWord.constant(step, BitVecVal(0,256)) )
+    elif op == 'EXTCODESIZE':       stack.append( SymWord.constant(step, BitVecVal(0,256)) )
+    elif op == 'CREATE': stack.append( SymWord.constant(step, BitVecVal(0,256)) )
 
     elif op == 'MLOAD':
         addr = args[0]
@@ -407,11 +355,7 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
 
         if is_bv_value(addr):
 
-            exact_address = addr.as_long()
-            if exact_address in mmemory: res = copy.deepcopy(mmemory[exact_address])
-            else: 
-                res = {'type':'constant','step':step, 'z3': BitVecVal(0, 256) }
-            stack.append( res )
+            stack.append( mmemory.load_word( addr.as_long(), step ) )
 
         else:
             if debug:print('\033[95m[-] The MLOAD address on %x  cannot be determined\033[0m' % code[pos]['id'] )
@@ -426,10 +370,7 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
             if debug:print('\033[95m[-] The MSTORE the write address on %x  cannot be determined\033[0m' % code[pos]['id'] )
             return pos, True
 
-        t = copy.deepcopy( args[1] )
-        addr = get_value(addr)
-
-        store_in_memory( mmemory, addr, t )
+        mmemory.store_word( get_value(addr), args[1] )
 
 
     elif op in ['MSTORE8']:
@@ -443,15 +384,7 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
             if debug:print('\033[95m[-] The MSTORE8 value is undefined \033[0m' % code[pos]['id'] )
             return pos, True
 
-        ea = get_value(addr)
-        ev = get_value(value) % 256
-
-        if (ea/32)*32 not in mmemory: 
-            mmemory[(ea/32)*32] = {'type':'constant','step':step, 'z3':BitVecVal(ev << (31- (ea%32)), 256) }
-        elif is_fixed( mmemory[(ea/32)*32]['z3'] ):
-            v = get_value( mmemory[(ea/32)*32]['z3'] )
-            v = (v & (~BitVecVal(0xff,256) << (31- (ea%32)))) ^ (ev << (31- (ea%32)))
-            mmemory[(ea/32)*32]['z3'] = v
+        mmemory.store_byte( get_value(addr), value )
 
 
     elif op == 'SLOAD':
@@ -475,23 +408,26 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
                     exit(0)
                     return pos, True
                 else:
-                    res = copy.deepcopy(storage[exact_address][0])
+                    res = storage[exact_address][0]
             else:
-                if MyGlobals.web3 is not None and read_from_blockchain:
-                    value = MyGlobals.web3.eth.getStorageAt( get_params('contract_address',''), exact_address )
+                # The storage provider caches slots and prefetches them in batches
+                if MyGlobals.storage_provider is not None and read_from_blockchain:
+                    value = MyGlobals.storage_provider.get_storage( get_params('contract_address',''), exact_address )
+                elif MyGlobals.web3 is not None and read_from_blockchain:
+                    value = int( MyGlobals.web3.eth.getStorageAt( get_params('contract_address',''), exact_address ), 16)
                 else:
-                    value = '0'
+                    value = 0
 
-                t = {'type':'constant','step':step, 'z3': BitVecVal(int(value,16), 256) }
+                t = SymWord.constant(step, BitVecVal(value, 256))
 
                 storage[exact_address] = [ t ]
-                res = copy.deepcopy(t)
+                res = t
 
             stack.append( res )
 
         else:
             if MyGlobals.symbolic_load:
-                stack.append({'type':'constant','step':step, 'z3': BitVec('sload-'+str(step)+'-'+str(calldepth),256) } )
+                stack.append(SymWord.constant(step, BitVec('sload-'+str(step)+'-'+str(calldepth),256)) )
             else:
                 if debug:print('\033[95m[-] The SLOAD address on %x  cannot be determined\033[0m' % code[pos]['id'] )
                 return pos, True
@@ -506,7 +442,7 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
             if debug:print('\033[95m[-] The SSTORE address on %x  cannot be determined\033[0m' % code[pos]['id'] )
             return pos, True
 
-        t = copy.deepcopy( args[1] )
+        t = args[1]
 
         if is_bv_value( simplify(addr['z3']) ):
             va = get_value( addr )
@@ -553,9 +489,9 @@ def execute( code, stack, pos, storage, mmemory, data, trace, calldepth, debug,
         byte_no = args[0]
         word    = args[1]
         if is_undefined(word) or is_undefined(byte_no): 
-            res = {'type':'undefined','step':step}
+            res = SymWord.undefined(step)
         else:                                           
-            res = {'type':'constant','step':step, 'z3': (word['z3'] >> (8*(31-byte_no['z3'])) ) & 0xff }
+            res = SymWord.constant(step, (word['z3'] >> (8*(31-byte_no['z3'])) ) & 0xff)
 
         stack.append( res )
 
@@ -1,13 +1,18 @@
 import argparse
+import asyncio
 import os
 import random
 import time
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
-from web3 import Web3
 
 from check_suicide import check_one_contract_on_suicide
 from check_leak import check_one_contract_on_ether_leak
 from check_lock import check_one_contract_on_ether_lock
+from parse_code import parse_code
+import path_solver
+from solver_portfolio import DEFAULT_PORTFOLIO
+from storage_provider import RPCStorageProvider, predict_storage_slots
 from values import MyGlobals, vprint
 
 
@@ -46,31 +51,61 @@ def fetch_contract_bytecode(w3, address):
     return code.hex()
 
 
-def run_checks(bytecode, address):
+def run_checks(bytecode, address, storage_provider=None):
+    """Run the suicidal, prodigal and greedy checks on ``bytecode``.
+
+    When ``storage_provider`` is given, storage slots and the balance of
+    ``address`` are read from the chain through it instead of assuming an
+    empty contract. Slots that can be predicted statically are prefetched in
+    the background while the analysis starts.
+    """
     MyGlobals.max_calldepth_in_normal_search = 2
+    read_from_blockchain = storage_provider is not None
+    if read_from_blockchain:
+        storage_provider.prefetch_async(
+            address, predict_storage_slots(parse_code(bytecode))
+        )
+    MyGlobals.storage_provider = storage_provider
+    recorder = path_solver.RECORDER
+    wins = dict(path_solver.STATS.portfolio_wins)
     results = {}
-    start = time.time()
-    results['suicidal'] = check_one_contract_on_suicide(
-        bytecode, address, False, False, False
-    )
-    results['suicide_time'] = time.time() - start
-
-    start = time.time()
-    results['prodigal'] = check_one_contract_on_ether_leak(
-        bytecode, address, False, False, False
-    )
-    results['prodigal_time'] = time.time() - start
-
-    start = time.time()
-    results['greedy'] = check_one_contract_on_ether_lock(
-        bytecode, address, False, False
-    )
-    results['greedy_time'] = time.time() - start
-
+    try:
+        if recorder is not None: recorder.begin(address, 'suicidal')
+        start = time.time()
+        results['suicidal'] = check_one_contract_on_suicide(
+            bytecode, address, False, read_from_blockchain, False
+        )
+        results['suicide_time'] = time.time() - start
+
+        if recorder is not None: recorder.begin(address, 'prodigal')
+        start = time.time()
+        results['prodigal'] = check_one_contract_on_ether_leak(
+            bytecode, address, False, read_from_blockchain, False
+        )
+        results['prodigal_time'] = time.time() - start
+
+        if recorder is not None: recorder.begin(address, 'greedy')
+        start = time.time()
+        results['greedy'] = check_one_contract_on_ether_lock(
+            bytecode, address, False, read_from_blockchain
+        )
+        results['greedy_time'] = time.time() - start
+    finally:
+        MyGlobals.storage_provider = None
+
+    if MyGlobals.portfolio:
+        # Solver configurations that decided raced queries of this contract first
+        results['portfolio_wins'] = {
+            c: n - wins.get(c, 0) for c, n in path_solver.STATS.portfolio_wins.items() if n > wins.get(c, 0)
+        }
     return results
 
 
-def scan_random_contract(network: str = 'mainnet'):
+def scan_random_contract(network: str = 'mainnet', read_storage: bool = False):
+    # Imported lazily so that offline analysis (``run_checks``) does not pay
+    # the web3 start-up cost.
+    from web3 import Web3
+
     w3 = Web3(Web3.HTTPProvider(get_provider_url(network)))
     if not w3.is_connected():
         raise RuntimeError('Web3 provider not available')
@@ -84,7 +119,10 @@ def scan_random_contract(network: str = 'mainnet'):
     code_time = time.time() - t1
 
     t2 = time.time()
-    results = run_checks(code, address)
+    provider = None
+    if read_storage:
+        provider = RPCStorageProvider(get_provider_url(network))
+    results = run_checks(code, address, storage_provider=provider)
     check_time = time.time() - t2
 
     report = {
@@ -97,6 +135,34 @@ def scan_random_contract(network: str = 'mainnet'):
     return report
 
 
+def _load_existing(address_file: str | None, unique: bool) -> set:
+    """Return the addresses already listed in ``address_file``."""
+    if unique and address_file and os.path.exists(address_file):
+        with open(address_file, 'r', encoding='utf-8') as fh:
+            return {line.strip() for line in fh if line.strip()}
+    return set()
+
+
+def _record_vulnerable(report_path: Path, report: dict) -> None:
+    """Append the address of ``report`` to the list of each flagged bug."""
+    addr = report.get('address')
+    for key in ('suicidal', 'prodigal', 'greedy'):
+        if report.get(key):
+            with open(report_path / f'{key}.txt', 'a', encoding='utf-8') as fh:
+                fh.write(addr + "\n")
+
+
+def _save_addresses(
+    address_file: str | None, addresses: list, unique: bool, existing: set
+) -> None:
+    if address_file:
+        mode = 'a' if os.path.exists(address_file) else 'w'
+        with open(address_file, mode, encoding='utf-8') as fh:
+            for a in addresses:
+                if not unique or a not in existing:
+                    fh.write(a + "\n")
+
+
 def scan_multiple_contracts(
     count: int,
     network: str = 'mainnet',
@@ -104,6 +170,7 @@ def scan_multiple_contracts(
     unique: bool = True,
     address_file: str | None = None,
     report_dir: str = 'reports',
+    read_storage: bool = False,
 ):
     """Fetch and scan ``count`` random contracts from ``network``.
 
@@ -119,47 +186,168 @@ def scan_multiple_contracts(
         Optional path to store scanned addresses, one per line.
     report_dir:
         Directory where result files (``suicidal.txt`` etc.) will be stored.
+    read_storage:
+        If ``True`` the analysis reads the contracts' storage and balance from
+        the network instead of assuming empty storage.
     """
     reports = []
-    seen = set()
     addresses = []
 
-    existing = set()
-    if unique and address_file and os.path.exists(address_file):
-        with open(address_file, 'r', encoding='utf-8') as fh:
-            existing = {line.strip() for line in fh if line.strip()}
-        seen.update(existing)
+    existing = _load_existing(address_file, unique)
+    seen = set(existing)
 
     report_path = Path(report_dir)
     report_path.mkdir(parents=True, exist_ok=True)
 
-    def _append(path: Path, address: str) -> None:
-        with open(path, 'a', encoding='utf-8') as fh:
-            fh.write(address + "\n")
-
     while len(reports) < count:
-        report = scan_random_contract(network=network)
+        report = scan_random_contract(network=network, read_storage=read_storage)
         addr = report.get('address')
         if unique and addr in seen:
             continue
         seen.add(addr)
         addresses.append(addr)
         reports.append(report)
+        _record_vulnerable(report_path, report)
 
-        if report.get('suicidal'):
-            _append(report_path / 'suicidal.txt', addr)
-        if report.get('prodigal'):
-            _append(report_path / 'prodigal.txt', addr)
-        if report.get('greedy'):
-            _append(report_path / 'greedy.txt', addr)
+    _save_addresses(address_file, addresses, unique, existing)
 
-    if address_file:
-        mode = 'a' if os.path.exists(address_file) else 'w'
-        with open(address_file, mode, encoding='utf-8') as fh:
-            for a in addresses:
-                if not unique or a not in existing:
-                    fh.write(a + "\n")
+    return reports
 
+
+async def fetch_block_contracts(w3, block_num: int, sem: asyncio.Semaphore):
+    """Return ``(address, bytecode)`` of the contracts called in ``block_num``.
+
+    ``w3`` is an :class:`web3.AsyncWeb3` instance. The code of all transaction
+    targets is requested in a single JSON-RPC batch. ``sem`` bounds the number
+    of requests in flight.
+    """
+    async with sem:
+        block = await w3.eth.get_block(block_num, full_transactions=True)
+    targets = list(dict.fromkeys(
+        tx['to'] for tx in block['transactions'] if tx.get('to')
+    ))
+    if not targets:
+        return []
+    async with sem:
+        async with w3.batch_requests() as batch:
+            for addr in targets:
+                batch.add(w3.eth.get_code(addr))
+            codes = await batch.async_execute()
+    return [
+        (addr, bytes(code).hex())
+        for addr, code in zip(targets, codes)
+        if code and len(code) > 0
+    ]
+
+
+async def scan_contracts_async(
+    count: int,
+    network: str = 'mainnet',
+    *,
+    provider_url: str | None = None,
+    concurrency: int = 8,
+    workers: int | None = None,
+    search_depth: int = 1000,
+    unique: bool = True,
+    address_file: str | None = None,
+    report_dir: str = 'reports',
+    executor: Executor | None = None,
+):
+    """Asynchronous variant of :func:`scan_multiple_contracts`.
+
+    Blocks are fetched concurrently through web3's async HTTP provider, which
+    reuses one connection pool, with at most ``concurrency`` requests in
+    flight. Contract code is fetched in JSON-RPC batches and put on a bounded
+    queue from which ``workers`` analyses run in ``executor`` (a process pool
+    by default), so throughput is limited by the analysis rather than by RPC
+    latency.
+
+    Parameters
+    ----------
+    provider_url:
+        Node URL. Defaults to the URL of ``network``.
+    concurrency:
+        Maximum number of RPC requests in flight.
+    workers:
+        Number of parallel analyses. Defaults to the CPU count.
+    search_depth:
+        Blocks are picked at random among the newest ``search_depth`` ones.
+    executor:
+        Executor running :func:`run_checks`. Mainly useful for testing.
+    """
+    from web3 import AsyncHTTPProvider, AsyncWeb3
+
+    workers = workers or os.cpu_count() or 1
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    w3 = AsyncWeb3(AsyncHTTPProvider(provider_url or get_provider_url(network)))
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * workers)
+    done = asyncio.Event()
+
+    existing = _load_existing(address_file, unique)
+    seen = set(existing)
+    reports = []
+    addresses = []
+    report_path = Path(report_dir)
+    report_path.mkdir(parents=True, exist_ok=True)
+
+    async def producer(latest: int) -> None:
+        while not done.is_set():
+            block_num = latest - random.randint(0, search_depth)
+            t0 = time.time()
+            found = await fetch_block_contracts(w3, block_num, sem)
+            fetch_time = time.time() - t0
+            for addr, code in found:
+                if unique and addr in seen:
+                    continue
+                seen.add(addr)
+                await queue.put((addr, code, fetch_time))
+
+    async def consumer() -> None:
+        while not done.is_set():
+            addr, code, fetch_time = await queue.get()
+            t0 = time.time()
+            results = await loop.run_in_executor(executor, run_checks, code, addr)
+            if done.is_set():
+                return
+            report = {
+                'address': addr,
+                'fetch_time': fetch_time,
+                'code_time': 0.0,
+                'check_time': time.time() - t0,
+            }
+            report.update(results)
+            reports.append(report)
+            addresses.append(addr)
+            _record_vulnerable(report_path, report)
+            if len(reports) >= count:
+                done.set()
+
+    tasks = []
+    try:
+        latest = await w3.eth.block_number
+        tasks = [asyncio.ensure_future(producer(latest)) for _ in range(concurrency)]
+        tasks += [asyncio.ensure_future(consumer()) for _ in range(workers)]
+        waiter = asyncio.ensure_future(done.wait())
+        finished, _ = await asyncio.wait(
+            tasks + [waiter], return_when=asyncio.FIRST_COMPLETED
+        )
+        # A producer or consumer can only finish early by raising
+        for t in finished:
+            if t is not waiter and t.exception() is not None:
+                raise t.exception()
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await w3.provider.disconnect()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    _save_addresses(address_file, addresses, unique, existing)
     return reports
 
 
@@ -189,22 +377,67 @@ if __name__ == '__main__':
         '--allow-duplicates', action='store_true',
         help='allow scanning the same address more than once'
     )
+    parser.add_argument(
+        '--read-storage', action='store_true',
+        help='read contract storage and balance from the network during analysis '
+             '(sequential mode only)'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=0,
+        help='fetch blocks asynchronously with this many requests in flight '
+             'and analyse contracts in parallel (default: sequential)'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help='number of parallel analyses with --concurrency (default: CPU count)'
+    )
+    parser.add_argument(
+        '--portfolio', nargs='?', const=','.join(DEFAULT_PORTFOLIO), default=None,
+        help='race these comma separated solver configurations on slow queries '
+             '(default: %s)' % ','.join(DEFAULT_PORTFOLIO)
+    )
+    parser.add_argument(
+        '--record-queries', default=None,
+        help='append the solver queries to this archive for solver_replay.py '
+             '(sequential mode only)'
+    )
     parser.add_argument(
         '--verbose', action='store_true',
         help='print progress information'
     )
     args = parser.parse_args()
+    if args.read_storage and args.concurrency > 0:
+        parser.error('--read-storage is not supported with --concurrency')
 
     MyGlobals.verbose = args.verbose
-
-    reports = scan_multiple_contracts(
-        count=args.count,
-        network=args.network,
-        unique=not args.allow_duplicates,
-        address_file=args.address_file,
-        report_dir=args.report_dir,
-    )
+    if args.portfolio:
+        MyGlobals.portfolio = args.portfolio.split(',')
+    if args.record_queries and args.concurrency <= 0:
+        from solver_replay import QueryRecorder
+        path_solver.RECORDER = QueryRecorder(args.record_queries)
+
+    if args.concurrency > 0:
+        reports = asyncio.run(scan_contracts_async(
+            args.count,
+            args.network,
+            concurrency=args.concurrency,
+            workers=args.workers,
+            unique=not args.allow_duplicates,
+            address_file=args.address_file,
+            report_dir=args.report_dir,
+        ))
+    else:
+        reports = scan_multiple_contracts(
+            count=args.count,
+            network=args.network,
+            unique=not args.allow_duplicates,
+            address_file=args.address_file,
+            report_dir=args.report_dir,
+            read_storage=args.read_storage,
+        )
     for i, rep in enumerate(reports, 1):
         vprint(f'Scan {i}:')
         for k, v in rep.items():
             vprint(f'  {k}: {v}')
+    if path_solver.RECORDER is not None:
+        path_solver.RECORDER.close()
@@ -6,6 +6,7 @@ import com.google.cloud.bigquery.FieldValueList;
 
 import java.io.FileWriter;
 import java.io.IOException;
+import java.io.OutputStreamWriter;
 import java.io.PrintWriter;
 
 /**
@@ -13,6 +14,9 @@ import java.io.PrintWriter;
  *
  * Usage:
  *  java -cp <classpath> BigQueryFetcher --dataset <table> --start-block <start> --end-block <end> --output <file>
+ *
+ * With "--output -" the rows are written to stdout and flushed after every
+ * result page, so a reader can analyse them while the download continues.
  */
 public class BigQueryFetcher {
     public static void main(String[] args) throws Exception {
@@ -47,16 +51,24 @@ public class BigQueryFetcher {
             dataset, startBlock, endBlock);
         QueryJobConfiguration config = QueryJobConfiguration.newBuilder(query).build();
         TableResult result = bigquery.query(config);
-        try (PrintWriter out = new PrintWriter(new FileWriter(output))) {
-            for (FieldValueList row : result.iterateAll()) {
-                String address = row.get("address").getStringValue();
-                String bytecode = row.get("bytecode").getStringValue();
-                long blockNumber = row.get("block_number").getLongValue();
-                String line = String.format(
-                    "{\"Address\":\"%s\",\"ByteCode\":\"%s\",\"BlockNumber\":%d}",
-                    address, bytecode, blockNumber);
-                out.println(line);
+        PrintWriter out = "-".equals(output)
+            ? new PrintWriter(new OutputStreamWriter(System.out))
+            : new PrintWriter(new FileWriter(output));
+        try {
+            for (TableResult page = result; page != null; page = page.getNextPage()) {
+                for (FieldValueList row : page.getValues()) {
+                    String address = row.get("address").getStringValue();
+                    String bytecode = row.get("bytecode").getStringValue();
+                    long blockNumber = row.get("block_number").getLongValue();
+                    String line = String.format(
+                        "{\"Address\":\"%s\",\"ByteCode\":\"%s\",\"BlockNumber\":%d}",
+                        address, bytecode, blockNumber);
+                    out.println(line);
+                }
+                out.flush();
             }
+        } finally {
+            out.close();
         }
     }
 }
@@ -3,21 +3,23 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import subprocess
-from typing import Dict, List
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Deque, Dict, Iterator, List, Tuple
 
 from fetch_and_check import run_checks
 
 
-def run_java_fetcher(
+def _java_command(
     jar_path: str,
     dataset: str,
     start_block: int,
     end_block: int,
     output_file: str,
-) -> None:
-    """Execute the Java fetcher to retrieve contract data."""
-    cmd = [
+) -> List[str]:
+    return [
         "java",
         "-cp",
         jar_path,
@@ -31,9 +33,49 @@ def run_java_fetcher(
         "--output",
         output_file,
     ]
+
+
+def run_java_fetcher(
+    jar_path: str,
+    dataset: str,
+    start_block: int,
+    end_block: int,
+    output_file: str,
+) -> None:
+    """Execute the Java fetcher to retrieve contract data."""
+    cmd = _java_command(jar_path, dataset, start_block, end_block, output_file)
     subprocess.run(cmd, check=True)
 
 
+def stream_java_fetcher(
+    jar_path: str,
+    dataset: str,
+    start_block: int,
+    end_block: int,
+) -> Iterator[Dict[str, object]]:
+    """Run the Java fetcher with ``--output -`` and yield rows as they arrive.
+
+    Raises :class:`subprocess.CalledProcessError` once the output is
+    exhausted if the fetcher failed.
+    """
+    cmd = _java_command(jar_path, dataset, start_block, end_block, "-")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    finished = False
+    try:
+        for line in proc.stdout:
+            if line.strip():
+                yield json.loads(line)
+        finished = True
+    finally:
+        proc.stdout.close()
+        if not finished:
+            # The consumer stopped early, no need to download the rest
+            proc.terminate()
+        returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
 def scan_bigquery_with_java(
     dataset: str,
     start_block: int,
@@ -55,6 +97,65 @@ def scan_bigquery_with_java(
     return reports
 
 
+def scan_bigquery_streaming(
+    dataset: str,
+    start_block: int,
+    end_block: int,
+    *,
+    jar_path: str = "tool/java",
+    report_file: str = "reports/java_bigquery_reports.jsonl",
+    workers: int = 1,
+    max_pending: int | None = None,
+    executor: Executor | None = None,
+) -> Dict[str, int]:
+    """Analyse contracts while the Java fetcher is still downloading them.
+
+    Rows are read from the fetcher's stdout, submitted to a pool of
+    ``workers`` processes and every report is appended to ``report_file`` as
+    soon as it is ready, in fetch order. At most ``max_pending`` contracts
+    (default ``2 * workers``) are queued or running at any time, so memory use
+    does not grow with the block range. Returns the number of scanned and
+    flagged contracts.
+    """
+    max_pending = max_pending or 2 * workers
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    summary = {"scanned": 0, "suicidal": 0, "prodigal": 0, "greedy": 0}
+    pending: Deque[Tuple[Dict[str, object], Future]] = deque()
+
+    report_dir = os.path.dirname(report_file)
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+
+    def _write_oldest(out) -> None:
+        row, fut = pending.popleft()
+        res = dict(fut.result())
+        res["address"] = row["Address"]
+        res["block_number"] = row["BlockNumber"]
+        out.write(json.dumps(res) + "\n")
+        out.flush()
+        summary["scanned"] += 1
+        for key in ("suicidal", "prodigal", "greedy"):
+            if res.get(key):
+                summary[key] += 1
+
+    try:
+        with open(report_file, "a", encoding="utf-8") as out:
+            for row in stream_java_fetcher(jar_path, dataset, start_block, end_block):
+                if len(pending) >= max_pending:
+                    _write_oldest(out)
+                pending.append(
+                    (row, executor.submit(run_checks, row["ByteCode"], row["Address"]))
+                )
+            while pending:
+                _write_oldest(out)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+    return summary
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Fetch contracts from BigQuery using a Java helper and run Maian checks"
@@ -76,7 +177,34 @@ def main() -> None:
         default="contracts/java_bigquery_contracts.jsonl",
         help="destination JSONL file",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="analyse contracts while they are downloaded instead of saving them first",
+    )
+    parser.add_argument(
+        "--report-file",
+        default="reports/java_bigquery_reports.jsonl",
+        help="JSONL file reports are appended to in --stream mode",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of analysis processes in --stream mode",
+    )
     args = parser.parse_args()
+    if args.stream:
+        summary = scan_bigquery_streaming(
+            args.dataset,
+            args.start_block,
+            args.end_block,
+            jar_path=args.jar_path,
+            report_file=args.report_file,
+            workers=args.workers,
+        )
+        print(json.dumps(summary))
+        return
     reports = scan_bigquery_with_java(
         args.dataset,
         args.start_block,
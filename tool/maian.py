@@ -21,41 +21,48 @@ SOFTWARE.
 '''
 
 from __future__ import print_function
-from web3 import Web3
-import argparse,subprocess,sys
+import argparse,subprocess,sys,os
 
 
-found_depend = False
-try:
-    import z3
-except:
-    print("\033[91m[-] Python module z3 is missing.\033[0m Please install it (check https://github.com/Z3Prover/z3)")
-    found_depend = True
-try:
-    import web3
-except:
-    print("\033[91m[-] Python module web3 is missing.\033[0m Please install it (pip install web3).")
-    found_depend = True
+def check_dependencies(need_chain):
 
-if not (subprocess.call("type solc", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE) == 0):
-    print("\033[91m[-] Solidity compiler is missing.\033[0m Please install it (check http://solidity.readthedocs.io/en/develop/installing-solidity.html) and make sure solc is in the path.")
-    found_depend = True
+    # The checks are done only when Maian is started, so that importing the analysis
+    # modules (e.g. from batch scanners) does not shell out or import web3.
+    # solc and geth are needed only when the contract is deployed on the private chain
+    found_depend = False
+    try:
+        import z3
+    except:
+        print("\033[91m[-] Python module z3 is missing.\033[0m Please install it (check https://github.com/Z3Prover/z3)")
+        found_depend = True
 
-if not (subprocess.call("type geth", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE) == 0):
-    print("\033[91m[-] Go Ethereum is missing.\033[0m Please install it (check https://ethereum.github.io/go-ethereum/install/) and make sure geth is in the path.")
-    found_depend = True
+    if need_chain:
+        try:
+            import web3
+        except:
+            print("\033[91m[-] Python module web3 is missing.\033[0m Please install it (pip install web3).")
+            found_depend = True
 
-if found_depend:
-    sys.exit(1)
+        if not (subprocess.call("type solc", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE) == 0):
+            print("\033[91m[-] Solidity compiler is missing.\033[0m Please install it (check http://solidity.readthedocs.io/en/develop/installing-solidity.html) and make sure solc is in the path.")
+            found_depend = True
+
+        if not (subprocess.call("type geth", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE) == 0):
+            print("\033[91m[-] Go Ethereum is missing.\033[0m Please install it (check https://ethereum.github.io/go-ethereum/install/) and make sure geth is in the path.")
+            found_depend = True
+
+    if found_depend:
+        sys.exit(1)
 
 
 
 import check_suicide
 import check_leak
 import check_lock
+import path_solver
+from solver_portfolio import DEFAULT_PORTFOLIO
 from values import MyGlobals, vprint
 from blockchain import *
-from contracts import *
 
 
 global debug, max_calldepth_in_normal_search, read_from_blockchain, checktype
@@ -63,6 +70,11 @@ global debug, max_calldepth_in_normal_search, read_from_blockchain, checktype
 
 def main(args):
 
+    # `maian serve ...` starts the long-lived analysis daemon
+    if len(args) > 0 and args[0] == 'serve':
+        import maian_server
+        maian_server.main(args[1:])
+        return
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-c","--check",        type=str,   help="Check type: use 0 for SUICIDAL check, 1 for PRODIGAL, and 2 for GREEDY", action='store')
@@ -71,6 +83,13 @@ def main(args):
     parser.add_argument("-bs","--bytecode_source",        type=str,   help="Check source bytecode contract by specifying contract file", action='store')
     parser.add_argument("--debug",        help="Print extended debug info ", action='store_true')
     parser.add_argument("--max_inv",        help="The maximal number of function invocations (default 3) ", action='store')
+    parser.add_argument("--no_prune",        help="Also try call sequences where a call writes nothing that a later call reads", action='store_true')
+    parser.add_argument("--no_slicing",        help="Send all path constraints to Z3 instead of the slice that shares variables with the new ones", action='store_true')
+    parser.add_argument("--no_solver_cache",        help="Do not answer solver queries from earlier models and unsatisfiable constraint sets", action='store_true')
+    parser.add_argument("--solver_stats",        help="Print solver statistics: cache hit rates, average slice size, the time saved over unsliced queries and the portfolio's winners", action='store_true')
+    parser.add_argument("--portfolio",        type=str,   help="Race these comma separated solver configurations on queries slower than --portfolio_after (default: %s)" % ','.join(DEFAULT_PORTFOLIO), action='store', nargs='?', const=','.join(DEFAULT_PORTFOLIO))
+    parser.add_argument("--portfolio_after",        help="Milliseconds before a query is raced in the portfolio (default 1000)", action='store')
+    parser.add_argument("--record_queries",        type=str,   help="Append the solver queries to this archive for solver_replay.py", action='store')
     parser.add_argument("--solve_timeout",        help="Z3 solver timeout in milliseconds (default 10000, i.e. 10 seconds)", action='store')
     parser.add_argument("--verbose", help="Print progress information", action='store_true')
 
@@ -79,16 +98,32 @@ def main(args):
 
     if args.debug:          MyGlobals.debug = True
     if args.max_inv:        MyGlobals.max_calldepth_in_normal_search = int(args.max_inv)
+    if args.no_prune:       MyGlobals.prune_sequences = False
+    if args.no_slicing:     MyGlobals.slice_constraints = False
+    if args.no_solver_cache: MyGlobals.use_solver_cache = False
+    if args.portfolio:      MyGlobals.portfolio = args.portfolio.split(',')
+    if args.portfolio_after: MyGlobals.portfolio_threshold = int(args.portfolio_after)
+    if args.solver_stats:   MyGlobals.compare_slices = True
     if args.solve_timeout:  MyGlobals.SOLVER_TIMEOUT = int(args.solve_timeout)
     if args.check:          MyGlobals.checktype = int(args.check)
     if args.verbose:        MyGlobals.verbose = True
+    if args.record_queries:
+        from solver_replay import QueryRecorder
+        path_solver.RECORDER = QueryRecorder(args.record_queries)
+        path_solver.RECORDER.begin(args.bytecode or args.bytecode_source or (args.soliditycode or [''])[-1],
+                                   ['suicidal', 'prodigal', 'greedy'][MyGlobals.checktype])
 
 
-    kill_active_blockchain()
+    check_dependencies(bool(args.soliditycode or args.bytecode_source))
 
 
     if args.soliditycode or args.bytecode_source:
 
+        # Compilation and deployment need web3/rlp, so import them only here
+        from contracts import compile_contract, get_function_hashes, predict_contract_address, deploy_contract
+
+        kill_active_blockchain()
+
         vprint('\n'+'=' * 100)
 
         read_from_blockchain = True
@@ -172,6 +207,10 @@ def main(args):
     else:
         pass
 
+    if args.solver_stats:
+        print('[ ] Solver: %s' % path_solver.STATS)
+    if path_solver.RECORDER is not None:
+        path_solver.RECORDER.close()
 
 
 
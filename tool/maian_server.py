@@ -0,0 +1,365 @@
+"""Long-lived Maian analysis daemon with a local HTTP API.
+
+The daemon keeps a pool of warm worker processes (z3 and the analysis modules
+are imported once per worker) and accepts bytecode over HTTP, either on a TCP
+port bound to localhost or on a Unix socket. Start it with::
+
+    python tool/maian.py serve --port 8551 --workers 4
+
+Endpoints:
+
+``POST /check``
+    Body ``{"bytecode": "...", "address": "0x..."}`` returns the verdict of
+    :func:`fetch_and_check.run_checks`. A batch can be sent as
+    ``{"contracts": [{"bytecode": ..., "address": ...}, ...]}`` and is answered
+    with ``{"results": [...]}`` in the same order.
+``GET /stats``
+    Queue depth, number of processed contracts and throughput.
+``GET /health``
+    Returns ``{"status": "ok"}``.
+
+A contract whose analysis exceeds the per-contract timeout, or whose worker
+dies, is answered with ``{"error": ...}``; the worker pool is rebuilt so the
+daemon keeps serving.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socketserver
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+# 8550 is used by the private chain started in blockchain.py
+DEFAULT_PORT = 8551
+DEFAULT_TIMEOUT = 600.0
+# Seconds the daemon waits beyond the timeout before it kills a worker that
+# does not return, e.g. because it is stuck inside z3
+KILL_GRACE = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_worker() -> None:
+    """Import the analysis modules once when a worker process starts."""
+    import fetch_and_check  # noqa: F401
+
+
+def _check_contract(bytecode: str, address: str) -> Dict[str, Any]:
+    from fetch_and_check import run_checks
+
+    return run_checks(bytecode, address)
+
+
+def _run_limited(
+    check_fn: Callable[[str, str], Dict[str, Any]],
+    timeout: Optional[float],
+    bytecode: str,
+    address: str,
+) -> Dict[str, Any]:
+    """Run ``check_fn`` in the worker and raise TimeoutError after ``timeout`` seconds."""
+    if (
+        not timeout
+        or not hasattr(signal, "SIGALRM")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        return check_fn(bytecode, address)
+
+    def _expire(signum: int, frame: Any) -> None:
+        raise TimeoutError(f"analysis exceeded {timeout:g}s")
+
+    previous = signal.signal(signal.SIGALRM, _expire)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return check_fn(bytecode, address)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class AnalysisService:
+    """Dispatch contracts to a pool of analysis workers and keep statistics.
+
+    Parameters
+    ----------
+    workers:
+        Number of worker processes. Defaults to the CPU count.
+    executor:
+        Optional executor to use instead of a new :class:`ProcessPoolExecutor`.
+        The analysis relies on global state, so a thread pool is only safe
+        with a single worker. A given executor is not rebuilt when it breaks.
+    check_fn:
+        Function called with ``(bytecode, address)`` in the worker.
+    timeout:
+        Seconds one contract may be analysed; None for no limit. A worker
+        that does not return within ``KILL_GRACE`` more seconds is killed.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        *,
+        executor: Optional[Executor] = None,
+        check_fn: Callable[[str, str], Dict[str, Any]] = _check_contract,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._owns_executor = executor is None
+        self._executor = executor or self._new_executor()
+        self._check_fn = check_fn
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()
+        self._restarts = 0
+        self._started = time.time()
+        self._pending = 0
+        self._processed = 0
+        self._failed = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+
+    def _restart(self, broken: Executor) -> None:
+        """Replace the pool ``broken`` with a new one, killing its workers."""
+        if not self._owns_executor:
+            return
+        with self._restart_lock:
+            if self._executor is not broken:
+                return  # another thread already rebuilt it
+            logger.warning("restarting the worker pool")
+            # ProcessPoolExecutor has no public way to stop a running task
+            for proc in list((getattr(broken, "_processes", None) or {}).values()):
+                proc.terminate()
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            self._restarts += 1
+
+    def _done(self, fut: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if fut.cancelled() or fut.exception() is not None:
+                self._failed += 1
+            else:
+                self._processed += 1
+
+    def submit(self, bytecode: str, address: str = "") -> Future:
+        """Queue one contract and return a future with its verdict."""
+        with self._lock:
+            self._pending += 1
+        args = (_run_limited, self._check_fn, self.timeout, bytecode, address)
+        try:
+            executor = self._executor
+            try:
+                fut = executor.submit(*args)
+            except BrokenProcessPool:
+                # A worker died (segfault, OOM kill) and broke the pool
+                self._restart(executor)
+                fut = self._executor.submit(*args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        fut.add_done_callback(self._done)
+        return fut
+
+    def _result(self, fut: Future) -> Dict[str, Any]:
+        """Wait for ``fut``, at most ``timeout + KILL_GRACE`` once it runs."""
+        if not self.timeout:
+            return fut.result()
+        while not fut.running() and not fut.done():
+            time.sleep(0.05)
+        # A process pool marks one call more than it has workers as running,
+        # and that call may wait up to one timeout for a free worker
+        return fut.result(timeout=2 * self.timeout + KILL_GRACE)
+
+    def check_batch(self, contracts: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Analyse ``contracts`` in parallel and return results in order."""
+        futures = [
+            self.submit(c["bytecode"], c.get("address", "")) for c in contracts
+        ]
+        executor = self._executor
+        results = []
+        for c, fut in zip(contracts, futures):
+            try:
+                res = dict(self._result(fut))
+            except Exception as exc:  # report the failure, keep the batch
+                if not fut.done():
+                    # The worker ignored its own timeout
+                    fut.cancel()
+                    self._restart(executor)
+                    exc = TimeoutError(f"analysis exceeded {self.timeout:g}s")
+                elif isinstance(exc, BrokenProcessPool):
+                    self._restart(executor)
+                res = {"error": str(exc) or type(exc).__name__}
+            res["address"] = c.get("address", "")
+            results.append(res)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and throughput counters."""
+        with self._lock:
+            pending = self._pending
+            processed = self._processed
+            failed = self._failed
+        uptime = time.time() - self._started
+        return {
+            "workers": self.workers,
+            "queue_depth": max(pending - self.workers, 0),
+            "in_flight": min(pending, self.workers),
+            "processed": processed,
+            "failed": failed,
+            "pool_restarts": self._restarts,
+            "uptime_seconds": uptime,
+            "contracts_per_second": processed / uptime if uptime else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    service: AnalysisService
+
+    def address_string(self) -> str:
+        # Unix socket clients have no (host, port) address
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _reply(self, code: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/stats":
+            self._reply(200, self.service.stats())
+        elif self.path == "/health":
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/check":
+            self._reply(404, {"error": f"unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "invalid JSON body"})
+            return
+        if not isinstance(request, dict):
+            self._reply(400, {"error": "expected a JSON object"})
+            return
+        if "contracts" in request:
+            contracts = request["contracts"]
+            if not isinstance(contracts, list) or not all(
+                isinstance(c, dict) for c in contracts
+            ):
+                self._reply(400, {"error": "'contracts' must be a list of objects"})
+                return
+        elif "bytecode" in request:
+            contracts = [request]
+        else:
+            self._reply(400, {"error": "expected 'bytecode' or 'contracts'"})
+            return
+        for c in contracts:
+            code = c.get("bytecode")
+            if not isinstance(code, str):
+                self._reply(400, {"error": "bytecode must be a hex string"})
+                return
+            if code.startswith("0x"):
+                c["bytecode"] = code[2:]
+        try:
+            results = self.service.check_batch(contracts)
+        except Exception as exc:
+            logger.exception("analysis failed")
+            self._reply(500, {"error": str(exc) or type(exc).__name__})
+            return
+        if "contracts" in request:
+            self._reply(200, {"results": results})
+        else:
+            self._reply(200, results[0])
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def make_server(
+    service: AnalysisService,
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    unix_socket: Optional[str] = None,
+) -> socketserver.BaseServer:
+    """Create an HTTP server bound to ``host:port`` or to ``unix_socket``."""
+    handler = type("MaianHandler", (_RequestHandler,), {"service": service})
+    if unix_socket:
+        return _UnixHTTPServer(unix_socket, handler)
+    server: HTTPServer = ThreadingHTTPServer((host, port), handler)
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="maian serve", description="Run the Maian analysis daemon"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--socket", default=None, help="listen on a Unix socket instead of TCP"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_TIMEOUT,
+        help="seconds one contract may be analysed, 0 for no limit "
+             f"(default: {DEFAULT_TIMEOUT:g})",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    service = AnalysisService(args.workers, timeout=args.timeout or None)
+    server = make_server(
+        service, host=args.host, port=args.port, unix_socket=args.socket
+    )
+    where = args.socket or f"http://{args.host}:{args.port}"
+    logger.info("serving on %s with %d workers", where, service.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Byte-addressed EVM memory for the symbolic interpreter.
+
+Concrete bytes live in fixed-size ``bytearray`` pages. Values that are not
+concrete (symbolic expressions and undefined values) are kept in a sparse
+overlay of fragments on top of the pages. A fragment covers at most 32 bytes
+of one 256-bit word and is stored as an immutable tuple
+``(start, end, origin, value)``: bytes ``start`` to ``end - 1`` of memory hold
+bytes ``start - origin`` to ``end - origin - 1`` of the word ``value``
+(big-endian, as written by ``MSTORE`` at ``origin``). Fragments never
+overlap. A partial overwrite splits a fragment and both halves keep their
+origin.
+
+Every fragment is indexed in the 32-byte buckets it touches, so ``MLOAD`` and
+``MSTORE`` at any offset inspect at most two buckets. Copies share pages and
+the overlay until one side writes (copy-on-write), which keeps the many
+copies made when the search branches cheap.
+
+Values are immutable :class:`values.SymWord` instances and are stored and
+returned without copying.
+"""
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+import z3
+from z3 import BitVecVal, Concat, Extract, is_bv_value, simplify
+
+from values import SymWord
+
+PAGE_SIZE = 1024
+
+Fragment = Tuple[int, int, int, SymWord]
+
+
+def _fixed_value(value: SymWord) -> Optional[int]:
+    """Return the integer of a concrete value or ``None``."""
+    if value.kind != "constant":
+        return None
+    z = simplify(value.term)
+    return z.as_long() if is_bv_value(z) else None
+
+
+class Memory:
+    """EVM memory with concrete pages and a symbolic fragment overlay."""
+
+    __slots__ = ("_pages", "_owned", "_frags", "_buckets", "_shared", "_size")
+
+    def __init__(self) -> None:
+        self._pages: Dict[int, bytearray] = {}
+        # Pages this instance may modify in place; the rest may be shared
+        self._owned: Set[int] = set()
+        self._frags: Dict[int, Fragment] = {}
+        self._buckets: Dict[int, FrozenSet[int]] = {}
+        self._shared = False
+        self._size = 0
+
+    # ------------------------------------------------------------------
+    # Copying
+
+    def copy(self) -> "Memory":
+        """Return a copy sharing all data with ``self`` until either side writes."""
+        other = Memory.__new__(Memory)
+        other._pages = dict(self._pages)
+        other._owned = set()
+        self._owned = set()
+        other._frags = self._frags
+        other._buckets = self._buckets
+        other._shared = self._shared = True
+        other._size = self._size
+        return other
+
+    def __copy__(self) -> "Memory":
+        return self.copy()
+
+    def __deepcopy__(self, memo) -> "Memory":
+        return self.copy()
+
+    def _unshare(self) -> None:
+        if self._shared:
+            self._frags = dict(self._frags)
+            self._buckets = dict(self._buckets)
+            self._shared = False
+
+    # ------------------------------------------------------------------
+    # Concrete pages
+
+    def _writable_page(self, n: int) -> bytearray:
+        if n in self._owned:
+            return self._pages[n]
+        old = self._pages.get(n)
+        page = bytearray(old) if old is not None else bytearray(PAGE_SIZE)
+        self._pages[n] = page
+        self._owned.add(n)
+        return page
+
+    def _write_bytes(self, addr: int, data: bytes) -> None:
+        pos = 0
+        while pos < len(data):
+            n, off = divmod(addr + pos, PAGE_SIZE)
+            chunk = min(len(data) - pos, PAGE_SIZE - off)
+            self._writable_page(n)[off : off + chunk] = data[pos : pos + chunk]
+            pos += chunk
+
+    def _read_bytes(self, addr: int, length: int) -> bytes:
+        out = bytearray()
+        pos = addr
+        end = addr + length
+        while pos < end:
+            n, off = divmod(pos, PAGE_SIZE)
+            chunk = min(end - pos, PAGE_SIZE - off)
+            page = self._pages.get(n)
+            out += page[off : off + chunk] if page is not None else bytes(chunk)
+            pos += chunk
+        return bytes(out)
+
+    # ------------------------------------------------------------------
+    # Overlay
+
+    def _add_frag(self, frag: Fragment) -> None:
+        start, end = frag[0], frag[1]
+        self._frags[start] = frag
+        for b in range(start // 32, (end - 1) // 32 + 1):
+            self._buckets[b] = self._buckets.get(b, frozenset()) | {start}
+
+    def _remove_frag(self, start: int) -> Fragment:
+        frag = self._frags.pop(start)
+        for b in range(start // 32, (frag[1] - 1) // 32 + 1):
+            rest = self._buckets[b] - {start}
+            if rest:
+                self._buckets[b] = rest
+            else:
+                del self._buckets[b]
+        return frag
+
+    def _overlapping(self, lo: int, hi: int) -> List[Fragment]:
+        """Return the fragments intersecting ``[lo, hi)`` ordered by start."""
+        if not self._frags or hi <= lo:
+            return []
+        starts: Set[int] = set()
+        for b in range(lo // 32, (hi - 1) // 32 + 1):
+            starts |= self._buckets.get(b, frozenset())
+        frags = [self._frags[s] for s in starts]
+        return sorted(
+            (f for f in frags if f[0] < hi and f[1] > lo), key=lambda f: f[0]
+        )
+
+    def _clear_range(self, lo: int, hi: int) -> None:
+        """Remove the overlay from ``[lo, hi)``, keeping the parts outside."""
+        frags = self._overlapping(lo, hi)
+        if not frags:
+            return
+        self._unshare()
+        for start, end, origin, value in frags:
+            self._remove_frag(start)
+            if start < lo:
+                self._add_frag((start, lo, origin, value))
+            if end > hi:
+                self._add_frag((hi, end, origin, value))
+
+    def _touch(self, end: int) -> None:
+        if end > self._size:
+            self._size = end
+
+    # ------------------------------------------------------------------
+    # Interpreter API
+
+    def store_word(self, addr: int, value: SymWord) -> None:
+        """``MSTORE``: write the 32-byte word ``value`` at ``addr``."""
+        self._touch(addr + 32)
+        self._clear_range(addr, addr + 32)
+        concrete = _fixed_value(value)
+        if concrete is not None:
+            self._write_bytes(addr, concrete.to_bytes(32, "big"))
+        else:
+            self._unshare()
+            self._add_frag((addr, addr + 32, addr, value))
+
+    def store_byte(self, addr: int, value: SymWord) -> None:
+        """``MSTORE8``: write the lowest byte of ``value`` at ``addr``."""
+        self._touch(addr + 1)
+        self._clear_range(addr, addr + 1)
+        concrete = _fixed_value(value)
+        if concrete is not None:
+            self._write_bytes(addr, bytes([concrete & 0xFF]))
+        else:
+            # The byte is the last byte of the word, as if stored at addr - 31
+            self._unshare()
+            self._add_frag((addr, addr + 1, addr - 31, value))
+
+    def mark_undefined(self, addr: int, length: int, step: int) -> None:
+        """Mark ``length`` bytes from ``addr`` as undefined (e.g. ``CALL`` output)."""
+        if length <= 0:
+            return
+        self._touch(addr + length)
+        self._clear_range(addr, addr + length)
+        self._unshare()
+        undefined = SymWord.undefined(step)
+        for start in range(addr, addr + length, 32):
+            self._add_frag((start, min(start + 32, addr + length), start, undefined))
+
+    def load_word(self, addr: int, step: int) -> SymWord:
+        """``MLOAD``: return the 32-byte word at ``addr``, at any alignment."""
+        self._touch(addr + 32)
+        frags = self._overlapping(addr, addr + 32)
+        if not frags:
+            value = int.from_bytes(self._read_bytes(addr, 32), "big")
+            return SymWord.constant(step, BitVecVal(value, 256))
+        if len(frags) == 1 and frags[0][:3] == (addr, addr + 32, addr):
+            return frags[0][3]
+        if any(f[3].kind == "undefined" for f in frags):
+            return SymWord.undefined(step)
+
+        parts = []
+        pos = addr
+        for start, end, origin, value in frags:
+            lo, hi = max(start, addr), min(end, addr + 32)
+            if lo > pos:
+                gap = self._read_bytes(pos, lo - pos)
+                parts.append(BitVecVal(int.from_bytes(gap, "big"), 8 * len(gap)))
+            parts.append(
+                Extract(255 - 8 * (lo - origin), 256 - 8 * (hi - origin), value.term)
+            )
+            pos = hi
+        if pos < addr + 32:
+            tail = self._read_bytes(pos, addr + 32 - pos)
+            parts.append(BitVecVal(int.from_bytes(tail, "big"), 8 * len(tail)))
+        word = parts[0] if len(parts) == 1 else Concat(*parts)
+        return SymWord.constant(step, simplify(word))
+
+    def concrete_bytes(self, addr: int, length: int) -> Optional[bytes]:
+        """Return ``length`` bytes from ``addr``, or ``None`` if any is not concrete."""
+        if length <= 0:
+            return b""
+        self._touch(addr + length)
+        frags = self._overlapping(addr, addr + length)
+        if not frags:
+            return self._read_bytes(addr, length)
+        out = bytearray()
+        pos = addr
+        for start, end, origin, value in frags:
+            concrete = _fixed_value(value)
+            if concrete is None:
+                return None
+            lo, hi = max(start, addr), min(end, addr + length)
+            if lo > pos:
+                out += self._read_bytes(pos, lo - pos)
+            out += concrete.to_bytes(32, "big")[lo - origin : hi - origin]
+            pos = hi
+        if pos < addr + length:
+            out += self._read_bytes(pos, addr + length - pos)
+        return bytes(out)
+
+    def size(self) -> int:
+        """``MSIZE``: highest accessed byte rounded up to a word."""
+        return (self._size + 31) // 32 * 32
+
+    def substitute(self, *pairs) -> None:
+        """Apply ``z3.substitute(expr, *pairs)`` to every symbolic value.
+
+        Fragments are replaced rather than modified, so copies that still
+        share them are not affected.
+        """
+        changed = []
+        for frag in self._frags.values():
+            value = frag[3]
+            if value.term is None:
+                continue
+            new = simplify(z3.substitute(value.term, *pairs))
+            if not new.eq(value.term):
+                changed.append(frag[:3] + (value.with_term(new),))
+        if changed:
+            self._unshare()
+            for frag in changed:
+                self._remove_frag(frag[0])
+                self._add_frag(frag)
+
+    def words(self) -> Iterator[Tuple[int, SymWord]]:
+        """Yield ``(address, value)`` for every non-zero or symbolic aligned word."""
+        addrs = {b * 32 for b in self._buckets}
+        for n, page in self._pages.items():
+            for off in range(0, PAGE_SIZE, 32):
+                if any(page[off : off + 32]):
+                    addrs.add(n * PAGE_SIZE + off)
+        for addr in sorted(addrs):
+            frags = self._overlapping(addr, addr + 32)
+            if frags and frags[0][:3] == (addr, addr + 32, addr):
+                yield addr, frags[0][3]
+            else:
+                # Read without extending MSIZE
+                size = self._size
+                yield addr, self.load_word(addr, -1)
+                self._size = size
+
+    # ------------------------------------------------------------------
+    # Comparison (used to detect already seen configurations)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Memory):
+            return NotImplemented
+        if self._frags is not other._frags:
+            if self._frags.keys() != other._frags.keys():
+                return False
+            for start, a in self._frags.items():
+                b = other._frags[start]
+                if a is b:
+                    continue
+                if a[:3] != b[:3] or a[3].kind != b[3].kind:
+                    return False
+                za, zb = a[3].term, b[3].term
+                if (za is None) != (zb is None) or (za is not None and not za.eq(zb)):
+                    return False
+        for n in self._pages.keys() | other._pages.keys():
+            pa, pb = self._pages.get(n), other._pages.get(n)
+            if pa is pb:
+                continue
+            if (pa if pa is not None else bytes(PAGE_SIZE)) != (
+                pb if pb is not None else bytes(PAGE_SIZE)
+            ):
+                return False
+        return True
+
+    def __ne__(self, other: object) -> bool:
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None  # mutable
+
+    def __repr__(self) -> str:
+        return "Memory(size=%d, pages=%d, fragments=%d)" % (
+            self.size(),
+            len(self._pages),
+            len(self._frags),
+        )
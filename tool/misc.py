@@ -24,8 +24,7 @@ def print_storage(storage):
 
 def print_memory(mmemory):
     print('************************************ MEMORY ************************************')
-    for m in mmemory:
-        fl = mmemory[m]
+    for m, fl in mmemory.words():
         print('\033[91m[ %64x ] \033[0m : ' % (m), end='' )        
         if fl['type'] == 'undefined' : print('undefined' )
         elif is_bv_value( simplify(fl['z3'])): print('%x' % (simplify(fl['z3']).as_long() ) )
@@ -54,6 +53,8 @@ def get_function_calls( calldepth, debug ):
 
 
         m = MyGlobals.s.model()
+        if m is None:
+            return False
 
         if debug: print('\nSolution:')
         sol = {}
@@ -15,7 +15,33 @@ def get_one_op( code, pos, size_of_input, debug=False ):
     t = {'id':int(pos/2),'op':code[pos:pos+2],'input':code[pos+2:pos+2+2*size_of_input],'o':o}
     return (pos + 2 + 2*size_of_input, t)
 
+# Two-character hex names of all byte values, used when parsing raw bytecode
+byte_names = ['%02x' % b for b in range(256)]
+
+def parse_code_bytes( code, debug = False):
+    # Same output as parse_code, but reads raw bytes (bytes, bytearray or
+    # memoryview) directly instead of slicing a hex string
+    code = memoryview(code).cast('B')
+    ops = list()
+    n = len(code)
+    i = 0
+    while i < n:
+        b = code[i]
+        size_of_input = b - 0x5f if 0x60 <= b <= 0x7f else 0
+        if i + 1 + size_of_input > n:
+            if debug: print('Incorrect code op at %x : %d : %d' % (i, i+1+size_of_input, n) )
+        op = byte_names[b]
+        o = cops.get('0x' + op, '')
+        inp = code[i+1:i+1+size_of_input].hex() if size_of_input else ''
+        ops.append( {'id':i,'op':op,'input':inp,'o':o} )
+        i += 1 + size_of_input
+
+    return ops
+
 def parse_code( code, debug = False):
+    if isinstance(code, (bytes, bytearray, memoryview)):
+        return parse_code_bytes( code, debug )
+
     ops = list()
 
     i = 0;
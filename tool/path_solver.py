@@ -0,0 +1,349 @@
+"""Path constraint solver that only sends the relevant constraints to Z3.
+
+The search keeps every constraint of the current path in ``MyGlobals.s``:
+branch conditions, pinned ``CALLDATALOAD`` values, results of earlier
+transactions. Most of them share no variable with the condition being
+tested. :class:`PathSolver` has the part of the :class:`z3.Solver`
+interface the engine uses (``add``, ``push``, ``pop``, ``check``,
+``model``, ``assertions``, ``set``) and remembers the prefix of the path
+that is known to be satisfiable. A ``check()`` only gives Z3 the constraints
+added since then, together with the known constraints that share variables
+with them, directly or through other constraints (the independence slice).
+As the rest is satisfiable and shares no variable with the slice, the answer
+is the same as for the whole path.
+
+Before Z3, the slice is looked up in a :class:`CounterexampleCache`, as in
+KLEE: a recent model that satisfies every constraint of the slice proves it
+satisfiable, and a slice containing a set of constraints that was
+unsatisfiable before is unsatisfiable.
+
+The slices are solved with one incremental Z3 solver that follows
+``push``/``pop``, so what Z3 learns is kept across sibling branches.
+``model()`` needs values for all variables, so it solves the whole path; it
+returns None when Z3 gives no answer.
+With a :class:`solver_portfolio.Portfolio`, a query that the solver does not
+answer within the portfolio's threshold is raced with other configurations.
+Statistics of all instances are collected in :data:`STATS`. When
+:data:`RECORDER` is set (see solver_replay.py), every query answered by Z3
+or by the cache is recorded.
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter, deque
+from typing import Dict, FrozenSet, List, Optional
+
+from z3 import (
+    AstVector,
+    Solver,
+    Z3_OP_UNINTERPRETED,
+    is_app,
+    is_const,
+    is_true,
+    sat,
+    unknown,
+    unsat,
+)
+
+from solver_portfolio import DEFAULT_TIMEOUT, Portfolio, wins_by_config
+
+MAX_VARS_CACHE = 200000
+CACHED_MODELS = 16
+CACHED_UNSAT = 256
+
+# get_id() -> (ast, names); the ast is kept so its id is not reused
+_vars_cache: Dict[int, tuple] = {}
+
+
+def constraint_vars(c) -> FrozenSet[str]:
+    """Return the names of the uninterpreted constants in ``c``."""
+    key = c.get_id()
+    hit = _vars_cache.get(key)
+    if hit is not None:
+        return hit[1]
+    names = set()
+    seen = set()
+    todo = [c]
+    while todo:
+        e = todo.pop()
+        eid = e.get_id()
+        if eid in seen:
+            continue
+        seen.add(eid)
+        sub = _vars_cache.get(eid)
+        if sub is not None:
+            names |= sub[1]
+            continue
+        if is_const(e) and e.decl().kind() == Z3_OP_UNINTERPRETED:
+            names.add(e.decl().name())
+        elif is_app(e):
+            todo.extend(e.children())
+    if len(_vars_cache) > MAX_VARS_CACHE:
+        _vars_cache.clear()
+    names = frozenset(names)
+    _vars_cache[key] = (c, names)
+    return names
+
+
+class CounterexampleCache:
+    """Recent models and unsatisfiable constraint sets of one analysis.
+
+    The constraints are kept alive with the cache, so their ``get_id()``
+    identifies them: Z3 shares the node of an expression built twice.
+    """
+
+    def __init__(self, models: int = CACHED_MODELS, unsat_sets: int = CACHED_UNSAT) -> None:
+        self.models = deque(maxlen=models)
+        self.unsat_sets = deque(maxlen=unsat_sets)
+
+    def lookup(self, constraints: List):
+        """Return sat or unsat if the cache decides ``constraints``, else None."""
+        ids = frozenset(c.get_id() for c in constraints)
+        for core, _ in self.unsat_sets:
+            if core <= ids:
+                return unsat
+        for i, m in enumerate(self.models):
+            if all(is_true(m.eval(c, model_completion=True)) for c in constraints):
+                if i:
+                    del self.models[i]
+                    self.models.appendleft(m)
+                return sat
+        return None
+
+    def add_model(self, model) -> None:
+        self.models.appendleft(model)
+
+    def add_unsat(self, constraints: List) -> None:
+        self.unsat_sets.appendleft((frozenset(c.get_id() for c in constraints), list(constraints)))
+
+
+class SolverStats:
+    """Counters shared by all :class:`PathSolver` instances."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.checks = 0             # check() calls
+        self.known = 0              # answered without Z3, nothing new on the path
+        self.cache_sat = 0          # answered sat by a cached model
+        self.cache_unsat = 0        # answered unsat by a cached unsatisfiable set
+        self.cache_time = 0.0       # seconds in cache lookups
+        self.solved = 0             # sent to Z3
+        self.slice_size = 0         # constraints sent to Z3, summed
+        self.path_size = 0          # constraints on the path, summed
+        self.solve_time = 0.0       # seconds in Z3 for the slices
+        self.compared = 0           # slices also solved unsliced (compare mode)
+        self.compared_time = 0.0    # seconds of those slices
+        self.full_time = 0.0        # seconds of the same queries unsliced
+        self.raced = 0              # queries raced in the portfolio
+        self.portfolio_wins = Counter()  # configuration -> queries it decided first
+
+    def summary(self) -> Dict[str, float]:
+        solved = max(self.solved, 1)
+        looked_up = max(self.checks - self.known, 1)
+        out = {
+            "checks": self.checks,
+            "known": self.known,
+            "cache_sat": self.cache_sat,
+            "cache_unsat": self.cache_unsat,
+            "cache_hit_rate": (self.cache_sat + self.cache_unsat) / looked_up,
+            "cache_time": self.cache_time,
+            "solved": self.solved,
+            "avg_slice": self.slice_size / solved,
+            "avg_path": self.path_size / solved,
+            "solve_time": self.solve_time,
+        }
+        if self.compared:
+            out["time_saved"] = self.full_time - self.compared_time
+        if self.raced:
+            out["raced"] = self.raced
+            out["portfolio_wins"] = dict(self.portfolio_wins)
+        return out
+
+    def __str__(self) -> str:
+        s = self.summary()
+        text = ("%d checks, %d answered without Z3, cache hits %d sat + %d unsat (%.0f%%),"
+                " avg slice %.1f of %.1f constraints, %.2fs in Z3"
+                % (s["checks"], s["known"], s["cache_sat"], s["cache_unsat"], 100 * s["cache_hit_rate"],
+                   s["avg_slice"], s["avg_path"], s["solve_time"]))
+        if "time_saved" in s:
+            text += ", %.2fs saved over %d unsliced queries" % (s["time_saved"], self.compared)
+        if self.raced:
+            text += ", %d raced (wins: %s)" % (self.raced, wins_by_config(self.portfolio_wins) or "none")
+        return text
+
+
+STATS = SolverStats()
+RECORDER = None
+
+
+class PathSolver:
+    """Drop-in for the engine's :class:`z3.Solver` with independence slicing.
+
+    With ``slicing`` False every query goes to Z3 whole. With ``compare``
+    every sliced query is solved unsliced as well, to measure the time
+    saved in :data:`STATS`. ``cache`` is shared by the solvers of one
+    analysis; None disables it. Queries not answered within the threshold
+    of ``portfolio`` are raced in it.
+    """
+
+    def __init__(self, slicing: bool = True, compare: bool = False,
+                 cache: Optional[CounterexampleCache] = None,
+                 portfolio: Optional[Portfolio] = None) -> None:
+        self.slicing = slicing
+        self.compare = compare
+        self.cache = cache
+        self.portfolio = portfolio
+        self._assertions: List = []
+        self._frames: List[int] = []
+        self._known = 0             # assertions[:_known] are satisfiable
+        self.step = None            # interpreter step (pc) of the next queries, for RECORDER
+        self._params: Dict[str, object] = {}
+        # Incremental solver following push/pop; holds the constraints of
+        # the path that were part of a slice, by frame
+        self._z3 = Solver()
+        self._loaded: Dict[int, object] = {}    # get_id() -> constraint in _z3
+        self._levels: List[List[int]] = [[]]    # ids loaded per frame
+
+    def set(self, *args, **kwargs) -> None:
+        if args:
+            self._params[args[0]] = args[1]
+        self._params.update(kwargs)
+        for k, v in self._params.items():
+            self._z3.set(k, v)
+
+    def add(self, *constraints) -> None:
+        for c in constraints:
+            if isinstance(c, (list, tuple, AstVector)):
+                self.add(*c)
+            else:
+                self._assertions.append(c)
+
+    def push(self) -> None:
+        self._frames.append(len(self._assertions))
+        self._z3.push()
+        self._levels.append([])
+
+    def pop(self) -> None:
+        del self._assertions[self._frames.pop():]
+        self._known = min(self._known, len(self._assertions))
+        self._z3.pop()
+        for key in self._levels.pop():
+            del self._loaded[key]
+
+    def assertions(self) -> List:
+        return list(self._assertions)
+
+    def assume_satisfiable(self) -> None:
+        """Declare the constraints added so far satisfiable, e.g. a resumed path."""
+        self._known = len(self._assertions)
+
+    def _load(self, constraints: List) -> Solver:
+        """Add the ``constraints`` missing from the incremental solver.
+
+        The solver may hold other constraints of the path, from earlier
+        slices. Those are in the satisfiable prefix and share no variable
+        with a slice, so they do not change its answer.
+        """
+        for c in constraints:
+            key = c.get_id()
+            if key not in self._loaded:
+                self._z3.add(c)
+                self._loaded[key] = c
+                self._levels[-1].append(key)
+        return self._z3
+
+    def _solver(self, constraints: List) -> Solver:
+        s = Solver()
+        for k, v in self._params.items():
+            s.set(k, v)
+        s.add(constraints)
+        return s
+
+    def _slice(self) -> List:
+        """Return the new constraints and the known ones that depend on them."""
+        new = self._assertions[self._known:]
+        if not self.slicing:
+            return list(self._assertions)
+        names = set()
+        for c in new:
+            names |= constraint_vars(c)
+        rest = [(c, constraint_vars(c)) for c in self._assertions[:self._known]]
+        picked = [False] * len(rest)
+        changed = True
+        while changed:
+            changed = False
+            for i, (c, vs) in enumerate(rest):
+                if not picked[i] and (not vs or vs & names):
+                    picked[i] = True
+                    if not vs <= names:
+                        names |= vs
+                        changed = True
+        return [c for (c, _), p in zip(rest, picked) if p] + new
+
+    def check(self):
+        STATS.checks += 1
+        if self._known == len(self._assertions):
+            STATS.known += 1
+            return sat
+        constraints = self._slice()
+        if self.cache is not None:
+            start = time.time()
+            result = self.cache.lookup(constraints)
+            elapsed = time.time() - start
+            STATS.cache_time += elapsed
+            if result is not None and RECORDER is not None:
+                RECORDER.record(constraints, result, "cache", elapsed, self.step)
+            if result == sat:
+                STATS.cache_sat += 1
+                self._known = len(self._assertions)
+                return result
+            if result == unsat:
+                STATS.cache_unsat += 1
+                return result
+        STATS.solved += 1
+        STATS.slice_size += len(constraints)
+        STATS.path_size += len(self._assertions)
+        start = time.time()
+        solver = self._load(constraints)
+        timeout = self._params.get("timeout", DEFAULT_TIMEOUT)
+        if self.portfolio is None:
+            result = solver.check()
+        elif self.portfolio.threshold > 0:
+            solver.set("timeout", min(self.portfolio.threshold, timeout))
+            result = solver.check()
+            solver.set("timeout", timeout)
+        else:
+            result = unknown
+        raced = False
+        if result == unknown and self.portfolio is not None:
+            result, winner = self.portfolio.solve(constraints, timeout)
+            raced = True
+            STATS.raced += 1
+            if winner is not None:
+                STATS.portfolio_wins[winner] += 1
+        elapsed = time.time() - start
+        STATS.solve_time += elapsed
+        if RECORDER is not None:
+            RECORDER.record(constraints, result, "z3", elapsed, self.step)
+        if self.compare and len(constraints) < len(self._assertions):
+            start = time.time()
+            self._solver(self._assertions).check()
+            STATS.full_time += time.time() - start
+            STATS.compared_time += elapsed
+            STATS.compared += 1
+        if result == sat:
+            self._known = len(self._assertions)
+            if self.cache is not None and not raced:
+                self.cache.add_model(solver.model())
+        elif result == unsat and self.cache is not None:
+            self.cache.add_unsat(constraints)
+        return result
+
+    def model(self):
+        """Return a model of the whole path, or None if it is not found."""
+        s = self._load(self._assertions)
+        if s.check() != sat:
+            return None
+        return s.model()
@@ -0,0 +1,246 @@
+"""Recognise proxy stubs and reuse verdicts across clones.
+
+Clone factories deploy thousands of minimal proxies (EIP-1167 and similar
+stubs) that only ``DELEGATECALL`` a fixed implementation. The checks on the
+stub itself say nothing: the code that runs is the implementation's, on the
+proxy's storage and balance. The checks assume an empty contract, so a
+proxy's verdict is the verdict of its implementation.
+
+:func:`detect_proxy` matches the known stubs and returns the implementation
+address. :class:`VerdictCache` keeps the verdicts by address and by code
+hash in SQLite, so identical bytecode is analysed once, and a proxy gets the
+verdict of its implementation as soon as that is known. Proxies seen before
+their implementation wait for it in the cache.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+CHECKS = ("suicidal", "prodigal", "greedy")
+
+# (kind, stub around a PUSHn of the implementation address)
+_STUBS = [
+    # EIP-1167, also with shorter pushes for addresses with leading zero bytes
+    ("eip1167", "363d3d373d3d3d363d", "5af43d82803e903d91(?:60[0-9a-f]{2})57fd5bf3"),
+    # EIP-7511, EIP-1167 using PUSH0
+    ("eip7511", "365f5f375f5f365f", "5af43d5f5f3e5f3d91(?:60[0-9a-f]{2})57fd5bf3"),
+    # 0age's 44 byte minimal proxy
+    ("0age", "3d3d3d3d363d3d37363d", "5af43d3d93803e(?:60[0-9a-f]{2})57fd5bf3"),
+    # Vyper's create_forwarder_to before 0.3.4
+    ("vyper", "3660006000376110006000366000", "5af4602c57600080fd5b6110006000f3"),
+]
+_PATTERNS = [
+    (kind, re.compile("^%s([67][0-9a-f])([0-9a-f]*?)%s$" % (head, tail)))
+    for kind, head, tail in _STUBS
+]
+
+
+class ProxyInfo(NamedTuple):
+    kind: str
+    implementation: str
+
+
+class CheckResult(NamedTuple):
+    """Result of :meth:`VerdictCache.check`."""
+
+    verdict: Optional[Dict]
+    resolved: List[Dict]
+    proxy: Optional[ProxyInfo]
+
+
+def _hex(bytecode: str | bytes) -> str:
+    if isinstance(bytecode, (bytes, bytearray, memoryview)):
+        return bytes(bytecode).hex()
+    code = bytecode.strip().lower()
+    return code[2:] if code.startswith("0x") else code
+
+
+def _address(address: str) -> str:
+    """Addresses are stored and compared in lower case."""
+    return address.lower()
+
+
+def detect_proxy(bytecode: str | bytes) -> Optional[ProxyInfo]:
+    """Return the kind and implementation of a proxy stub, or None."""
+    code = _hex(bytecode)
+    if len(code) > 200:
+        return None
+    for kind, pattern in _PATTERNS:
+        m = pattern.match(code)
+        if m is None:
+            continue
+        size = int(m.group(1), 16) - 0x5f
+        address = m.group(2)
+        if 1 <= size <= 20 and len(address) == 2 * size:
+            return ProxyInfo(kind, "0x" + address.rjust(40, "0"))
+    return None
+
+
+class VerdictCache:
+    """Verdicts of checked contracts, shared by proxies and identical code.
+
+    Parameters
+    ----------
+    path:
+        SQLite database for the cache; the default keeps it in memory.
+    analysis_version:
+        Verdicts of another version are ignored.
+    autocommit:
+        Commit after every :meth:`check`. When False the caller commits with
+        :meth:`commit`, e.g. together with the reports of the resolved
+        proxies, and changes not committed are lost on :meth:`close`.
+    """
+
+    def __init__(
+        self, path: str = ":memory:", analysis_version: str = "1", *, autocommit: bool = True
+    ) -> None:
+        self.version = analysis_version
+        self.autocommit = autocommit
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS verdicts (
+                address TEXT NOT NULL,
+                version TEXT NOT NULL,
+                suicidal INTEGER, prodigal INTEGER, greedy INTEGER,
+                kind TEXT, implementation TEXT,
+                PRIMARY KEY (address, version)
+            );
+            CREATE TABLE IF NOT EXISTS code_verdicts (
+                code_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                suicidal INTEGER, prodigal INTEGER, greedy INTEGER,
+                PRIMARY KEY (code_hash, version)
+            );
+            CREATE TABLE IF NOT EXISTS waiting (
+                implementation TEXT NOT NULL,
+                proxy TEXT NOT NULL,
+                kind TEXT,
+                block INTEGER,
+                PRIMARY KEY (implementation, proxy)
+            );
+            """
+        )
+        self.stats = {"checked": 0, "code_hits": 0, "delegated": 0, "waiting": 0}
+
+    def get(self, address: str) -> Optional[Dict]:
+        """Return the cached verdict of ``address``."""
+        row = self.conn.execute(
+            "SELECT suicidal, prodigal, greedy, kind, implementation FROM verdicts"
+            " WHERE address = ? AND version = ?",
+            (_address(address), self.version),
+        ).fetchone()
+        if row is None:
+            return None
+        verdict = {k: bool(v) for k, v in zip(CHECKS, row)}
+        if row[3] is not None:
+            verdict.update(proxy=row[3], implementation=row[4])
+        return verdict
+
+    def waiting(self) -> List[str]:
+        """Return the implementations that proxies are waiting for."""
+        return [r[0] for r in self.conn.execute("SELECT DISTINCT implementation FROM waiting")]
+
+    def waiting_proxies(self) -> List[str]:
+        """Return the proxies waiting for their implementation."""
+        return [r[0] for r in self.conn.execute("SELECT proxy FROM waiting")]
+
+    def _store(self, address: str, verdict: Dict) -> List[Dict]:
+        """Store ``verdict`` and return the proxies it resolves."""
+        address = _address(address)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (address, self.version) + tuple(int(verdict[k]) for k in CHECKS)
+            + (verdict.get("proxy"), verdict.get("implementation")),
+        )
+        # A proxy checked on its own code no longer waits
+        self.conn.execute("DELETE FROM waiting WHERE proxy = ?", (address,))
+        rows = self.conn.execute(
+            "SELECT proxy, kind, block FROM waiting WHERE implementation = ?", (address,)
+        ).fetchall()
+        self.conn.execute("DELETE FROM waiting WHERE implementation = ?", (address,))
+        resolved = []
+        for proxy, kind, block in rows:
+            delegated = {k: verdict[k] for k in CHECKS}
+            delegated.update(proxy=kind, implementation=address)
+            self.stats["delegated"] += 1
+            resolved.append(dict(delegated, address=proxy, block=block))
+            resolved.extend(self._store(proxy, delegated))
+        return resolved
+
+    def check(
+        self,
+        bytecode: str | bytes,
+        address: str,
+        run: Callable[[str | bytes, str], Dict],
+        block: Optional[int] = None,
+        *,
+        delegate: bool = True,
+    ) -> CheckResult:
+        """Return the verdict of ``address``, running ``run`` only if needed.
+
+        A proxy gets the verdict of its implementation, with ``proxy`` and
+        ``implementation`` added. If the implementation has no verdict yet
+        the proxy waits for it and the verdict is None. With ``delegate``
+        False a proxy is checked on its own code like any contract. The
+        result also lists the waiting proxies resolved by this verdict, with
+        their ``address`` and ``block``, and the detected proxy, if any.
+        """
+        info = detect_proxy(bytecode)
+        cached = self.get(address)
+        if cached is not None:
+            return CheckResult(cached, [], info)
+        if info is not None and delegate:
+            target = self.get(info.implementation)
+            if target is None:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO waiting VALUES (?, ?, ?, ?)",
+                    (info.implementation, _address(address), info.kind, block),
+                )
+                if self.autocommit:
+                    self.conn.commit()
+                self.stats["waiting"] += 1
+                return CheckResult(None, [], info)
+            verdict = {k: target[k] for k in CHECKS}
+            verdict.update(proxy=info.kind, implementation=info.implementation)
+            self.stats["delegated"] += 1
+        else:
+            code_hash = hashlib.sha256(_hex(bytecode).encode()).hexdigest()
+            row = self.conn.execute(
+                "SELECT suicidal, prodigal, greedy FROM code_verdicts WHERE code_hash = ? AND version = ?",
+                (code_hash, self.version),
+            ).fetchone()
+            if row is not None:
+                verdict = {k: bool(v) for k, v in zip(CHECKS, row)}
+                self.stats["code_hits"] += 1
+            else:
+                res = run(bytecode, address)
+                verdict = {k: bool(res.get(k)) for k in CHECKS}
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO code_verdicts VALUES (?, ?, ?, ?, ?)",
+                    (code_hash, self.version) + tuple(int(verdict[k]) for k in CHECKS),
+                )
+                self.stats["checked"] += 1
+        resolved = self._store(address, verdict)
+        if self.autocommit:
+            self.conn.commit()
+        return CheckResult(verdict, resolved, info)
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "VerdictCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
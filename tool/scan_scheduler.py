@@ -0,0 +1,158 @@
+"""Block range scheduling for scanners that follow the chain head.
+
+:class:`CoverageMap` records which blocks have been scanned as a sorted list
+of disjoint inclusive ranges, which stays small when scanning proceeds in
+contiguous batches and is stored as plain JSON in the scanner state.
+
+:class:`BlockScheduler` hands out batches from two frontiers:
+
+``head``
+    Blocks above ``head_floor`` (the chain head when scanning started) that
+    are not covered yet, newest first. New deployments are picked up here as
+    soon as the dataset grows, and gaps left behind by a fast moving head are
+    filled later from the top down.
+``backfill``
+    Uncovered blocks below ``head_floor``, scanned backwards towards
+    ``min_block``.
+
+When both frontiers have work, batches are split between them so that the
+head receives ``head_ratio`` of all batches.
+"""
+from __future__ import annotations
+
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+Range = Tuple[int, int]
+
+
+class CoverageMap:
+    """Set of scanned blocks stored as sorted, merged ``(start, end)`` ranges."""
+
+    def __init__(self, ranges: Optional[List[Range]] = None) -> None:
+        self._ranges: List[Range] = []
+        for start, end in ranges or []:
+            self.add(start, end)
+
+    @property
+    def ranges(self) -> List[Range]:
+        return list(self._ranges)
+
+    def add(self, start: int, end: int) -> None:
+        """Mark blocks ``start`` to ``end`` (inclusive) as scanned."""
+        if start > end:
+            return
+        i = bisect.bisect_left(self._ranges, (start, start))
+        # Merge with a preceding range that overlaps or touches
+        if i > 0 and self._ranges[i - 1][1] >= start - 1:
+            i -= 1
+            start = self._ranges[i][0]
+            end = max(end, self._ranges[i][1])
+        j = i
+        while j < len(self._ranges) and self._ranges[j][0] <= end + 1:
+            end = max(end, self._ranges[j][1])
+            j += 1
+        self._ranges[i:j] = [(start, end)]
+
+    def contains(self, block: int) -> bool:
+        i = bisect.bisect_right(self._ranges, (block, float("inf"))) - 1
+        return i >= 0 and self._ranges[i][0] <= block <= self._ranges[i][1]
+
+    def gaps(self, start: int, end: int) -> List[Range]:
+        """Return the uncovered ranges between ``start`` and ``end``."""
+        gaps = []
+        pos = start
+        for lo, hi in self._ranges:
+            if hi < pos:
+                continue
+            if lo > end:
+                break
+            if lo > pos:
+                gaps.append((pos, lo - 1))
+            pos = max(pos, hi + 1)
+        if pos <= end:
+            gaps.append((pos, end))
+        return gaps
+
+    def covered(self) -> int:
+        """Return the number of scanned blocks."""
+        return sum(hi - lo + 1 for lo, hi in self._ranges)
+
+    def to_json(self) -> List[List[int]]:
+        return [[lo, hi] for lo, hi in self._ranges]
+
+    @classmethod
+    def from_json(cls, data: List[List[int]]) -> "CoverageMap":
+        return cls([(lo, hi) for lo, hi in data])
+
+
+class BlockScheduler:
+    """Choose the next block range to scan from the head and backfill frontiers.
+
+    Parameters
+    ----------
+    coverage:
+        Blocks that have been scanned already.
+    head_floor:
+        Lowest block of the head frontier. Blocks below it are backfill.
+    batch_blocks:
+        Maximum number of blocks per batch.
+    head_ratio:
+        Share of batches given to the head frontier while both frontiers have
+        work, between 0 and 1.
+    min_block:
+        Lowest block the backfill frontier goes down to.
+    served:
+        Number of batches handed out per frontier so far, restored from the
+        saved state so the ratio holds across restarts.
+    """
+
+    def __init__(
+        self,
+        coverage: CoverageMap,
+        head_floor: int,
+        *,
+        batch_blocks: int = 1000,
+        head_ratio: float = 0.75,
+        min_block: int = 0,
+        served: Optional[Dict[str, int]] = None,
+    ) -> None:
+        if not 0.0 <= head_ratio <= 1.0:
+            raise ValueError("head_ratio must be between 0 and 1")
+        self.coverage = coverage
+        self.head_floor = head_floor
+        self.batch_blocks = batch_blocks
+        self.head_ratio = head_ratio
+        self.min_block = min_block
+        self.served = dict(served or {"head": 0, "backfill": 0})
+
+    def _newest_gap_batch(self, start: int, end: int) -> Optional[Range]:
+        gaps = self.coverage.gaps(start, end)
+        if not gaps:
+            return None
+        lo, hi = gaps[-1]
+        return (max(lo, hi - self.batch_blocks + 1), hi)
+
+    def head_work(self, latest: int) -> Optional[Range]:
+        return self._newest_gap_batch(self.head_floor, latest)
+
+    def backfill_work(self) -> Optional[Range]:
+        return self._newest_gap_batch(self.min_block, self.head_floor - 1)
+
+    def next_batch(self, latest: int) -> Optional[Tuple[str, int, int]]:
+        """Return ``(frontier, start_block, end_block)`` or ``None`` when done."""
+        head = self.head_work(latest)
+        backfill = self.backfill_work()
+        if head and backfill:
+            total = self.served["head"] + self.served["backfill"]
+            # Give the next batch to the head while it is below its share
+            use_head = self.served["head"] < self.head_ratio * (total + 1)
+            kind, rng = ("head", head) if use_head else ("backfill", backfill)
+        elif head:
+            kind, rng = "head", head
+        elif backfill:
+            kind, rng = "backfill", backfill
+        else:
+            return None
+        self.served[kind] += 1
+        return (kind, rng[0], rng[1])
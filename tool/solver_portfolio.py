@@ -0,0 +1,112 @@
+"""Solver configurations and racing them on hard queries.
+
+Some path conditions with ``UDiv``, ``URem`` or ``EXP`` run into
+``SOLVER_TIMEOUT`` under the default Z3 configuration but are answered at
+once by bit-blasting or another tactic, and the other way round. A
+:class:`Portfolio` solves such a query with several configurations in
+worker processes and takes the first sat or unsat answer.
+
+A configuration is ``default`` (a plain :class:`z3.Solver`) or ``+``
+separated Z3 tactics run in sequence, e.g. ``qfbv`` or
+``simplify+bit-blast+sat``, optionally followed by ``@`` and a timeout in
+milliseconds.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import queue
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from z3 import Solver, Tactic, Then, parse_smt2_string, sat, unknown, unsat
+
+DEFAULT_TIMEOUT = 10000
+DEFAULT_PORTFOLIO = ("default", "qfbv", "simplify+solve-eqs+bit-blast+sat", "smt")
+
+
+def parse_config(spec: str, timeout: int = DEFAULT_TIMEOUT) -> Tuple[str, int]:
+    """Return ``(tactics or "default", timeout)`` of a configuration spec."""
+    name, _, ms = spec.partition("@")
+    return name or "default", int(ms) if ms else timeout
+
+
+def make_solver(name: str, timeout: int) -> Solver:
+    """Return a solver for the configuration ``name``."""
+    if name == "default":
+        s = Solver()
+    else:
+        tactics = name.split("+")
+        s = (Then(*tactics) if len(tactics) > 1 else Tactic(name)).solver()
+    s.set("timeout", timeout)
+    return s
+
+
+def _race(spec: str, text: str, timeout: int, results, index: int) -> None:
+    """Worker: solve the SMT-LIB2 ``text`` and put ``(index, result)``."""
+    try:
+        s = make_solver(*parse_config(spec, timeout))
+        s.add(parse_smt2_string(text))
+        results.put((index, str(s.check())))
+    except Exception:
+        results.put((index, "unknown"))
+
+
+class Portfolio:
+    """Race solver configurations in worker processes.
+
+    Parameters
+    ----------
+    configs:
+        The configurations to race.
+    threshold:
+        Milliseconds a query may take with the engine's own solver before
+        it is raced; with 0 every query is raced.
+    """
+
+    def __init__(self, configs: Sequence[str] = DEFAULT_PORTFOLIO, threshold: int = 1000) -> None:
+        self.configs = list(configs)
+        self.threshold = threshold
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+    def solve(self, constraints: List, timeout: int) -> Tuple[object, Optional[str]]:
+        """Return the first definitive answer and the configuration that gave it.
+
+        The answer is ``unknown`` and the configuration None when no
+        configuration decides the query within ``timeout`` milliseconds.
+        """
+        s = Solver()
+        s.add(constraints)
+        text = s.to_smt2()
+        results = self._context.Queue()
+        workers = [
+            self._context.Process(target=_race, args=(spec, text, timeout, results, i), daemon=True)
+            for i, spec in enumerate(self.configs)
+        ]
+        for w in workers:
+            w.start()
+        deadline = time.time() + timeout / 1000.0 + 1
+        answer, winner = unknown, None
+        try:
+            for _ in workers:
+                try:
+                    index, result = results.get(timeout=max(deadline - time.time(), 0.01))
+                except queue.Empty:
+                    break
+                if result in ("sat", "unsat"):
+                    answer = sat if result == "sat" else unsat
+                    winner = self.configs[index]
+                    break
+        finally:
+            for w in workers:
+                if w.is_alive():
+                    w.terminate()
+            for w in workers:
+                w.join()
+            results.close()
+        return answer, winner
+
+
+def wins_by_config(wins: Dict[str, int]) -> str:
+    """Format ``{config: wins}`` as ``config xN, ...``, most wins first."""
+    return ", ".join("%s x%d" % (c, n) for c, n in sorted(wins.items(), key=lambda kv: -kv[1]))
@@ -0,0 +1,205 @@
+"""Record the engine's solver queries and replay them offline.
+
+With a :class:`QueryRecorder` installed as ``path_solver.RECORDER``, every
+query a :class:`path_solver.PathSolver` answers with Z3 or from its cache is
+written as SMT-LIB2, together with the contract, check, search depth, step
+(the program counter of the instruction that issued the query: a ``JUMPI``
+or the searched instruction), ``query_index`` (the number of the query
+within the check) and outcome. The archive is a
+gzip compressed file with one JSON record per line; a directory of them is
+read as one corpus.
+
+:func:`replay` solves the corpus again under other solver configurations,
+in worker processes, and reports the time and the answers that disagree with
+the recorded ones. The configurations are those of solver_portfolio.py:
+``default`` (the engine's solver) or ``+`` separated Z3 tactics run in
+sequence, e.g. ``simplify+bit-blast+sat`` or ``qfbv``, optionally with
+``@`` and a timeout in milliseconds::
+
+    python tool/solver_replay.py reports/queries.jsonl.gz -c default@10000 -c qfbv@2000
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from z3 import Solver, parse_smt2_string
+
+from solver_portfolio import DEFAULT_TIMEOUT, make_solver, parse_config
+from values import MyGlobals
+
+CHUNK = 200
+
+
+class QueryRecorder:
+    """Append solver queries to a gzip compressed JSON lines archive.
+
+    The records are buffered and appended as a new gzip member when a check
+    begins, when the buffer is full and on :meth:`close`, so a run that
+    stops early leaves a readable archive.
+    """
+
+    def __init__(self, path: str, buffer: int = 1000) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.buffer = buffer
+        self._lines: List[str] = []
+        self.contract = ""
+        self.check = ""
+        self.query_index = 0
+        self.count = 0
+
+    def begin(self, contract: str, check: str) -> None:
+        """Attribute the following queries to ``check`` of ``contract``."""
+        self.flush()
+        self.contract = contract
+        self.check = check
+        self.query_index = 0
+
+    def record(self, constraints: List, result, source: str, seconds: float,
+               step: Optional[int] = None) -> None:
+        s = Solver()
+        s.add(constraints)
+        self._lines.append(json.dumps({
+            "contract": self.contract,
+            "check": self.check,
+            "depth": MyGlobals.MAX_CALL_DEPTH,
+            "step": step,
+            "query_index": self.query_index,
+            "source": source,
+            "result": str(result),
+            "time": round(seconds, 6),
+            "smt2": s.to_smt2(),
+        }) + "\n")
+        self.query_index += 1
+        self.count += 1
+        if len(self._lines) >= self.buffer:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._lines:
+            with gzip.open(self.path, "at", encoding="utf-8") as fh:
+                fh.writelines(self._lines)
+            self._lines = []
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "QueryRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_queries(path: str) -> Iterator[Dict]:
+    """Yield the records of an archive, or of all archives in a directory."""
+    p = Path(path)
+    files = sorted(p.glob("*.jsonl.gz")) if p.is_dir() else [p]
+    for f in files:
+        with gzip.open(f, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _solve_chunk(spec: str, queries: List[str]) -> List[Tuple[str, float]]:
+    """Solve the SMT-LIB2 ``queries`` under ``spec``; return (result, seconds)."""
+    name, timeout = parse_config(spec)
+    out = []
+    for text in queries:
+        s = make_solver(name, timeout)
+        s.add(parse_smt2_string(text))
+        start = time.time()
+        result = s.check()
+        out.append((str(result), time.time() - start))
+    return out
+
+
+def replay(
+    records: Sequence[Dict],
+    configs: Sequence[str],
+    *,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Dict]:
+    """Solve ``records`` under each configuration and compare the answers.
+
+    Returns ``{config: stats}`` with the total solving time, the number of
+    ``sat``/``unsat``/``unknown`` answers, and ``disagreements``: the
+    records where the configuration answered sat and the recording unsat or
+    the other way round (``unknown`` on either side is not a disagreement
+    but counted in ``lost`` and ``gained``).
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    texts = [r["smt2"] for r in records]
+    chunks = [texts[i:i + CHUNK] for i in range(0, len(texts), CHUNK)]
+    try:
+        futures = {spec: [executor.submit(_solve_chunk, spec, c) for c in chunks] for spec in configs}
+        report = {}
+        for spec, fs in futures.items():
+            answers = [a for f in fs for a in f.result()]
+            stats = {"time": 0.0, "sat": 0, "unsat": 0, "unknown": 0, "lost": 0, "gained": 0,
+                     "disagreements": []}
+            for r, (result, seconds) in zip(records, answers):
+                stats["time"] += seconds
+                stats[result] += 1
+                recorded = r["result"]
+                if {result, recorded} == {"sat", "unsat"}:
+                    stats["disagreements"].append(
+                        {k: r[k] for k in ("contract", "check", "depth", "step", "query_index")}
+                        | {"recorded": recorded, "replayed": result}
+                    )
+                elif result == "unknown" and recorded != "unknown":
+                    stats["lost"] += 1
+                elif recorded == "unknown" and result != "unknown":
+                    stats["gained"] += 1
+            report[spec] = stats
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay recorded solver queries under other solver configurations"
+    )
+    parser.add_argument("archive", help="archive written with --record_queries, or a directory of them")
+    parser.add_argument(
+        "-c", "--config", action="append",
+        help="solver configuration: 'default' or '+' separated Z3 tactics, "
+             "optionally '@timeout_ms' (default: default@%d); repeat to compare" % DEFAULT_TIMEOUT,
+    )
+    parser.add_argument("--source", choices=["z3", "cache", "all"], default="z3",
+                        help="replay the queries answered by Z3, by the cache, or all (default: z3)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    records = [r for r in read_queries(args.archive) if args.source in ("all", r["source"])]
+    recorded_time = sum(r["time"] for r in records)
+    print("%d queries from %d contracts, %.2fs when recorded"
+          % (len(records), len({r["contract"] for r in records}), recorded_time))
+    report = replay(records, args.config or ["default"], workers=args.workers)
+    for spec, stats in report.items():
+        print("%-30s %8.2fs  %d sat, %d unsat, %d unknown, %d lost, %d gained, %d disagreements"
+              % (spec, stats["time"], stats["sat"], stats["unsat"], stats["unknown"],
+                 stats["lost"], stats["gained"], len(stats["disagreements"])))
+        for d in stats["disagreements"][:10]:
+            print("    %(contract)s %(check)s depth %(depth)s step %(step)s query %(query_index)s: "
+                  "recorded %(recorded)s, replayed %(replayed)s" % d)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Measure the memory held by interpreter states and stored configurations.
+
+The checks of :func:`fetch_and_check.run_checks` are run on one contract while
+every configuration recorded by :func:`values.seen_configuration` is kept.
+The retained configurations are then rebuilt in the previous representation
+(a fresh ``{'type', 'step', 'z3'}`` dict with deep-copied z3 terms per entry)
+and both versions are measured with :mod:`tracemalloc`, the stack and storage
+values apart from the memory.
+
+The contract is read from a file with its hex bytecode or from a JSON lines
+file of contracts; by default the largest contract of
+``contracts/contracts.jsonl`` is measured.
+
+Only allocations made by Python are counted; z3 keeps its ASTs in native
+memory, which the shared :class:`values.SymWord` terms also stop duplicating.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import copy
+import io
+import time
+import json
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import values
+from fetch_and_check import run_checks
+from values import MyGlobals, SymWord, copy_storage
+
+DEFAULT_CONTRACTS = Path(__file__).resolve().parents[1] / "contracts" / "contracts.jsonl"
+
+
+def _as_dict(word: SymWord) -> Dict:
+    d = {"type": word.kind, "step": word.step}
+    if word.term is not None:
+        d["z3"] = copy.deepcopy(word.term)
+    return d
+
+
+def _legacy_values(nc: Dict) -> Dict:
+    """Rebuild the stack and storage of ``nc`` the way they were stored with dict values."""
+    return {
+        "stack": [_as_dict(w) for w in nc["stack"]],
+        "storage": {k: [_as_dict(w) for w in v] for k, v in nc["storage"].items()},
+    }
+
+
+def _legacy_memory(nc: Dict) -> List:
+    return [(addr, _as_dict(w)) for addr, w in nc["mmemory"].words()]
+
+
+def load_contract(path: str | Path, address: Optional[str] = None) -> Tuple[str, str]:
+    """Return ``(address, hex bytecode)`` of the contract in ``path``.
+
+    ``path`` holds the hex bytecode, or one JSON object with ``address`` and
+    ``bytecode`` per line; then ``address`` selects the contract, by default
+    the one with the largest bytecode.
+    """
+    text = Path(path).read_text().strip()
+    if not text.startswith("{"):
+        code = text[2:] if text.startswith("0x") else text
+        return address or "0x" + "11" * 20, code
+    rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if address is not None:
+        rows = [r for r in rows if r["address"].lower() == address.lower()]
+        if not rows:
+            raise ValueError(f"{address} is not in {path}")
+    row = max(rows, key=lambda r: len(r["bytecode"]))
+    code = row["bytecode"]
+    return row["address"], code[2:] if code.startswith("0x") else code
+
+
+def _allocated(build) -> tuple:
+    """Return ``(result, bytes still allocated by build())``."""
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    return result, tracemalloc.get_traced_memory()[0] - before
+
+
+def measure_states(bytecode: str, address: str = "0x" + "11" * 20) -> Dict[str, float]:
+    """Run the checks on ``bytecode`` and return memory statistics."""
+    recorded: List[Dict] = []
+    original = values.add_configuration
+
+    def _record(step, configurations, nc):
+        recorded.append(nc)
+        original(step, configurations, nc)
+
+    values.add_configuration = _record
+    tracemalloc.start()
+    try:
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_checks(bytecode, address)
+        elapsed = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+
+        shared, shared_bytes = _allocated(
+            lambda: [{"stack": list(c["stack"]), "storage": copy_storage(c["storage"])} for c in recorded]
+        )
+        legacy, legacy_bytes = _allocated(lambda: [_legacy_values(c) for c in recorded])
+        memory, memory_bytes = _allocated(lambda: [copy.deepcopy(c["mmemory"]) for c in recorded])
+        legacy_memory, legacy_memory_bytes = _allocated(lambda: [_legacy_memory(c) for c in recorded])
+    finally:
+        tracemalloc.stop()
+        values.add_configuration = original
+
+    entries = sum(len(c["stack"]) + sum(len(v) for v in c["storage"].values()) for c in recorded)
+    return {
+        "configurations": len(recorded),
+        "entries": entries,
+        "seconds": elapsed,
+        "peak_bytes": peak,
+        "shared_bytes": shared_bytes,
+        "legacy_bytes": legacy_bytes,
+        "memory_bytes": memory_bytes,
+        "legacy_memory_bytes": legacy_memory_bytes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure memory used by stored interpreter configurations"
+    )
+    parser.add_argument(
+        "contract",
+        nargs="?",
+        default=str(DEFAULT_CONTRACTS),
+        help="file with the hex bytecode of the contract, or a JSON lines file of "
+             "contracts (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--address", default=None,
+        help="contract to measure from a JSON lines file (default: the largest one)",
+    )
+    parser.add_argument(
+        "--max_inv", type=int, default=None,
+        help="maximal number of function invocations (default: %d)"
+             % MyGlobals.max_calldepth_in_normal_search,
+    )
+    args = parser.parse_args()
+
+    if args.max_inv:
+        MyGlobals.max_calldepth_in_normal_search = args.max_inv
+    address, code = load_contract(args.contract, args.address)
+    stats = measure_states(code, address)
+    print(f"{address}: {len(code) // 2} bytes")
+    print(
+        f"{stats['configurations']} configurations, {stats['entries']} stack/storage entries, "
+        f"analysis {stats['seconds']:.2f}s, peak {stats['peak_bytes'] / 1e6:.2f} MB"
+    )
+    saved = stats["legacy_bytes"] - stats["shared_bytes"]
+    print(
+        f"stack and storage as SymWord: {stats['shared_bytes'] / 1e3:.1f} KB, "
+        f"as dicts: {stats['legacy_bytes'] / 1e3:.1f} KB (saved {saved / 1e3:.1f} KB)"
+    )
+    print(
+        f"memory as Memory: {stats['memory_bytes'] / 1e3:.1f} KB, "
+        f"as dicts: {stats['legacy_memory_bytes'] / 1e3:.1f} KB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Storage read/write dependencies between the public functions of a contract.
+
+A transaction only matters to the ones after it through the storage slots it
+writes. If no later transaction in a sequence reads a slot that a call
+wrote, the call can be dropped and the rest of the sequence behaves the same;
+the shorter sequence is searched at a lower depth anyway. The multi-transaction
+search therefore only needs orderings where every call but the last writes
+something that a later call reads.
+
+:func:`function_slots` finds the functions from the Solidity dispatcher and
+runs a small abstract interpretation of each one to collect the slots its
+``SLOAD`` and ``SSTORE`` instructions may access:
+
+``int``
+    a constant slot (plain state variables),
+``("map", base)``
+    any slot derived from ``SHA3`` whose last hashed word is ``base``
+    (mappings and dynamic arrays declared at slot ``base``, plus offsets
+    added to them, also when the compiler folded ``keccak(base)`` into a
+    constant); ``base`` is None when it is not a constant,
+``TOP``
+    any slot.
+
+The sets over-approximate: a function that cannot be analysed reads and
+writes ``TOP``. :class:`SequencePruner` uses them to tell the search which
+selectors need not be tried after a given sequence of calls; the search finds
+the function a path called with :func:`matched_selector`.
+"""
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from z3 import BitVec, BitVecVal, Concat, Extract, Z3_OP_ITE, is_app_of, is_bv_value, is_distinct, is_eq, is_not
+
+from instruction_list import allops
+from sha3 import keccak_int
+
+TOP = "*"
+ANY = frozenset([TOP])
+MAX_STATES = 5000
+WIDEN_AFTER = 8
+
+Slots = FrozenSet[object]
+
+# Compilers fold keccak(slot) of dynamic arrays at small slots into constants
+ARRAY_DATA = {keccak_int(base.to_bytes(32, "big")): base for base in range(256)}
+
+
+def _dispatch(ops: List[Dict]) -> List[Tuple[int, int, int]]:
+    """Return ``(selector, entry, jumpi)`` for the dispatcher's comparisons.
+
+    The dispatcher compares the selector with ``PUSH4 sel`` and ``EQ`` and
+    jumps to the function with ``PUSHn dest; JUMPI`` right after it.
+    """
+    positions = {op["id"]: i for i, op in enumerate(ops) if op["o"] == "JUMPDEST"}
+    found = []
+    for i, op in enumerate(ops):
+        if op["o"] != "PUSH4" or not op["input"]:
+            continue
+        window = [o["o"] for o in ops[i + 1:i + 5]]
+        for eq in (0, 1):
+            if window[eq:eq + 1] == ["EQ"] and window[eq + 1:eq + 2] and window[eq + 1].startswith("PUSH") \
+                    and window[eq + 2:eq + 3] == ["JUMPI"]:
+                dest = int(ops[i + eq + 2]["input"] or "0", 16)
+                if dest in positions:
+                    found.append((int(op["input"], 16), positions[dest], i + eq + 3))
+                break
+    return found
+
+
+def function_entries(ops: List[Dict]) -> Dict[int, int]:
+    """Return ``{selector: index in ops}`` of the dispatcher's functions."""
+    return {selector: entry for selector, entry, _ in _dispatch(ops)}
+
+
+def _slot(value) -> object:
+    if value in ARRAY_DATA:
+        return ("map", ARRAY_DATA[value])
+    if isinstance(value, int) or (isinstance(value, tuple) and value[0] == "map"):
+        return value
+    return TOP
+
+
+def _add(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return (a + b) % 2 ** 256
+    for x in (a, b):
+        if isinstance(x, tuple) and x[0] == "map":
+            return x
+        if x in ARRAY_DATA:
+            return ("map", ARRAY_DATA[x])
+    return TOP
+
+
+def _binary(o: str, a, b):
+    if o == "ADD":
+        return _add(a, b)
+    if not (isinstance(a, int) and isinstance(b, int)):
+        return TOP
+    if o == "SUB":
+        return (a - b) % 2 ** 256
+    if o == "MUL":
+        return (a * b) % 2 ** 256
+    if o == "AND":
+        return a & b
+    if o == "OR":
+        return a | b
+    if o == "EXP" and b < 256:
+        return pow(a, b, 2 ** 256)
+    if o == "DIV":
+        return a // b if b else 0
+    return TOP
+
+
+def _store(memory: tuple, offset, value, size: int = 32) -> tuple:
+    if not isinstance(offset, int):
+        return ()
+    kept = tuple((o, v) for o, v in memory if o + 32 <= offset or o >= offset + size)
+    if size == 32:
+        kept += ((offset, value),)
+    return tuple(sorted(kept))
+
+
+def _sha3(memory: tuple, offset, length):
+    if isinstance(offset, int) and isinstance(length, int) and length >= 32:
+        last = dict(memory).get(offset + length - 32, TOP)
+        if isinstance(last, int):
+            return ("map", last)
+        if isinstance(last, tuple):
+            return last
+    return ("map", None)
+
+
+class _Failed(Exception):
+    pass
+
+
+def access_sets(ops: List[Dict], entry: int, skip: FrozenSet[int] = frozenset()) -> Tuple[Slots, Slots]:
+    """Return the ``(reads, writes)`` slots of the code starting at ``entry``.
+
+    The ``JUMPI`` instructions at the indices in ``skip`` never jump.
+    """
+    positions = {op["id"]: i for i, op in enumerate(ops) if op["o"] == "JUMPDEST"}
+    reads, writes = set(), set()
+    seen = set()
+    visits: Dict[int, int] = {}
+    todo = [(entry, (), ())]
+    try:
+        while todo:
+            pos, stack, memory = todo.pop()
+            if pos >= len(ops) or (pos, stack, memory) in seen:
+                continue
+            if len(seen) > MAX_STATES:
+                raise _Failed
+            if ops[pos]["o"] == "JUMPDEST":
+                visits[pos] = visits.get(pos, 0) + 1
+                if visits[pos] > WIDEN_AFTER:
+                    # Loop counters: keep only the values that may be jump targets
+                    stack = tuple(v if not isinstance(v, int) or v in positions else TOP for v in stack)
+                    memory = tuple((o, v if not isinstance(v, int) or v in positions else TOP) for o, v in memory)
+                    if (pos, stack, memory) in seen:
+                        continue
+            seen.add((pos, stack, memory))
+            for state in _step(ops, pos, list(stack), memory, positions, reads, writes):
+                if pos not in skip or state[0] == pos + 1:
+                    todo.append(state)
+    except _Failed:
+        return ANY, ANY
+    return frozenset(reads), frozenset(writes)
+
+
+def _step(ops, pos, stack, memory, positions, reads, writes):
+    """Execute ``ops[pos]`` abstractly and return the successor states."""
+    o = ops[pos]["o"]
+
+    def pop():
+        return stack.pop() if stack else TOP
+
+    if o in ("STOP", "RETURN", "REVERT", "INVALID", "SUICIDE") or o not in allops:
+        return []
+    if o.startswith("PUSH"):
+        stack.append(int(ops[pos]["input"] or "0", 16))
+    elif o.startswith("DUP"):
+        n = int(o[3:])
+        stack.append(stack[-n] if len(stack) >= n else TOP)
+    elif o.startswith("SWAP"):
+        n = int(o[4:])
+        while len(stack) <= n:
+            stack.insert(0, TOP)
+        stack[-1], stack[-n - 1] = stack[-n - 1], stack[-1]
+    elif o in ("ADD", "SUB", "MUL", "AND", "OR", "EXP", "DIV"):
+        a = pop()
+        b = pop()
+        stack.append(_binary(o, a, b))
+    elif o == "MLOAD":
+        offset = pop()
+        stack.append(dict(memory).get(offset, TOP) if isinstance(offset, int) else TOP)
+    elif o == "MSTORE":
+        offset = pop()
+        memory = _store(memory, offset, pop())
+    elif o == "MSTORE8":
+        offset = pop()
+        pop()
+        memory = _store(memory, offset, TOP, 1)
+    elif o == "SHA3":
+        offset = pop()
+        stack.append(_sha3(memory, offset, pop()))
+    elif o == "SLOAD":
+        reads.add(_slot(pop()))
+        stack.append(TOP)
+    elif o == "SSTORE":
+        writes.add(_slot(pop()))
+        pop()
+    elif o in ("DELEGATECALL", "CALLCODE"):
+        # The called code runs on this contract's storage
+        writes.add(TOP)
+        reads.add(TOP)
+        for _ in range(allops[o][1]):
+            pop()
+        stack.append(TOP)
+        memory = ()
+    elif o in ("JUMP", "JUMPI"):
+        dest = pop()
+        succ = []
+        if o == "JUMPI":
+            pop()
+            succ.append((pos + 1, tuple(stack), memory))
+        if not isinstance(dest, int):
+            raise _Failed
+        if dest in positions:
+            succ.append((positions[dest], tuple(stack), memory))
+        return succ
+    else:
+        _, npop, npush = allops[o]
+        for _ in range(npop):
+            pop()
+        stack.extend([TOP] * npush)
+        if o in ("CALLDATACOPY", "CODECOPY", "EXTCODECOPY", "MCOPY", "CALL", "CREATE", "SLOADBYTES"):
+            memory = ()
+    return [(pos + 1, tuple(stack), memory)]
+
+
+def function_slots(ops: List[Dict]) -> Dict[Optional[int], Tuple[Slots, Slots]]:
+    """Return ``{selector: (reads, writes)}`` for the dispatcher's functions.
+
+    The key None is the fallback function: the code reached from the start
+    without entering any of the functions. Empty without a dispatcher.
+    """
+    found = _dispatch(ops)
+    if not found:
+        return {}
+    slots = {selector: access_sets(ops, entry) for selector, entry, _ in found}
+    slots[None] = access_sets(ops, 0, frozenset(jumpi for _, _, jumpi in found))
+    return slots
+
+
+def overlaps(writes: Iterable, reads: Iterable) -> bool:
+    """Return True when a slot in ``writes`` may be one in ``reads``."""
+    writes, reads = set(writes), set(reads)
+    if not writes or not reads:
+        return False
+    if TOP in writes or TOP in reads or writes & reads:
+        return True
+    maps_w = {s[1] for s in writes if isinstance(s, tuple)}
+    maps_r = {s[1] for s in reads if isinstance(s, tuple)}
+    if maps_w and maps_r and (None in maps_w or None in maps_r or maps_w & maps_r):
+        return True
+    return False
+
+
+def selector_term(calldepth: int):
+    """Return the 4-byte function selector of transaction ``calldepth``."""
+    return Extract(255, 224, BitVec("input%d[0]" % calldepth, 256))
+
+
+def matched_selector(guard: list, calldepth: int) -> Optional[int]:
+    """Find the dispatcher test ``If(sel == C, 1, 0) != 0`` in ``guard``."""
+    padded = Concat(BitVecVal(0, 224), selector_term(calldepth))
+    for atom in guard:
+        if is_not(atom) and is_eq(atom.arg(0)):
+            test = atom.arg(0)
+        elif is_distinct(atom) and atom.num_args() == 2:
+            test = atom
+        else:
+            continue
+        for ite, zero in ((test.arg(0), test.arg(1)), (test.arg(1), test.arg(0))):
+            if not (is_app_of(ite, Z3_OP_ITE) and is_bv_value(zero) and zero.as_long() == 0):
+                continue
+            cond = ite.arg(0)
+            if not is_eq(cond):
+                continue
+            for const, other in ((cond.arg(0), cond.arg(1)), (cond.arg(1), cond.arg(0))):
+                if is_bv_value(const) and other.eq(padded) and const.as_long() < 2 ** 32:
+                    return const.as_long()
+    return None
+
+
+class SequencePruner:
+    """Select the functions worth calling after a sequence of transactions.
+
+    A sequence is described by its ``pending`` calls: the selectors of the
+    calls whose writes no later call has read yet. None stands for a call
+    whose selector is not known, which may have written anything.
+    """
+
+    def __init__(self, slots: Dict[Optional[int], Tuple[Slots, Slots]]) -> None:
+        self.slots = slots
+        self.readers = [reads for reads, _ in slots.values()]
+
+    def _writes(self, selector: Optional[int]) -> Slots:
+        return self.slots[selector][1] if selector is not None else ANY
+
+    def _reads(self, selector: Optional[int]) -> Slots:
+        return self.slots[selector][0] if selector is not None else ANY
+
+    def after(self, pending: Sequence[Optional[int]], selector: Optional[int]) -> tuple:
+        """Return the pending calls once ``selector`` has been called."""
+        reads = self._reads(selector)
+        return tuple(p for p in pending if not overlaps(self._writes(p), reads)) + (selector,)
+
+    def _can_follow(self, left: tuple, remaining: int) -> bool:
+        """Can ``remaining`` more calls read something of every call in ``left``?"""
+        if remaining == 0:
+            return False
+        writes = [self._writes(p) for p in left]
+        if remaining == 1:
+            return any(all(overlaps(w, reads) for w in writes) for reads in self.readers)
+        return all(any(overlaps(w, reads) for reads in self.readers) for w in writes)
+
+    def excluded(self, pending: Sequence[Optional[int]], remaining: int) -> List[int]:
+        """Return the selectors not worth calling next.
+
+        ``remaining`` is the number of calls that may still follow the next
+        one. A selector is kept if the sequence can end with it, because it
+        reads something of every pending call, or if later calls can still
+        read something of every pending call including itself.
+        """
+        out = []
+        for selector in self.slots:
+            if selector is None:
+                continue
+            left = self.after(pending, selector)
+            if len(left) > 1 and not self._can_follow(left, remaining):
+                out.append(selector)
+        return out
@@ -0,0 +1,172 @@
+"""Contract storage access for ``read_from_blockchain`` mode.
+
+The ``SLOAD`` handler asks :attr:`values.MyGlobals.storage_provider` for slots
+it has not seen on the current path. :class:`RPCStorageProvider` answers from a
+per-contract slot cache and fills the cache with JSON-RPC batch requests, so
+the interpreter loop does not wait for one HTTP round-trip per slot. Slots that
+can be predicted statically (a ``PUSH`` directly followed by ``SLOAD``) are
+fetched up front, optionally in a background thread.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import urllib.request
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def predict_storage_slots(ops: List[Dict]) -> Set[int]:
+    """Return the constant storage slots read by ``ops``.
+
+    ``ops`` is the output of :func:`parse_code.parse_code`. Only the
+    ``PUSHn x; SLOAD`` pattern is recognised, which covers the plain state
+    variables of Solidity contracts.
+    """
+    slots = set()
+    for prev, op in zip(ops, ops[1:]):
+        if op["o"] == "SLOAD" and prev["o"].startswith("PUSH") and prev["input"]:
+            slots.add(int(prev["input"], 16))
+    return slots
+
+
+class StorageProvider:
+    """Abstract source of contract storage and balances."""
+
+    def get_storage(self, address: str, slot: int) -> int:
+        raise NotImplementedError
+
+    def get_balance(self, address: str) -> int:
+        raise NotImplementedError
+
+    def prefetch(self, address: str, slots: Iterable[int]) -> None:
+        """Load ``slots`` of ``address`` ahead of time. Optional."""
+
+
+class RPCStorageProvider(StorageProvider):
+    """Read storage over JSON-RPC with batching and a per-contract cache.
+
+    Parameters
+    ----------
+    url:
+        HTTP endpoint of an Ethereum node.
+    block:
+        Block tag or number the state is read at.
+    batch_size:
+        Maximum number of calls sent in one JSON-RPC batch request.
+    timeout:
+        Socket timeout for each HTTP request in seconds.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        block: str = "latest",
+        batch_size: int = 100,
+        timeout: float = 10.0,
+    ) -> None:
+        self.url = url
+        self.block = block
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._cache: Dict[str, Dict[int, int]] = {}
+        self._lock = threading.Lock()
+        self._prefetches: Dict[str, threading.Thread] = {}
+        self.requests = 0
+
+    def _post(self, payload: List[Dict]) -> List[Dict]:
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            self.requests += 1
+            answer = json.loads(resp.read())
+        # Single calls may be answered with a single object
+        return answer if isinstance(answer, list) else [answer]
+
+    def _call_batch(self, calls: List[tuple]) -> List[object]:
+        """Run ``(method, params)`` calls in batches and return the results."""
+        results: List[object] = []
+        for i in range(0, len(calls), self.batch_size):
+            chunk = calls[i : i + self.batch_size]
+            payload = [
+                {"jsonrpc": "2.0", "id": n, "method": m, "params": p}
+                for n, (m, p) in enumerate(chunk)
+            ]
+            by_id = {r.get("id"): r for r in self._post(payload)}
+            for n in range(len(chunk)):
+                resp = by_id.get(n)
+                if resp is None or "error" in resp:
+                    err = resp.get("error") if resp else "missing response"
+                    raise RuntimeError(f"JSON-RPC call {chunk[n][0]} failed: {err}")
+                results.append(resp["result"])
+        return results
+
+    def fetch(self, address: str, slots: Iterable[int]) -> Dict[int, int]:
+        """Fetch ``slots`` that are not cached yet and return all requested values."""
+        key = address.lower()
+        slots = list(dict.fromkeys(slots))
+        with self._lock:
+            cached = self._cache.setdefault(key, {})
+            missing = [s for s in slots if s not in cached]
+        if missing:
+            values = self._call_batch(
+                [("eth_getStorageAt", [address, hex(s), self.block]) for s in missing]
+            )
+            with self._lock:
+                for s, v in zip(missing, values):
+                    cached[s] = int(v, 16)
+        with self._lock:
+            return {s: cached[s] for s in slots}
+
+    def prefetch(self, address: str, slots: Iterable[int]) -> None:
+        self.fetch(address, slots)
+
+    def prefetch_async(self, address: str, slots: Iterable[int]) -> threading.Thread:
+        """Start prefetching ``slots`` in a background thread."""
+        slots = list(slots)
+
+        def _run() -> None:
+            try:
+                self.fetch(address, slots)
+            except Exception as e:
+                # The interpreter falls back to fetching slots on demand
+                logger.warning("prefetching storage of %s failed: %s", address, e)
+
+        thread = threading.Thread(target=_run, daemon=True)
+        with self._lock:
+            self._prefetches[address.lower()] = thread
+        thread.start()
+        return thread
+
+    def get_storage(self, address: str, slot: int) -> int:
+        key = address.lower()
+        with self._lock:
+            value = self._cache.get(key, {}).get(slot)
+            pending = self._prefetches.get(key)
+        if value is not None:
+            return value
+        # The slot may be in the batch that is currently on its way
+        if pending is not None and pending.is_alive():
+            pending.join(self.timeout)
+            with self._lock:
+                value = self._cache.get(key, {}).get(slot)
+            if value is not None:
+                return value
+        return self.fetch(address, [slot])[slot]
+
+    def get_balance(self, address: str) -> int:
+        return int(self._call_batch([("eth_getBalance", [address, self.block])])[0], 16)
+
+    def clear(self, address: Optional[str] = None) -> None:
+        """Drop the cached slots of ``address`` or of all contracts."""
+        with self._lock:
+            if address is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(address.lower(), None)
@@ -1,6 +1,7 @@
-from web3 import Web3
 import copy
 from z3 import *
+from path_solver import CounterexampleCache, PathSolver
+from solver_portfolio import Portfolio
 
 
 
@@ -31,7 +32,9 @@ def initialize_params(read_from_blockchain, c_address):
     MyGlobals.st = {}
     MyGlobals.st['my_address'] = MyGlobals.adversary_account
     MyGlobals.st['contract_address'] = c_address
-    if read_from_blockchain:
+    if read_from_blockchain and MyGlobals.storage_provider is not None:
+        MyGlobals.st['contract_balance'] = str(MyGlobals.storage_provider.get_balance(c_address)+1).zfill(64)
+    elif read_from_blockchain:
         MyGlobals.st['contract_balance'] = str(MyGlobals.web3.eth.getBalance(c_address)+1).zfill(64)
     else:
         MyGlobals.st['contract_balance'] = '7' * 64
@@ -56,12 +59,98 @@ def vprint(*args, **kwargs):
 
 
 
+class SymWord(object):
+    """Immutable 256-bit value on the stack, in memory or in storage.
+
+    ``kind`` is ``'constant'`` (``term`` is a z3 bitvector, concrete or
+    symbolic) or ``'undefined'``; ``step`` is the id of the instruction that
+    produced the value. Instances are never modified, so stacks, memory and
+    storage share them instead of deep-copying, and the z3 terms are not
+    duplicated on every branch. Reading with the old dict keys ``'type'``,
+    ``'step'`` and ``'z3'`` is still supported.
+    """
+
+    __slots__ = ('kind', 'step', 'term')
+
+    _keys = {'type': 'kind', 'step': 'step', 'z3': 'term'}
+
+    def __init__(self, kind, step, term=None):
+        object.__setattr__(self, 'kind', kind)
+        object.__setattr__(self, 'step', step)
+        object.__setattr__(self, 'term', term)
+
+    @classmethod
+    def constant(cls, step, term):
+        return cls('constant', step, term)
+
+    @classmethod
+    def undefined(cls, step):
+        return cls('undefined', step)
+
+    def with_term(self, term):
+        return SymWord(self.kind, self.step, term)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SymWord is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('SymWord is immutable')
+
+    def __getitem__(self, key):
+        if key == 'z3' and self.term is None:
+            raise KeyError(key)
+        return getattr(self, self._keys[key])
+
+    def __contains__(self, key):
+        return key in self._keys and (key != 'z3' or self.term is not None)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (SymWord, (self.kind, self.step, self.term))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, SymWord):
+            return NotImplemented
+        if self.kind != other.kind or self.step != other.step:
+            return False
+        if self.term is None or other.term is None:
+            return self.term is other.term
+        return self.term.eq(other.term)
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self):
+        return hash((self.kind, self.step, None if self.term is None else self.term.hash()))
+
+    def __repr__(self):
+        if self.term is None:
+            return 'SymWord(%r, %r)' % (self.kind, self.step)
+        return 'SymWord(%r, %r, %s)' % (self.kind, self.step, self.term)
+
+
+def copy_storage( storage ):
+    # The values are immutable, only the per-slot lists need copying
+    return { k: list(v) for k, v in storage.items() }
+
+
 def create_configuration( stack, mmemory, storage):
     
     nc = {}
-    nc['stack']   = copy.deepcopy(stack)
+    nc['stack']   = list(stack)
     nc['mmemory'] = copy.deepcopy(mmemory)
-    nc['storage'] = copy.deepcopy(storage)
+    nc['storage'] = copy_storage(storage)
     
     return nc
     
@@ -130,10 +219,22 @@ class MyGlobals(object):
     # 
     s = None
     SOLVER_TIMEOUT = 10000          #timeout
+    # Only send constraints sharing variables with the new ones to Z3;
+    # compare_slices also solves them unsliced to measure the time saved
+    slice_constraints = True
+    compare_slices = False
+    # Answer queries from recent models and unsatisfiable sets when possible
+    use_solver_cache = True
+    solver_cache = None
+    # Race these configurations on queries taking longer than
+    # portfolio_threshold ms (see solver_portfolio.py); None to disable
+    portfolio = None
+    portfolio_threshold = 1000
 
     search_condition_found = False
     stop_search = False
     visited_nodes = 0
+    pruned_calls = 0
 
     last_eq_step = -1
     last_eq_func = -1
@@ -146,6 +247,13 @@ class MyGlobals(object):
     symbolic_sha = False
     symbolic_load = False
 
+    # End-of-transaction states collected for the next search depth
+    # (see execute_block.search_depth); None when not collecting
+    frontier = None
+    reuse_frontier = True
+    # Only call functions that read what earlier calls wrote (see storage_deps.py)
+    prune_sequences = True
+
 
     # Params related to blockchain
     port_number = '8550'
@@ -155,6 +263,7 @@ class MyGlobals(object):
     sendingether_account = '564625b3ae8d0602a8fc0fe22c884b091098417f'
     send_initial_wei = 44
     web3 = None
+    storage_provider = None         # see storage_provider.py, used instead of web3 when set
 
     # 
     debug = False
@@ -166,15 +275,24 @@ class MyGlobals(object):
 
 
 
+def new_solver():
+    """Return the solver for path constraints (see path_solver.py)."""
+    portfolio = Portfolio(MyGlobals.portfolio, MyGlobals.portfolio_threshold) if MyGlobals.portfolio else None
+    s = PathSolver(MyGlobals.slice_constraints, MyGlobals.compare_slices, MyGlobals.solver_cache, portfolio)
+    s.set("timeout", MyGlobals.SOLVER_TIMEOUT)
+    return s
+
+
 def clear_globals():
 
-    MyGlobals.s = Solver()
-    MyGlobals.s.set("timeout", MyGlobals.SOLVER_TIMEOUT)
+    MyGlobals.solver_cache = CounterexampleCache() if MyGlobals.use_solver_cache else None
+    MyGlobals.s = new_solver()
 
 
     MyGlobals.search_condition_found = False
     MyGlobals.stop_search = False
     MyGlobals.visited_nodes = 0
+    MyGlobals.pruned_calls = 0
     MyGlobals.no_function_calls = 0
     MyGlobals.function_calls = {}
 